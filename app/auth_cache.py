@@ -0,0 +1,164 @@
+"""In-process cache of authenticated users.
+
+Every authenticated request used to decode the JWT and load its user. Entries
+here are keyed by the SHA-256 of the bearer token and hold its decoded claims
+plus a snapshot of the user's columns, so a repeat request with the same token
+needs neither. An entry lives for AUTH_CACHE_TTL_SECONDS or until the token
+expires, whichever is sooner; the least recently used entries are evicted
+beyond AUTH_CACHE_SIZE.
+
+Entries are also indexed by user id. Updating or deleting a User through the
+ORM invalidates it automatically once the change commits; code that changes a
+user any other way (bulk UPDATE, raw SQL) calls invalidate_user() after
+committing. The cache is per process, so with several workers a change is only
+guaranteed visible everywhere after the TTL.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from .models import User
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+def token_hash(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class CachedPrincipal:
+    __slots__ = ("user_id", "claims", "user_values", "expires_at")
+
+    def __init__(self, claims: dict, user: User, expires_at: float):
+        self.user_id = user.id
+        self.claims = claims
+        self.user_values = {key: getattr(user, key) for key in _USER_COLUMNS}
+        self.expires_at = expires_at
+
+    def user(self) -> User:
+        """A fresh, detached User built from the snapshot (read-only use)"""
+        return User(**self.user_values)
+
+
+class AuthCache:
+    """Thread-safe bounded TTL/LRU map of token hash -> CachedPrincipal"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, CachedPrincipal]" = OrderedDict()
+        self._by_user: dict[int, set] = {}
+        # Bumped on every invalidation; see put()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _remove(self, key: bytes):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry.user_id]
+
+    def get(self, token: str) -> Optional[CachedPrincipal]:
+        key = token_hash(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token: str, claims: dict, user: User, generation: int):
+        """Cache a verified token's claims and user.
+
+        generation is the value of self.generation read before the user was
+        loaded. If anything was invalidated since, the row may predate that
+        change, so it is not cached.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if claims.get("exp") is not None:
+            expires_at = min(expires_at, float(claims["exp"]))
+        entry = CachedPrincipal(claims, user, expires_at)
+        key = token_hash(token)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_user.setdefault(entry.user_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of this user (call after committing a change)"""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+auth_cache = AuthCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _queue_changed_user(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("auth_cache_changed_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("auth_cache_changed_users", ()):
+        auth_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("auth_cache_changed_users", None)
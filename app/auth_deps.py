@@ -0,0 +1,132 @@
+"""Authentication dependencies shared by all routers.
+
+get_principal decodes the bearer token once per request (FastAPI caches a
+dependency's result for the whole request, so handlers and require_roles()
+share it) and resolves the user by primary key from the ``user_id`` claim.
+``sub`` carries the flat_id, which many users share (e.g. ``owner_APT``), so it
+is never used for lookups.
+
+Lookups use a session of get_principal's own, closed before the handler runs:
+a sync handler doesn't hold an async connection for the whole request beside
+its own, and a cached token with a fresh revocation list checks out none.
+
+Role and apartment come from the user row, not the token. Revoked tokens
+(logout, role change; see app/revocations.py) are rejected, also when the user
+is cached.
+
+    @router.get("/thing")
+    async def get_thing(principal: Principal = Depends(get_principal)): ...
+
+    @router.post("/thing")
+    async def create_thing(principal: Principal = Depends(require_admin)): ...
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, status
+from jose import JWTError
+
+from . import statements
+from .auth_cache import auth_cache
+from .database import AsyncSessionLocal
+from .jwt_keys import key_ring
+from .models import User, UserRole
+from .revocations import revocation_list
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user of the current request"""
+    user_id: int
+    apt_id: str
+    flat_id: str
+    role: UserRole
+    # Read-only view of the users row; load it through your own session to modify it
+    user: User = field(compare=False, repr=False)
+    # Verified claims of the access token (jti, iat, exp, ...)
+    claims: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_user(cls, user: User, claims: Optional[dict] = None) -> "Principal":
+        return cls(
+            user_id=user.id,
+            apt_id=user.apartment_id,
+            flat_id=user.flat_id,
+            role=user.role,
+            user=user,
+            claims=claims or {},
+        )
+
+    def has_role(self, *roles: UserRole) -> bool:
+        return self.role in roles
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def bearer_token(authorization: Optional[str]) -> str:
+    """The token from an ``Authorization: Bearer <token>`` header"""
+    if not authorization:
+        raise _unauthorized("Authorization header required")
+    try:
+        scheme, token = authorization.split()
+    except ValueError:
+        raise _unauthorized("Invalid authorization header format")
+    if scheme.lower() != "bearer":
+        raise _unauthorized("Invalid authentication scheme")
+    return token
+
+
+def decode_access_token(token: str) -> dict:
+    try:
+        return key_ring.verify(token)
+    except JWTError:
+        raise _unauthorized("Invalid token")
+
+
+async def get_principal(authorization: Optional[str] = Header(None)) -> Principal:
+    """Authenticate the request. A recently seen token usually needs no DB query."""
+    token = bearer_token(authorization)
+
+    # No connection is checked out unless a query actually runs
+    async with AsyncSessionLocal() as db:
+        cached = auth_cache.get(token)
+        if cached is not None:
+            if await revocation_list.is_revoked(db, cached.claims):
+                raise _unauthorized("Token has been revoked")
+            return Principal.from_user(cached.user(), cached.claims)
+        generation = auth_cache.generation
+
+        payload = decode_access_token(token)
+        if await revocation_list.is_revoked(db, payload):
+            raise _unauthorized("Token has been revoked")
+        try:
+            user_id = int(payload["user_id"])
+        except (KeyError, TypeError, ValueError):
+            raise _unauthorized("Invalid token payload")
+
+        user = (await db.execute(statements.USER_BY_ID, {"user_id": user_id})).scalars().first()
+        if user is None:
+            raise _unauthorized("User not found")
+
+    auth_cache.put(token, payload, user, generation)
+    return Principal.from_user(user, payload)
+
+
+def require_roles(*roles: UserRole, detail: str = "Insufficient permissions"):
+    """Dependency: the authenticated principal, 403 unless it has one of roles"""
+    allowed = frozenset(roles)
+
+    async def dependency(principal: Principal = Depends(get_principal)) -> Principal:
+        if principal.role not in allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return principal
+
+    return dependency
+
+
+require_admin = require_roles(UserRole.ADMIN)
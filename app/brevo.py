@@ -0,0 +1,134 @@
+"""Brevo (Sendinblue) transactional email client, shared by the whole process.
+
+Building a Configuration, ApiClient and TransactionalEmailsApi per email meant
+a new urllib3 pool, and so a new TCP connection and TLS handshake, for every
+OTP. One client is created at startup (app lifespan) and closed on shutdown;
+its pool keeps up to BREVO_POOL_SIZE connections to Brevo open between sends
+(size it to EMAIL_CONCURRENCY, the outbox sends that many at once), with TCP
+keep-alive probes so idle ones are not silently dropped by NAT or the load
+balancer. Sends time out after BREVO_CONNECT_TIMEOUT_SECONDS to connect and
+BREVO_READ_TIMEOUT_SECONDS to answer, so a hung request frees its outbox slot
+and is retried.
+
+stats() (/health/brevo) counts requests and the connections opened for them;
+the difference is how many reused a warm connection.
+"""
+import os
+import socket
+import threading
+
+import sib_api_v3_sdk
+from dotenv import load_dotenv
+from urllib3.connection import HTTPConnection
+
+# Load environment variables (imported before routers/auth.py loads them)
+load_dotenv()
+
+BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+BREVO_POOL_SIZE = int(os.getenv("BREVO_POOL_SIZE", "4"))
+BREVO_KEEPALIVE = os.getenv("BREVO_KEEPALIVE", "true").lower() == "true"
+BREVO_KEEPALIVE_IDLE_SECONDS = int(os.getenv("BREVO_KEEPALIVE_IDLE_SECONDS", "60"))
+BREVO_CONNECT_TIMEOUT_SECONDS = float(os.getenv("BREVO_CONNECT_TIMEOUT_SECONDS", "3"))
+BREVO_READ_TIMEOUT_SECONDS = float(os.getenv("BREVO_READ_TIMEOUT_SECONDS", "10"))
+
+
+def keepalive_socket_options(idle_seconds: int) -> list:
+    options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # Probe after idle_seconds instead of the OS default (two hours on Linux)
+    for name, value in (("TCP_KEEPIDLE", idle_seconds), ("TCP_KEEPINTVL", max(1, idle_seconds // 4)),
+                        ("TCP_KEEPCNT", 4)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+def _close_api_client(api_client):
+    """Close an ApiClient's connections and its thread pool (for async_req sends)"""
+    api_client.rest_client.pool_manager.clear()
+    # The SDK's ApiClient has no close(); its __del__ does this, at no set time
+    pool, api_client._pool = api_client._pool, None
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+class BrevoClient:
+    """One TransactionalEmailsApi and connection pool for every send"""
+
+    def __init__(self, api_key: str = BREVO_API_KEY, pool_size: int = BREVO_POOL_SIZE,
+                 keepalive: bool = BREVO_KEEPALIVE,
+                 connect_timeout: float = BREVO_CONNECT_TIMEOUT_SECONDS,
+                 read_timeout: float = BREVO_READ_TIMEOUT_SECONDS, host: str = None):
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = (connect_timeout, read_timeout)
+        self.host = host
+        self._api = None
+        self._lock = threading.Lock()
+        # Requests and connections of pools already closed
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+    def start(self):
+        """Create the client (sending also does, for scripts without a lifespan)"""
+        with self._lock:
+            if self._api is not None:
+                return self._api
+            configuration = sib_api_v3_sdk.Configuration()
+            configuration.api_key['api-key'] = self.api_key
+            configuration.connection_pool_maxsize = self.pool_size
+            if self.host:
+                configuration.host = self.host
+            api_client = sib_api_v3_sdk.ApiClient(configuration)
+            if self.keepalive:
+                # Used for every connection pool the manager creates from now on
+                api_client.rest_client.pool_manager.connection_pool_kw["socket_options"] = (
+                    keepalive_socket_options(BREVO_KEEPALIVE_IDLE_SECONDS)
+                )
+            self._api = sib_api_v3_sdk.TransactionalEmailsApi(api_client)
+            return self._api
+
+    def send(self, message):
+        """Send a SendSmtpEmail; raises ApiException, or urllib3 errors on timeouts"""
+        api = self._api or self.start()
+        return api.send_transac_email(message, _request_timeout=self.timeout)
+
+    def _pools(self) -> list:
+        api = self._api
+        if api is None:
+            return []
+        pools = api.api_client.rest_client.pool_manager.pools
+        return [pools[key] for key in pools.keys()]
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools():
+                self._closed_requests += pool.num_requests
+                self._closed_connections += pool.num_connections
+            if self._api is not None:
+                _close_api_client(self._api.api_client)
+                self._api = None
+
+    def stats(self) -> dict:
+        pools = self._pools()
+        requests = self._closed_requests + sum(pool.num_requests for pool in pools)
+        connections = self._closed_connections + sum(pool.num_connections for pool in pools)
+        return {
+            "configured": bool(self.api_key),
+            "started": self._api is not None,
+            "pool_size": self.pool_size,
+            "keepalive": self.keepalive,
+            "connect_timeout_seconds": self.timeout[0],
+            "read_timeout_seconds": self.timeout[1],
+            "requests": requests,
+            "connections_created": connections,
+            "connections_reused": max(0, requests - connections),
+            # The pool queues hold None for each connection not opened yet
+            "idle_connections": sum(
+                conn is not None for pool in pools if pool.pool is not None for conn in list(pool.pool.queue)
+            ),
+        }
+
+
+brevo = BrevoClient()
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
-from . import models, schemas
+from . import models, schemas, statements
 from fastapi import HTTPException
 import random
 import string
@@ -88,7 +88,9 @@ def get_all_apartments(db: Session):
 
 def get_apartment_by_apartment_id(db: Session, apartment_id: str):
     """Get apartment by apartment_id (string)"""
-    return db.query(models.Apartment).filter(models.Apartment.apartment_id == apartment_id).first()
+    return db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": apartment_id}
+    ).scalars().first()
 
 
 def get_apartment_by_uuid(db: Session, apartment_uuid: str):
@@ -1,18 +1,17 @@
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, statements
 from typing import Optional
 import uuid
 
 def get_user_by_email_and_apt(db: Session, email: str, apartment_id: str) -> Optional[models.User]:
     """Get user by email and apartment ID"""
-    return db.query(models.User).filter(
-        models.User.user_email_id == email,
-        models.User.apartment_id == apartment_id
-    ).first()
+    return db.execute(
+        statements.USER_BY_APARTMENT_EMAIL, {"apartment_id": apartment_id, "email": email}
+    ).scalars().first()
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
     """Get user by ID"""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.execute(statements.USER_BY_ID, {"user_id": user_id}).scalars().first()
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     """Create a new user"""
@@ -34,7 +33,7 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
 
 def update_user(db: Session, user_id: int, user_update: dict) -> Optional[models.User]:
     """Update user details"""
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = get_user_by_id(db, user_id)
     if db_user:
         for key, value in user_update.items():
             if hasattr(db_user, key) and value is not None:
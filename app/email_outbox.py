@@ -0,0 +1,254 @@
+"""Transactional email outbox.
+
+Handlers don't call Brevo themselves: enqueue() adds an email_outbox row on the
+request's session, so the email commits (or rolls back) together with the OTP,
+invitation or user it is about, and the handler returns as soon as that commit
+is done. Brevo's latency (often 400 ms to 2 s) and its outages no longer reach
+the response or block the event loop.
+
+Every worker runs a delivery loop (started from the app lifespan) that claims
+due rows and sends up to EMAIL_CONCURRENCY at a time, each in a thread (the
+Brevo SDK blocks). A claim counts the attempt and pushes next_attempt_at
+EMAIL_CLAIM_SECONDS ahead in one UPDATE ... RETURNING (with FOR UPDATE SKIP
+LOCKED on PostgreSQL), so two workers never take the same row, and the row of a
+worker that died is picked up again once its claim lapses. A failed send is
+retried after an exponential backoff with jitter (EMAIL_RETRY_BASE_SECONDS,
+doubling up to EMAIL_RETRY_MAX_SECONDS); after EMAIL_MAX_ATTEMPTS the row is
+dead and stays for inspection (/health/email-outbox) until the sweeper deletes
+it. Delivery is at least once: a worker dying between Brevo accepting an email
+and marking it sent will send it again. On shutdown the loop stops claiming and
+gives the sends in flight EMAIL_SHUTDOWN_GRACE_SECONDS to finish and be
+recorded, so a restart doesn't resend what Brevo already accepted.
+
+A commit wakes the local loop at once; rows committed by other workers are
+found by polling every EMAIL_POLL_SECONDS. Pending rows can also be delivered,
+and dead ones given another chance, from the command line:
+
+    python -m app.email_outbox [--requeue-dead]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from . import database
+from .models import EmailOutbox
+
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "true").lower() == "true"
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "4"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "5"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "900"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "2"))
+EMAIL_CLAIM_SECONDS = float(os.getenv("EMAIL_CLAIM_SECONDS", "120"))
+# Longer than a Brevo send can take (connect + read timeouts)
+EMAIL_SHUTDOWN_GRACE_SECONDS = float(os.getenv("EMAIL_SHUTDOWN_GRACE_SECONDS", "15"))
+
+PENDING, SENT, DEAD = "pending", "sent", "dead"
+
+
+class Outbox:
+    """Queues emails in the database and delivers them in the background"""
+
+    def __init__(self, engine, concurrency: int = EMAIL_CONCURRENCY, max_attempts: int = EMAIL_MAX_ATTEMPTS,
+                 retry_base: float = EMAIL_RETRY_BASE_SECONDS, retry_max: float = EMAIL_RETRY_MAX_SECONDS,
+                 claim_seconds: float = EMAIL_CLAIM_SECONDS,
+                 shutdown_grace: float = EMAIL_SHUTDOWN_GRACE_SECONDS):
+        self.engine = engine
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_seconds = claim_seconds
+        self.shutdown_grace = shutdown_grace
+        # kind (the sender's name, stored in each row) -> blocking send function
+        self.senders: dict = {}
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self.last_error = None
+        self._wake = None
+
+    def register(self, *senders):
+        for sender in senders:
+            self.senders[sender.__name__] = sender
+
+    def enqueue(self, uow, sender, email: str, *args):
+        """Send sender(email, *args) once the unit of work commits"""
+        uow.add(EmailOutbox(
+            kind=sender.__name__,
+            recipient=email,
+            payload=json.dumps([email, *args]),
+            status=PENDING,
+            next_attempt_at=datetime.utcnow(),
+        ))
+        uow.after_commit(self.wake, critical=False)
+
+    async def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before the next attempt, after `attempts` failed ones"""
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    # --- delivery ---------------------------------------------------------
+
+    async def _claim(self, limit: int) -> list:
+        """Take up to limit due rows: (id, kind, payload, attempts)"""
+        now = datetime.utcnow()
+        due = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(due.scalar_subquery()))
+                .values(
+                    attempts=EmailOutbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=self.claim_seconds),
+                )
+                .returning(EmailOutbox.id, EmailOutbox.kind, EmailOutbox.payload, EmailOutbox.attempts)
+            )
+            return result.all()
+
+    async def _record(self, email_id: int, **values):
+        async with self.engine.begin() as connection:
+            await connection.execute(update(EmailOutbox).where(EmailOutbox.id == email_id).values(**values))
+
+    async def _deliver(self, row):
+        # Shielded: once the send starts, its outcome is recorded even if this task is cancelled
+        await asyncio.shield(self._send_and_record(row))
+
+    async def _send_and_record(self, row):
+        email_id, kind, payload, attempts = row
+        try:
+            sender = self.senders.get(kind)
+            if sender is None:
+                raise LookupError(f"no sender registered for {kind!r}")
+            await asyncio.to_thread(sender, *json.loads(payload))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            self.failed_attempts += 1
+            self.last_error = error
+            try:
+                if attempts >= self.max_attempts:
+                    await self._record(email_id, status=DEAD, last_error=error)
+                    self.dead += 1
+                    print(f"📭 Gave up on {kind} email #{email_id} after {attempts} attempts: {error}")
+                else:
+                    retry_at = datetime.utcnow() + timedelta(seconds=self.backoff(attempts))
+                    await self._record(email_id, next_attempt_at=retry_at, last_error=error)
+            except Exception as record_error:
+                print(f"⚠️  Email outbox could not record a failure of #{email_id}: {record_error}")
+            return
+        try:
+            # The payload holds OTPs and invitation codes; drop it once delivered
+            await self._record(email_id, status=SENT, sent_at=datetime.utcnow(), payload=None, last_error=None)
+            self.sent += 1
+        except Exception as e:
+            # Still pending: sent again when the claim lapses
+            print(f"⚠️  Email outbox could not mark #{email_id} sent: {e}")
+
+    async def run_once(self) -> int:
+        """Deliver every email that is due now; returns how many were attempted"""
+        attempted = 0
+        while True:
+            rows = await self._claim(self.concurrency)
+            if not rows:
+                return attempted
+            attempted += len(rows)
+            await asyncio.gather(*(self._deliver(row) for row in rows))
+
+    async def run_forever(self, poll: float = EMAIL_POLL_SECONDS):
+        """Keep up to `concurrency` deliveries in flight, claiming rows as slots free up"""
+        self._wake = asyncio.Event()
+        in_flight = set()
+        try:
+            while True:
+                self._wake.clear()
+                free = self.concurrency - len(in_flight)
+                if free:
+                    try:
+                        rows = await self._claim(free)
+                    except Exception as e:
+                        print(f"⚠️  Email outbox claim failed: {e}")
+                        rows = []
+                    for row in rows:
+                        task = asyncio.create_task(self._deliver(row))
+                        in_flight.add(task)
+                        task.add_done_callback(in_flight.discard)
+                # Wait for a commit, the poll interval, or (when full) a free slot
+                woken = asyncio.ensure_future(self._wake.wait())
+                waiters = {woken, *in_flight} if len(in_flight) >= self.concurrency else {woken}
+                await asyncio.wait(waiters, timeout=poll, return_when=asyncio.FIRST_COMPLETED)
+                woken.cancel()
+        except asyncio.CancelledError:
+            # Shutting down: claim nothing more, let the sends in flight finish and be recorded
+            if in_flight:
+                _, unfinished = await asyncio.wait(in_flight, timeout=self.shutdown_grace)
+                if unfinished:
+                    print(f"⚠️  Email outbox stopped with {len(unfinished)} sends unfinished; "
+                          f"they are sent again once their claim lapses")
+            raise
+        finally:
+            self._wake = None
+
+    async def requeue_dead(self) -> int:
+        """Give dead emails a fresh set of attempts"""
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.status == DEAD)
+                .values(status=PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+            )
+        return result.rowcount
+
+    async def stats(self) -> dict:
+        async with self.engine.connect() as connection:
+            by_status = dict((await connection.execute(
+                select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+            )).all())
+        return {
+            "enabled": EMAIL_OUTBOX_ENABLED,
+            "concurrency": self.concurrency,
+            "max_attempts": self.max_attempts,
+            "rows": {status: by_status.get(status, 0) for status in (PENDING, SENT, DEAD)},
+            # Since this worker started
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "dead": self.dead,
+            "last_error": self.last_error,
+        }
+
+
+email_outbox = Outbox(database.async_engine)
+
+
+async def _main(requeue_dead: bool):
+    if requeue_dead:
+        print(f"Requeued {await email_outbox.requeue_dead()} dead emails")
+    print(f"Attempted {await email_outbox.run_once()} emails: {await email_outbox.stats()}")
+    await database.async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.email_outbox", description="Deliver the pending emails once")
+    parser.add_argument("--requeue-dead", action="store_true", help="retry the dead emails too")
+    args = parser.parse_args()
+
+    from .routers import auth  # noqa: F401  (registers the senders)
+    asyncio.run(_main(args.requeue_dead))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""HTML email templates, compiled once at import.
+
+Each email is an .html file in this directory with {{ name }} slots. Loading
+reads every template, minifies it (comments and indentation dropped, the
+<style> block compacted) and splits it at its slots, so sending an email only
+joins the precompiled text with its HTML-escaped values.
+
+The CSS stays in the <style> block rather than being inlined into style
+attributes: the templates rely on pseudo-elements, keyframes and a media query,
+none of which can be inlined, and the clients we send to honour <style>.
+"""
+import html
+import os
+import re
+
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+# Whitespace around these tags never renders, so it can go
+BLOCK_TAG = re.compile(
+    r"\s*(<!DOCTYPE[^>]*>|</?(?:html|head|body|meta|title|link|style|div|p|h[1-6]|ul|ol|li|"
+    r"table|thead|tbody|tr|td|th|br|hr|center)\b[^>]*>)\s*",
+    re.IGNORECASE,
+)
+STYLE_BLOCK = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.IGNORECASE | re.DOTALL)
+# Conditional comments (<!--[if mso]>) are markup for Outlook; keep them
+COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_html(source: str) -> str:
+    chunks = STYLE_BLOCK.split(source)
+    # split() with three groups: markup, then (<style>, css, </style>) triples
+    for n in range(0, len(chunks), 4):
+        markup = COMMENT.sub("", chunks[n])
+        chunks[n] = re.sub(r"\s+", " ", markup)
+        if n + 2 < len(chunks):
+            chunks[n + 2] = minify_css(chunks[n + 2])
+    return BLOCK_TAG.sub(r"\1", "".join(chunks)).strip()
+
+
+class Template:
+    """A minified template, ready to have its slots filled"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source_bytes = len(source.encode())
+        minified = minify_html(source)
+        self.minified_bytes = len(minified.encode())
+        # Literal text and slot names alternate: text, slot, text, ..., text
+        pieces = SLOT.split(minified)
+        self._text = pieces[0::2]
+        self._order = pieces[1::2]
+        self.slots = frozenset(self._order)
+
+    def render(self, **values) -> str:
+        if values.keys() != self.slots:
+            raise TypeError(
+                f"template {self.name!r} takes {sorted(self.slots)}, got {sorted(values)}"
+            )
+        escaped = {slot: html.escape(str(value)) for slot, value in values.items()}
+        parts = [self._text[0]]
+        for slot, text in zip(self._order, self._text[1:]):
+            parts.append(escaped[slot])
+            parts.append(text)
+        return "".join(parts)
+
+
+def load(directory: str = TEMPLATE_DIR) -> dict:
+    templates = {}
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension == ".html":
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                templates[name] = Template(name, f.read())
+    return templates
+
+
+TEMPLATES = load()
+
+
+def render(name: str, **values) -> str:
+    return TEMPLATES[name].render(**values)
@@ -0,0 +1,141 @@
+"""Flatmate invitation codes: unique by construction, not guessable.
+
+A code is a number n from a database counter, scrambled with a keyed
+permutation of the whole code space (36^6 six-character codes) and written in
+base 36. Distinct counter values give distinct codes, so no lookup is needed
+before inserting, and without INVITATION_CODE_KEY the sequence of codes can't
+be predicted from earlier ones. The generator refuses to start without
+INVITATION_CODE_KEY or a SECRET_KEY of its own, as the public default would
+make every code predictable.
+
+The permutation is a Feistel network on the two halves (36^3 values each) of
+the number: each round adds an HMAC of one half to the other, modulo 36^3.
+Every round is invertible, so the whole network is a bijection of the code
+space with no cycle walking.
+
+Counter values are reserved INVITATION_CODE_BLOCK at a time, in their own
+short transaction (the ``counters`` table), so most invitations don't touch
+the counter at all. Values of a block that a worker never hands out are
+skipped, which costs nothing in a space of two billion codes.
+
+Codes generated at random before this scheme, or under another key, can
+still clash with a new one; the unique index catches that and the caller
+takes the next code.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import string
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import database
+from .jwt_keys import DEFAULT_SECRET_KEY
+from .models import Counter
+
+INVITATION_CODE_KEY = os.getenv("INVITATION_CODE_KEY") or os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+INVITATION_CODE_BLOCK = int(os.getenv("INVITATION_CODE_BLOCK", "20"))
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+HALF = len(ALPHABET) ** (CODE_LENGTH // 2)  # 36^3
+CODE_SPACE = HALF * HALF  # 36^6
+ROUNDS = 8
+COUNTER_NAME = "invitation_code"
+
+
+class FeistelPermutation:
+    """Keyed bijection of range(HALF * HALF)"""
+
+    def __init__(self, key: str, rounds: int = ROUNDS):
+        self.key = hashlib.sha256(b"flatfund invitation code\0" + key.encode()).digest()
+        self.rounds = rounds
+
+    def _round(self, number: int, half: int) -> int:
+        digest = hmac.new(self.key, b"%d:%d" % (number, half), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], "big") % HALF
+
+    def permute(self, value: int) -> int:
+        left, right = divmod(value, HALF)
+        for number in range(self.rounds):
+            left, right = right, (left + self._round(number, right)) % HALF
+        return left * HALF + right
+
+    def invert(self, value: int) -> int:
+        left, right = divmod(value, HALF)
+        for number in reversed(range(self.rounds)):
+            left, right = (right - self._round(number, left)) % HALF, left
+        return left * HALF + right
+
+
+def encode(value: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+class InvitationCodes:
+    """Hands out codes from counter blocks reserved in the database"""
+
+    def __init__(self, engine, key: str = INVITATION_CODE_KEY, block: int = INVITATION_CODE_BLOCK):
+        if not key or key == DEFAULT_SECRET_KEY:
+            raise RuntimeError(
+                "Invitation codes need INVITATION_CODE_KEY, or a SECRET_KEY other than the default: "
+                "with the public default anyone can predict the codes"
+            )
+        self.engine = engine
+        self.permutation = FeistelPermutation(key)
+        self.block = block
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _reserve(self) -> int:
+        """Reserve the next block of counter values; returns its last value"""
+        async with self.engine.begin() as connection:
+            bump = (
+                update(Counter)
+                .where(Counter.name == COUNTER_NAME)
+                .values(value=Counter.value + self.block)
+            )
+            if connection.dialect.update_returning:
+                end = (await connection.execute(bump.returning(Counter.value))).scalar()
+            else:
+                result = await connection.execute(bump)
+                end = None if result.rowcount != 1 else (await connection.execute(
+                    select(Counter.value).where(Counter.name == COUNTER_NAME)
+                )).scalar()
+            if end is None:
+                # First use: create the counter (unless another worker just did, then bump again)
+                dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+                created = await connection.execute(
+                    dialect.insert(Counter)
+                    .values(name=COUNTER_NAME, value=self.block)
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+                if created.rowcount == 1:
+                    end = self.block
+                else:
+                    await connection.execute(bump)
+                    end = (await connection.execute(
+                        select(Counter.value).where(Counter.name == COUNTER_NAME)
+                    )).scalar()
+        return end
+
+    async def next_code(self) -> str:
+        async with self._lock:
+            if self._next >= self._end:
+                end = await self._reserve()
+                if end >= CODE_SPACE:
+                    raise RuntimeError("Invitation code space exhausted")
+                self._next, self._end = end - self.block + 1, end + 1
+            value = self._next
+            self._next += 1
+        return encode(self.permutation.permute(value))
+
+
+invitation_codes = InvitationCodes(database.async_engine)
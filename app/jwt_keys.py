@@ -0,0 +1,192 @@
+"""JWT signing key ring.
+
+Access tokens are signed with an asymmetric key (RS256 or ES256) and carry the
+key's id in the ``kid`` header. The public halves are published at
+``/.well-known/jwks.json``, so other services (gate devices, reporting jobs)
+can verify tokens locally without the secret or a call to us.
+
+Keys are PEM files in JWT_KEYS_DIR named ``<kid>.pem``:
+
+- a private key can sign and verify;
+- a public key only verifies (a retired key whose private half was removed).
+
+The active signing key is JWT_ACTIVE_KID, or else the last private key by file
+name (generated kids start with the date). Rotation: generate a new key, copy
+the file to every host, then switch JWT_ACTIVE_KID (pin it, so a host never
+signs with a key the others don't have yet), and delete the old file once the
+tokens it signed have expired. Parsed key objects are kept for the life of the process, so a
+verification only costs the signature check.
+
+Without any key files, tokens are signed HS256 with SECRET_KEY as before.
+HS256 tokens without a ``kid`` keep verifying while JWT_ACCEPT_HS256 is true, so
+sessions issued before the switch stay valid until they expire.
+
+    python -m app.jwt_keys generate [--alg RS256|ES256]
+    python -m app.jwt_keys list
+"""
+import argparse
+import os
+import secrets
+import time
+from typing import Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from dotenv import load_dotenv
+from jose import jwk, jwt, JWTError
+
+# Load environment variables
+load_dotenv()
+
+# Used when SECRET_KEY isn't set. It is public, so keys derived from it protect nothing
+DEFAULT_SECRET_KEY = "your-secret-key-change-in-production"
+SECRET_KEY = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "./keys")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID") or None
+JWT_ACCEPT_HS256 = os.getenv("JWT_ACCEPT_HS256", "true").lower() == "true"
+LEGACY_ALGORITHM = "HS256"
+
+
+class KeyEntry:
+    __slots__ = ("kid", "algorithm", "signing_key", "verifying_key", "jwk")
+
+    def __init__(self, kid: str, algorithm: str, signing_key, verifying_key):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.signing_key = signing_key  # None for verify-only keys
+        self.verifying_key = verifying_key
+        self.jwk = {**verifying_key.to_dict(), "kid": kid, "use": "sig", "alg": algorithm}
+
+
+def _algorithm_for(key) -> str:
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        if isinstance(key.curve, ec.SECP256R1):
+            return "ES256"
+    raise ValueError(f"unsupported key type {type(key).__name__} (use RSA or EC P-256)")
+
+
+def load_key_file(path: str) -> KeyEntry:
+    kid = os.path.basename(path)[:-len(".pem")]
+    with open(path, "rb") as f:
+        pem = f.read()
+    if b"PRIVATE KEY" in pem:
+        parsed = serialization.load_pem_private_key(pem, password=None)
+        algorithm = _algorithm_for(parsed)
+        signing_key = jwk.construct(pem, algorithm)
+        return KeyEntry(kid, algorithm, signing_key, signing_key.public_key())
+    parsed = serialization.load_pem_public_key(pem)
+    algorithm = _algorithm_for(parsed)
+    return KeyEntry(kid, algorithm, None, jwk.construct(pem, algorithm))
+
+
+class KeyRing:
+    """Signs with the active key; verifies with any key in the ring"""
+
+    def __init__(self, keys: list, active_kid: Optional[str] = None,
+                 legacy_secret: Optional[str] = None, accept_legacy: bool = True):
+        self.keys = {entry.kid: entry for entry in keys}
+        signing = [entry.kid for entry in keys if entry.signing_key is not None]
+        if active_kid is None and signing:
+            active_kid = sorted(signing)[-1]
+        if active_kid is not None:
+            entry = self.keys.get(active_kid)
+            if entry is None or entry.signing_key is None:
+                raise RuntimeError(f"JWT signing key {active_kid!r} not found (or has no private key)")
+        self.active = self.keys[active_kid] if active_kid is not None else None
+        self.legacy_secret = legacy_secret
+        self.accept_legacy = accept_legacy
+        self._jwks = {"keys": [entry.jwk for entry in self.keys.values()]}
+
+    @property
+    def algorithm(self) -> str:
+        return self.active.algorithm if self.active is not None else LEGACY_ALGORITHM
+
+    def sign(self, claims: dict) -> str:
+        if self.active is None:
+            return jwt.encode(claims, self.legacy_secret, algorithm=LEGACY_ALGORITHM)
+        return jwt.encode(
+            claims,
+            self.active.signing_key,
+            algorithm=self.active.algorithm,
+            headers={"kid": self.active.kid},
+        )
+
+    def verify(self, token: str) -> dict:
+        """Decoded claims of a valid token; raises JWTError otherwise"""
+        header = jwt.get_unverified_header(token)
+        kid = header.get("kid")
+        if kid is None:
+            if header.get("alg") != LEGACY_ALGORITHM or not (self.accept_legacy or self.active is None):
+                raise JWTError("Token has no key id")
+            return jwt.decode(token, self.legacy_secret, algorithms=[LEGACY_ALGORITHM])
+        entry = self.keys.get(kid)
+        if entry is None:
+            raise JWTError("Unknown signing key")
+        return jwt.decode(token, entry.verifying_key, algorithms=[entry.algorithm])
+
+    def jwks(self) -> dict:
+        return self._jwks
+
+
+def load_key_ring(keys_dir: str = JWT_KEYS_DIR) -> KeyRing:
+    keys = []
+    if os.path.isdir(keys_dir):
+        for name in sorted(os.listdir(keys_dir)):
+            if name.endswith(".pem"):
+                keys.append(load_key_file(os.path.join(keys_dir, name)))
+    ring = KeyRing(keys, JWT_ACTIVE_KID, SECRET_KEY, JWT_ACCEPT_HS256)
+    if ring.active is not None:
+        print(f"🔑 Signing JWTs with {ring.algorithm} key {ring.active.kid} ({len(keys)} key(s) in ring)")
+    return ring
+
+
+key_ring = load_key_ring()
+
+
+def generate_key(keys_dir: str, algorithm: str) -> str:
+    """Write a new private key to keys_dir and return its kid"""
+    if algorithm == "RS256":
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"unsupported algorithm {algorithm}")
+    kid = f"{time.strftime('%Y%m%d')}-{secrets.token_hex(4)}"
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    os.makedirs(keys_dir, exist_ok=True)
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+    return kid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage JWT signing keys")
+    parser.add_argument("command", choices=["generate", "list"])
+    parser.add_argument("--alg", choices=["RS256", "ES256"], default="RS256")
+    parser.add_argument("--dir", default=JWT_KEYS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        kid = generate_key(args.dir, args.alg)
+        print(f"✅ Generated {args.alg} key {kid} in {args.dir}")
+        print(f"   Copy it to every host, then set JWT_ACTIVE_KID={kid}")
+        return
+
+    ring = key_ring if args.dir == JWT_KEYS_DIR else load_key_ring(args.dir)
+    if not ring.keys:
+        print(f"No keys in {args.dir}: signing HS256 with SECRET_KEY")
+    for kid, entry in ring.keys.items():
+        role = "active" if entry is ring.active else ("sign/verify" if entry.signing_key else "verify only")
+        print(f"   {kid:<24}{entry.algorithm:<8}{role}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,52 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from . import models, database
+from . import models, database, migrations
 from .routers import apartment, auth, security
 from .swagger_config import configure_swagger_ui, swagger_ui_parameters, swagger_ui_custom_css
+from .pool_metrics import PoolMetricsMiddleware, pool_status
+from .read_routing import ReadYourWritesMiddleware
+from .auth_cache import auth_cache
+from .auth_deps import require_admin
+from .jwt_keys import key_ring
+from .refresh_tokens import refresh_flights
+from .revocations import revocation_list
+from .sweeper import SWEEPER_ENABLED, sweeper
+from .email_outbox import EMAIL_OUTBOX_ENABLED, email_outbox
+from .brevo import brevo
+from .rate_limit import RateLimitMiddleware, rate_limiter
+
+# Schema is managed by `python -m app.migrate`; startup only checks the version
+migrations.ensure_schema(database.engine)
+if database.read_engine is not database.engine and database.read_engine.dialect.name == "sqlite":
+    # Local stand-in replica file
+    migrations.ensure_schema(database.read_engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Expired/revoked row cleanup; only one worker at a time actually sweeps
+    sweep_task = asyncio.create_task(sweeper.run_forever()) if SWEEPER_ENABLED else None
+    # One Brevo client (and pool of warm connections) for every send of this worker
+    if brevo.api_key:
+        brevo.start()
+    # Emails queued by the handlers; every worker delivers, rows are claimed one worker at a time
+    outbox_task = asyncio.create_task(email_outbox.run_forever()) if EMAIL_OUTBOX_ENABLED else None
+    yield
+    tasks = [task for task in (sweep_task, outbox_task) if task is not None]
+    for task in tasks:
+        task.cancel()
+    # The outbox finishes its sends in flight before their Brevo client goes
+    await asyncio.gather(*tasks, return_exceptions=True)
+    brevo.close()
 
-# Create DB tables  
-models.Base.metadata.create_all(bind=database.engine)
 
 app = FastAPI(
+    lifespan=lifespan,
     title="FlatFund API",
     description="""
     ## 🏢 FlatFund - Apartment Management System API
@@ -67,6 +105,10 @@ app = FastAPI(
 # Configure enhanced Swagger UI
 configure_swagger_ui(app)
 
+# Throttle the OTP / invitation endpoints before any database work
+# (added before CORS so 429 responses still carry the CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -76,6 +118,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attribute connection pool wait/checkout times to routes
+app.add_middleware(PoolMetricsMiddleware)
+
+# Keep a client's reads on the primary right after it writes
+app.add_middleware(ReadYourWritesMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -132,4 +180,65 @@ def health_check():
             "email_integration": "Brevo service with floor context",
             "authentication": "OTP-based with JWT tokens"
         }
-    }
\ No newline at end of file
+    }
+
+# The /health/<component> stats below describe internals (keys, queues, pools): admins only
+@app.get("/health/db-pool", tags=["Health"], dependencies=[Depends(require_admin)])
+def db_pool_health():
+    """Connection pool occupancy and per-route wait/checkout timings"""
+    pools = {
+        "sync": pool_status(database.engine.pool),
+        "async": pool_status(database.async_engine.sync_engine.pool),
+    }
+    if database.read_engine is not database.engine:
+        pools["read_sync"] = pool_status(database.read_engine.pool)
+        pools["read_async"] = pool_status(database.async_read_engine.sync_engine.pool)
+    return pools
+
+
+@app.get("/.well-known/jwks.json", tags=["Authentication"])
+def jwks():
+    """Public keys for verifying our access tokens (RFC 7517), selected by the token's kid"""
+    return JSONResponse(key_ring.jwks(), headers={"Cache-Control": "public, max-age=300"})
+
+
+@app.get("/health/auth-cache", tags=["Health"], dependencies=[Depends(require_admin)])
+def auth_cache_health():
+    """Authenticated-user cache size and hit/miss counters"""
+    return auth_cache.stats()
+
+
+@app.get("/health/refresh-tokens", tags=["Health"], dependencies=[Depends(require_admin)])
+def refresh_tokens_health():
+    """Refresh rotations, and refreshes served from a concurrent or recent rotation"""
+    return refresh_flights.stats()
+
+
+@app.get("/health/revocations", tags=["Health"], dependencies=[Depends(require_admin)])
+def revocations_health():
+    """Revoked-token snapshot size and how often a check needed the database"""
+    return revocation_list.stats()
+
+
+@app.get("/health/sweeper", tags=["Health"], dependencies=[Depends(require_admin)])
+def sweeper_health():
+    """Expired-row sweeps: rows purged per table and how long the last sweep took"""
+    return sweeper.stats()
+
+
+@app.get("/health/rate-limits", tags=["Health"], dependencies=[Depends(require_admin)])
+def rate_limits_health():
+    """Requests allowed and refused per rate-limited route, and the most refused keys"""
+    return rate_limiter.stats()
+
+
+@app.get("/health/email-outbox", tags=["Health"], dependencies=[Depends(require_admin)])
+async def email_outbox_health():
+    """Queued, sent and dead emails, and this worker's deliveries and failures"""
+    return await email_outbox.stats()
+
+
+@app.get("/health/brevo", tags=["Health"], dependencies=[Depends(require_admin)])
+def brevo_health():
+    """Brevo client settings, requests sent, and connections created vs reused"""
+    return brevo.stats()
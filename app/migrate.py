@@ -0,0 +1,37 @@
+"""Database migration CLI. Run once per deploy, before starting the app.
+
+    python -m app.migrate            # apply all pending migrations
+    python -m app.migrate status     # show current and latest versions
+    python -m app.migrate upgrade 3  # migrate up to version 3
+"""
+import argparse
+
+from . import database, migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.migrate", description="FlatFund schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    parser.add_argument("target", nargs="?", type=int, help="version to upgrade to (default: latest)")
+    args = parser.parse_args()
+
+    current = migrations.current_version(database.engine)
+    latest = migrations.latest_version()
+
+    if args.command == "status":
+        print(f"📋 Schema version: {current} (latest: {latest})")
+        for migration in migrations.load_migrations():
+            state = "✅" if migration.version <= current else "⏳"
+            print(f"   {state} {migration.version:04d} {migration.description}")
+        return
+
+    print(f"🔄 Migrating database from version {current} to {args.target or latest}")
+    applied = migrations.upgrade(database.engine, target=args.target)
+    if not applied:
+        print("✅ Database already up to date")
+    else:
+        print(f"🎉 Applied {len(applied)} migration(s)")
+
+
+if __name__ == "__main__":
+    main()
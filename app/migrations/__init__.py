@@ -0,0 +1,149 @@
+"""Versioned schema migrations.
+
+Each module in app/migrations/versions is named ``vNNNN_<slug>.py`` and defines
+``VERSION``, ``DESCRIPTION`` and ``upgrade(connection)``. ``python -m app.migrate``
+applies the pending ones in order, each in its own transaction, and records
+them in the ``schema_version`` table. App startup only compares versions.
+"""
+import importlib
+import os
+import pkgutil
+import time
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, func
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+from ..database import USE_LOCAL_DB
+from . import versions
+
+# Run pending migrations at startup instead of refusing to start.
+# On by default only for the local SQLite database.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true" if USE_LOCAL_DB else "false").lower() == "true"
+# How long a runner waits for another one holding SQLite's write lock
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+class Migration:
+    def __init__(self, module):
+        self.version = module.VERSION
+        self.description = module.DESCRIPTION
+        self.upgrade = module.upgrade
+        self.name = module.__name__.rsplit(".", 1)[-1]
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d} {self.description}>"
+
+
+def load_migrations() -> list:
+    """All migrations under versions/, ordered and checked for gaps"""
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        if not module_info.name.startswith("v"):
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(Migration(module))
+    migrations.sort(key=lambda m: m.version)
+    for expected, migration in enumerate(migrations, start=1):
+        if migration.version != expected:
+            raise RuntimeError(f"Migration versions must be contiguous: expected {expected}, found {migration!r}")
+    return migrations
+
+
+def latest_version() -> int:
+    migrations = load_migrations()
+    return migrations[-1].version if migrations else 0
+
+
+def current_version(engine) -> int:
+    """Highest applied version, 0 for a database that was never migrated.
+
+    A single SELECT, cheap enough to run on every worker boot.
+    """
+    with engine.connect() as conn:
+        try:
+            return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+        except (OperationalError, ProgrammingError):
+            # schema_version doesn't exist yet
+            return 0
+
+
+def _is_locked(error: OperationalError) -> bool:
+    return "database is locked" in str(error.orig)
+
+
+def _apply(engine, migration) -> bool:
+    """Run one migration in its own transaction; False if another runner applied it"""
+    deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT
+    while True:
+        try:
+            with engine.begin() as conn:
+                conn.execute(schema_version.insert().values(
+                    version=migration.version,
+                    description=migration.description,
+                ))
+                migration.upgrade(conn)
+            return True
+        except IntegrityError:
+            # Another process applied it while we were waiting
+            return False
+        except OperationalError as e:
+            # SQLite has no row locks: a runner kept waiting past busy_timeout
+            # fails with "database is locked" instead of blocking on the row
+            if not _is_locked(e) or time.monotonic() > deadline:
+                raise
+            if current_version(engine) >= migration.version:
+                return False
+            time.sleep(0.5)
+
+
+def upgrade(engine, target: int = None) -> list:
+    """Apply pending migrations up to target (default: latest). Returns those applied.
+
+    Safe to run from several processes at once: each migration first inserts its
+    schema_version row, so a concurrent runner blocks on that row and then skips
+    the migration when the first runner commits. On SQLite, where the whole
+    database is locked instead, it retries until the first runner is done.
+    """
+    try:
+        schema_version.create(bind=engine, checkfirst=True)
+    except (OperationalError, ProgrammingError):
+        # Created by a concurrent runner between the check and the CREATE
+        pass
+
+    applied = []
+    for migration in load_migrations():
+        if target is not None and migration.version > target:
+            break
+        if migration.version <= current_version(engine):
+            continue
+        if not _apply(engine, migration):
+            continue
+        print(f"✅ Applied migration {migration.version:04d}: {migration.description}")
+        applied.append(migration)
+    return applied
+
+
+def ensure_schema(engine):
+    """Startup check: the database must be at the version this code expects"""
+    current = current_version(engine)
+    latest = latest_version()
+    if current == latest:
+        return
+    if current > latest:
+        print(f"⚠️  Database schema is at version {current}, newer than this code ({latest})")
+        return
+    if AUTO_MIGRATE:
+        upgrade(engine)
+        return
+    raise RuntimeError(
+        f"Database schema is at version {current} but this code expects {latest}. "
+        f"Run `python -m app.migrate` before starting the app."
+    )
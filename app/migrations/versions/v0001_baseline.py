@@ -0,0 +1,120 @@
+"""Baseline schema: the tables as they stood before versioned migrations.
+
+Replaces Base.metadata.create_all() at import time and migrate_new_structure.py.
+The definitions are frozen here on purpose; later schema changes belong in
+their own migration, not in this file.
+"""
+import enum
+
+from sqlalchemy import (
+    CHAR, MetaData, Table, Column, Integer, String, DateTime, Enum, ForeignKey, TypeDecorator, func,
+)
+from sqlalchemy.dialects.postgresql import UUID
+
+VERSION = 1
+DESCRIPTION = "baseline schema"
+
+
+class _GUID(TypeDecorator):
+    """models.GUID as it stood at the baseline (only its DDL is used here):
+    PostgreSQL's UUID type, otherwise CHAR(36).
+    """
+    impl = CHAR
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(UUID())
+        return dialect.type_descriptor(CHAR(36))
+
+
+class _UserRole(enum.Enum):
+    ADMIN = "admin"
+    OWNER = "owner"
+    TENANT = "tenant"
+
+
+metadata = MetaData()
+
+Table(
+    "apartments", metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("apartment_id", String, unique=True, index=True),
+    Column("apartment_uuid", _GUID(), unique=True, index=True),
+    Column("apartment_name", String, nullable=False),
+    Column("apartment_address", String, nullable=False),
+    Column("admin_email", String, nullable=False),
+    Column("total_floors", Integer),
+    Column("total_flats", Integer),
+    Column("water_bill_mode", Integer, nullable=False, default=0),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("flat_uuid", _GUID(), unique=True, index=True),
+    Column("flat_id", String, index=True),
+    Column("apartment_uuid", _GUID(), index=True),
+    Column("apartment_id", String, index=True),
+    Column("user_name", String),
+    Column("user_phone_number", String),
+    Column("user_email_id", String, index=True),
+    Column("flat_number", String),
+    Column("flat_floor", String),
+    Column("role", Enum(_UserRole, name="userrole")),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "otp_verifications", metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("email", String, nullable=False, index=True),
+    Column("apartment_id", String, nullable=False),
+    Column("otp_code", String, nullable=False),
+    Column("is_verified", Integer),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "flatmate_invitations", metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("invitation_uuid", _GUID(), unique=True, index=True),
+    Column("apartment_id", String, nullable=False, index=True),
+    Column("flat_number", String, nullable=False),
+    Column("floor", String, nullable=False),
+    Column("invited_email", String, nullable=False, index=True),
+    Column("invitation_code", String, nullable=False, unique=True, index=True),
+    Column("invited_by_admin_email", String, nullable=False),
+    Column("is_used", Integer),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("used_at", DateTime(timezone=True), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "refresh_tokens", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("token", String, unique=True, index=True, nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("is_revoked", Integer),
+)
+
+Table(
+    "security", metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("apartment_id", String, nullable=False, index=True),
+    Column("name", String, nullable=False),
+    Column("phone_number", String, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def upgrade(connection):
+    # checkfirst: databases created before migrations already have these tables
+    metadata.create_all(bind=connection, checkfirst=True)
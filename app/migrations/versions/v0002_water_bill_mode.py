@@ -0,0 +1,15 @@
+"""apartments.water_bill_mode (ported from migrate_water_billing.py)"""
+from sqlalchemy import inspect, text
+
+VERSION = 2
+DESCRIPTION = "add apartments.water_bill_mode"
+
+
+def upgrade(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("apartments")}
+    if "water_bill_mode" in columns:
+        return
+    # 0 = Meter based, 1 = Tanker based
+    connection.execute(text(
+        "ALTER TABLE apartments ADD COLUMN water_bill_mode INTEGER NOT NULL DEFAULT 0"
+    ))
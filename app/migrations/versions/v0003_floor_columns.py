@@ -0,0 +1,16 @@
+"""Floor columns on invitations and users (ported from add_floor_field_migration.py)"""
+from sqlalchemy import inspect, text
+
+VERSION = 3
+DESCRIPTION = "add flatmate_invitations.floor and users.flat_floor"
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    invitation_columns = {column["name"] for column in inspector.get_columns("flatmate_invitations")}
+    if "floor" not in invitation_columns:
+        connection.execute(text("ALTER TABLE flatmate_invitations ADD COLUMN floor TEXT"))
+
+    user_columns = {column["name"] for column in inspector.get_columns("users")}
+    if "flat_floor" not in user_columns:
+        connection.execute(text("ALTER TABLE users ADD COLUMN flat_floor TEXT"))
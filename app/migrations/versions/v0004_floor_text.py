@@ -0,0 +1,31 @@
+"""users.flat_floor INTEGER -> TEXT for Indian floor conventions (ported from convert_floor_to_text.py)
+
+Floors are stored as "B", "G", "1", "2", "M", "UG", ...
+"""
+from sqlalchemy import inspect, text
+
+VERSION = 4
+DESCRIPTION = "convert users.flat_floor to text"
+
+
+def upgrade(connection):
+    column = next(
+        (c for c in inspect(connection).get_columns("users") if c["name"] == "flat_floor"),
+        None,
+    )
+    if column is None or "INT" not in str(column["type"]).upper():
+        return
+
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(
+            "ALTER TABLE users ALTER COLUMN flat_floor TYPE VARCHAR USING flat_floor::varchar"
+        ))
+        return
+
+    # SQLite can't change a column type in place: copy into a new column
+    connection.execute(text("ALTER TABLE users ADD COLUMN flat_floor_text TEXT"))
+    connection.execute(text(
+        "UPDATE users SET flat_floor_text = CAST(flat_floor AS TEXT) WHERE flat_floor IS NOT NULL"
+    ))
+    connection.execute(text("ALTER TABLE users DROP COLUMN flat_floor"))
+    connection.execute(text("ALTER TABLE users RENAME COLUMN flat_floor_text TO flat_floor"))
@@ -0,0 +1,45 @@
+"""Composite and partial indexes for the hot auth-flow lookups.
+
+Single-column indexes that are now a prefix of a composite index are dropped.
+"""
+from sqlalchemy import text
+
+VERSION = 5
+DESCRIPTION = "composite and partial indexes for auth lookups"
+
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_apartment_id_user_email_id ON users (apartment_id, user_email_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_apartment_id_flat_number ON users (apartment_id, flat_number)",
+    "CREATE INDEX IF NOT EXISTS ix_otp_verifications_email_apartment_id_otp_code "
+    "ON otp_verifications (email, apartment_id, otp_code)",
+    "CREATE INDEX IF NOT EXISTS ix_flatmate_invitations_lookup "
+    "ON flatmate_invitations (apartment_id, flat_number, invited_email, is_used, expires_at)",
+    "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id_is_revoked ON refresh_tokens (user_id, is_revoked)",
+    "CREATE INDEX IF NOT EXISTS ix_security_apartment_id_created_at ON security (apartment_id, created_at)",
+]
+
+# Partial indexes over the live rows. PostgreSQL only: SQLite's planner always
+# picks the composite index covering the same columns, so there they'd only cost writes.
+POSTGRES_PARTIAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_flatmate_invitations_pending "
+    "ON flatmate_invitations (apartment_id, flat_number, invited_email, expires_at) WHERE is_used = 0",
+    "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_active_user_id ON refresh_tokens (user_id) WHERE is_revoked = 0",
+]
+
+# Covered by the composite indexes above
+DROP_INDEXES = [
+    "ix_users_apartment_id",
+    "ix_otp_verifications_email",
+    "ix_flatmate_invitations_apartment_id",
+    "ix_security_apartment_id",
+]
+
+
+def upgrade(connection):
+    for statement in CREATE_INDEXES:
+        connection.execute(text(statement))
+    if connection.dialect.name == "postgresql":
+        for statement in POSTGRES_PARTIAL_INDEXES:
+            connection.execute(text(statement))
+    for name in DROP_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -0,0 +1,40 @@
+"""Store UUID columns as 16-byte BLOBs on SQLite (PostgreSQL keeps its native UUID).
+
+Existing rows hold the 36-char text form. The declared column type is left
+alone: SQLite stores a BLOB as-is in any column, so only the values are
+rewritten. Run VACUUM afterwards to give the freed pages back.
+"""
+import uuid
+
+from sqlalchemy import text
+
+VERSION = 6
+DESCRIPTION = "store UUIDs as 16-byte blobs on SQLite"
+
+UUID_COLUMNS = [
+    ("apartments", "apartment_uuid"),
+    ("users", "flat_uuid"),
+    ("users", "apartment_uuid"),
+    ("flatmate_invitations", "invitation_uuid"),
+]
+
+BATCH_SIZE = 1000
+
+
+def upgrade(connection):
+    if connection.dialect.name != "sqlite":
+        return
+
+    for table, column in UUID_COLUMNS:
+        rows = connection.execute(text(
+            f"SELECT rowid, {column} FROM {table} WHERE typeof({column}) = 'text'"
+        )).fetchall()
+        converted = []
+        for rowid, value in rows:
+            try:
+                converted.append({"rowid": rowid, "value": uuid.UUID(value).bytes})
+            except ValueError:
+                print(f"⚠️  {table}.{column} rowid {rowid}: not a UUID ({value!r}), left as text")
+        update = text(f"UPDATE {table} SET {column} = :value WHERE rowid = :rowid")
+        for start in range(0, len(converted), BATCH_SIZE):
+            connection.execute(update, converted[start:start + BATCH_SIZE])
@@ -0,0 +1,44 @@
+"""Store refresh tokens as their SHA-256 digest instead of the plaintext.
+
+Existing tokens are hashed in place, so sessions survive the upgrade; then the
+token column and its index are dropped.
+"""
+import hashlib
+
+from sqlalchemy import inspect, text
+
+VERSION = 7
+DESCRIPTION = "replace refresh_tokens.token with token_hash"
+
+BATCH_SIZE = 1000
+
+
+def upgrade(connection):
+    postgres = connection.dialect.name == "postgresql"
+    columns = {c["name"] for c in inspect(connection).get_columns("refresh_tokens")}
+
+    if "token_hash" not in columns:
+        column_type = "BYTEA" if postgres else "BLOB"
+        connection.execute(text(f"ALTER TABLE refresh_tokens ADD COLUMN token_hash {column_type}"))
+
+    if "token" in columns:
+        rows = connection.execute(text(
+            "SELECT id, token FROM refresh_tokens WHERE token_hash IS NULL"
+        )).fetchall()
+        hashed = [
+            {"id": row_id, "token_hash": hashlib.sha256(token.encode()).digest()}
+            for row_id, token in rows
+        ]
+        update = text("UPDATE refresh_tokens SET token_hash = :token_hash WHERE id = :id")
+        for start in range(0, len(hashed), BATCH_SIZE):
+            connection.execute(update, hashed[start:start + BATCH_SIZE])
+
+        # SQLite refuses to drop an indexed column
+        connection.execute(text("DROP INDEX IF EXISTS ix_refresh_tokens_token"))
+        connection.execute(text("ALTER TABLE refresh_tokens DROP COLUMN token"))
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_refresh_tokens_token_hash ON refresh_tokens (token_hash)"
+    ))
+    if postgres:
+        connection.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL"))
@@ -0,0 +1,26 @@
+"""Refresh token families and sealed successors, for the rotation grace window.
+
+Existing tokens get no family; rotation assigns one (see ROTATE_LIVE_REFRESH_TOKEN).
+"""
+from sqlalchemy import inspect, text
+
+VERSION = 8
+DESCRIPTION = "add refresh_tokens.family_id, rotated_at and successor_sealed"
+
+
+def upgrade(connection):
+    postgres = connection.dialect.name == "postgresql"
+    columns = {c["name"] for c in inspect(connection).get_columns("refresh_tokens")}
+
+    added = {
+        "family_id": "UUID" if postgres else "BLOB",
+        "rotated_at": "TIMESTAMP WITH TIME ZONE" if postgres else "DATETIME",
+        "successor_sealed": "BYTEA" if postgres else "BLOB",
+    }
+    for name, column_type in added.items():
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE refresh_tokens ADD COLUMN {name} {column_type}"))
+
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family_id ON refresh_tokens (family_id)"
+    ))
@@ -0,0 +1,36 @@
+"""Access token revocations (revoked jtis and per-user cutoffs)"""
+from sqlalchemy import text
+
+VERSION = 9
+DESCRIPTION = "add token_revocations"
+
+
+def upgrade(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS token_revocations (
+                id SERIAL PRIMARY KEY,
+                jti VARCHAR,
+                user_id INTEGER,
+                not_before TIMESTAMP WITH TIME ZONE,
+                expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+        """))
+    else:
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS token_revocations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                jti VARCHAR,
+                user_id INTEGER,
+                not_before DATETIME,
+                expires_at DATETIME NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_token_revocations_jti ON token_revocations (jti)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_token_revocations_expires_at ON token_revocations (expires_at)"
+    ))
@@ -0,0 +1,33 @@
+"""Per-user nonces of stateless OTPs"""
+from sqlalchemy import text
+
+VERSION = 10
+DESCRIPTION = "add otp_nonces"
+
+
+def upgrade(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS otp_nonces (
+                id SERIAL PRIMARY KEY,
+                apartment_id VARCHAR NOT NULL,
+                email VARCHAR NOT NULL,
+                generation INTEGER NOT NULL DEFAULT 0,
+                last_code VARCHAR,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+        """))
+    else:
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS otp_nonces (
+                id INTEGER PRIMARY KEY,
+                apartment_id VARCHAR NOT NULL,
+                email VARCHAR NOT NULL,
+                generation INTEGER NOT NULL DEFAULT 0,
+                last_code VARCHAR,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_otp_nonces_apartment_id_email ON otp_nonces (apartment_id, email)"
+    ))
@@ -0,0 +1,16 @@
+"""Lease rows for single-worker background jobs (SQLite)"""
+from sqlalchemy import text
+
+VERSION = 11
+DESCRIPTION = "add job_locks"
+
+
+def upgrade(connection):
+    timestamp = "TIMESTAMP WITH TIME ZONE" if connection.dialect.name == "postgresql" else "DATETIME"
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS job_locks (
+            name VARCHAR PRIMARY KEY,
+            holder VARCHAR NOT NULL,
+            locked_until {timestamp} NOT NULL
+        )
+    """))
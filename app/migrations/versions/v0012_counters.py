@@ -0,0 +1,14 @@
+"""Named counters (invitation code blocks)"""
+from sqlalchemy import text
+
+VERSION = 12
+DESCRIPTION = "add counters"
+
+
+def upgrade(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS counters (
+            name VARCHAR PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        )
+    """))
@@ -0,0 +1,42 @@
+"""Transactional email outbox"""
+from sqlalchemy import text
+
+VERSION = 13
+DESCRIPTION = "add email_outbox"
+
+
+def upgrade(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id SERIAL PRIMARY KEY,
+                kind VARCHAR NOT NULL,
+                recipient VARCHAR NOT NULL,
+                payload TEXT,
+                status VARCHAR NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                last_error TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+                sent_at TIMESTAMP WITH TIME ZONE
+            )
+        """))
+    else:
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY,
+                kind VARCHAR NOT NULL,
+                recipient VARCHAR NOT NULL,
+                payload TEXT,
+                status VARCHAR NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at DATETIME NOT NULL,
+                last_error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                sent_at DATETIME
+            )
+        """))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_email_outbox_status_next_attempt_at "
+        "ON email_outbox (status, next_attempt_at)"
+    ))
@@ -1,15 +1,17 @@
-from sqlalchemy import Column, String, Integer, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, Enum, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
-from sqlalchemy import TypeDecorator, CHAR
+from sqlalchemy import TypeDecorator, CHAR, LargeBinary
 from sqlalchemy.orm import relationship
 import uuid
 import enum
 from .database import Base
+from .identifiers import uuid7
 
 class GUID(TypeDecorator):
     """Platform-independent GUID type.
-    Uses PostgreSQL's UUID type, otherwise uses CHAR(36), storing as stringified hex values.
+    Uses PostgreSQL's UUID type, otherwise stores the 16 raw bytes in a BLOB
+    (a third of the size of the 36-char string, in the table and its indexes).
     """
     impl = CHAR
     cache_ok = True
@@ -18,7 +20,7 @@ class GUID(TypeDecorator):
         if dialect.name == 'postgresql':
             return dialect.type_descriptor(UUID())
         else:
-            return dialect.type_descriptor(CHAR(36))
+            return dialect.type_descriptor(LargeBinary(16))
 
     def process_bind_param(self, value, dialect):
         if value is None:
@@ -27,17 +29,46 @@ class GUID(TypeDecorator):
             return str(value)
         else:
             if not isinstance(value, uuid.UUID):
-                return str(uuid.UUID(value))
-            else:
-                return str(value)
+                value = uuid.UUID(value)
+            return value.bytes
 
     def process_result_value(self, value, dialect):
         if value is None:
             return value
-        else:
-            if not isinstance(value, uuid.UUID):
-                return uuid.UUID(value)
-            return value
+        elif isinstance(value, bytes):
+            return uuid.UUID(bytes=value)
+        elif not isinstance(value, uuid.UUID):
+            # Text value written before the switch to binary storage
+            return uuid.UUID(value)
+        return value
+
+    # Fast paths for the binary storage: picked once per dialect instead of
+    # branching on dialect.name for every value, and uuid.UUID values are used as-is.
+    def bind_processor(self, dialect):
+        if dialect.name == 'postgresql':
+            return super().bind_processor(dialect)
+        UUID_ = uuid.UUID
+
+        def process(value):
+            if value is None:
+                return None
+            if value.__class__ is UUID_:
+                return value.bytes
+            return UUID_(value).bytes
+        return process
+
+    def result_processor(self, dialect, coltype):
+        if dialect.name == 'postgresql':
+            return super().result_processor(dialect, coltype)
+        UUID_ = uuid.UUID
+
+        def process(value):
+            if value is None:
+                return None
+            if value.__class__ is bytes:
+                return UUID_(bytes=value)
+            return UUID_(value)
+        return process
 
 class UserRole(enum.Enum):
     ADMIN = "admin"
@@ -49,7 +80,7 @@ class Apartment(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     apartment_id = Column(String, unique=True, index=True)
-    apartment_uuid = Column(GUID(), unique=True, index=True, default=uuid.uuid4)
+    apartment_uuid = Column(GUID(), unique=True, index=True, default=uuid7)
     apartment_name = Column(String, nullable=False)
     apartment_address = Column(String, nullable=False)
     admin_email = Column(String, nullable=False)
@@ -60,12 +91,18 @@ class Apartment(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # login / verify-otp / assign-tenant: email within an apartment
+        Index("ix_users_apartment_id_user_email_id", "apartment_id", "user_email_id"),
+        # signup: existing occupant of a flat
+        Index("ix_users_apartment_id_flat_number", "apartment_id", "flat_number"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    flat_uuid = Column(GUID(), unique=True, index=True, default=uuid.uuid4)
+    flat_uuid = Column(GUID(), unique=True, index=True, default=uuid7)
     flat_id = Column(String, index=True)
     apartment_uuid = Column(GUID(), index=True)
-    apartment_id = Column(String, index=True)
+    apartment_id = Column(String)
     user_name = Column(String)
     user_phone_number = Column(String)
     user_email_id = Column(String, index=True)
@@ -77,9 +114,12 @@ class User(Base):
 
 class OTPVerification(Base):
     __tablename__ = "otp_verifications"
+    __table_args__ = (
+        Index("ix_otp_verifications_email_apartment_id_otp_code", "email", "apartment_id", "otp_code"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    email = Column(String, nullable=False, index=True)
+    email = Column(String, nullable=False)
     apartment_id = Column(String, nullable=False)
     otp_code = Column(String, nullable=False)
     is_verified = Column(Integer, default=0)  # 0=Not verified, 1=Verified
@@ -88,10 +128,23 @@ class OTPVerification(Base):
 
 class FlatmateInvitation(Base):
     __tablename__ = "flatmate_invitations"
+    __table_args__ = (
+        Index(
+            "ix_flatmate_invitations_lookup",
+            "apartment_id", "flat_number", "invited_email", "is_used", "expires_at",
+        ),
+        # Pending invitations only (PostgreSQL; SQLite's planner always prefers the
+        # composite above). Queries must compare is_used to a literal 0 to use it.
+        Index(
+            "ix_flatmate_invitations_pending",
+            "apartment_id", "flat_number", "invited_email", "expires_at",
+            postgresql_where=text("is_used = 0"),
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    invitation_uuid = Column(GUID(), unique=True, index=True, default=uuid.uuid4)
-    apartment_id = Column(String, nullable=False, index=True)
+    invitation_uuid = Column(GUID(), unique=True, index=True, default=uuid7)
+    apartment_id = Column(String, nullable=False)
     flat_number = Column(String, nullable=False)
     floor = Column(String, nullable=False)  # Can be "B", "G", "1", "2", etc.
     invited_email = Column(String, nullable=False, index=True)
@@ -104,21 +157,111 @@ class FlatmateInvitation(Base):
 
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id_is_revoked", "user_id", "is_revoked"),
+        # Live tokens only (PostgreSQL), see ix_flatmate_invitations_pending
+        Index(
+            "ix_refresh_tokens_active_user_id",
+            "user_id",
+            postgresql_where=text("is_revoked = 0"),
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True, nullable=False)
+    # SHA-256 of the opaque token handed to the client; the token itself is never stored
+    token_hash = Column(LargeBinary(32), unique=True, index=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_revoked = Column(Integer, default=0)  # 0=Active, 1=Revoked
+    # Every token rotated from one login shares its family; see app/refresh_tokens.py
+    family_id = Column(GUID(), index=True, default=uuid7)
+    rotated_at = Column(DateTime(timezone=True), nullable=True)
+    # The token that replaced this one, encrypted with a key derived from this token
+    successor_sealed = Column(LargeBinary(32), nullable=True)
 
     user = relationship("User")
 
+class TokenRevocation(Base):
+    """A revoked access token (by jti), or a cutoff revoking all of a user's
+    access tokens issued before not_before. See app/revocations.py."""
+    __tablename__ = "token_revocations"
+    # AUTOINCREMENT: ids never go backwards, workers read new rows by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String, unique=True, index=True, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    not_before = Column(DateTime(timezone=True), nullable=True)
+    # When every token this row can match has expired; the row can be deleted then
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class OTPNonce(Base):
+    """Per-user nonce of stateless OTPs (OTP_MODE=stateless, see app/otp_store.py).
+
+    generation counts the codes used so far; it is mixed into every code, so
+    using one invalidates the others. Written on verification only."""
+    __tablename__ = "otp_nonces"
+    __table_args__ = (
+        Index("ix_otp_nonces_apartment_id_email", "apartment_id", "email", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    apartment_id = Column(String, nullable=False)
+    email = Column(String, nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+    last_code = Column(String)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class JobLock(Base):
+    """Lease that lets one worker at a time run a background job on SQLite
+    (PostgreSQL uses advisory locks). See app/sweeper.py."""
+    __tablename__ = "job_locks"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    locked_until = Column(DateTime(timezone=True), nullable=False)
+
+class Counter(Base):
+    """Named counters handed out in blocks (see app/invitation_codes.py)"""
+    __tablename__ = "counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class EmailOutbox(Base):
+    """An email to send, written in the transaction that makes it necessary and
+    delivered by the worker pool in app/email_outbox.py.
+
+    status: pending (next_attempt_at says when), sent or dead (gave up after
+    EMAIL_MAX_ATTEMPTS). The payload holds codes, so it is cleared once sent."""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # claiming due emails: pending, oldest next_attempt_at first
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    recipient = Column(String, nullable=False)
+    payload = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
 class Security(Base):
     __tablename__ = "security"
+    __table_args__ = (
+        # security list: newest first within an apartment
+        Index("ix_security_apartment_id_created_at", "apartment_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    apartment_id = Column(String, nullable=False, index=True)
+    apartment_id = Column(String, nullable=False)
     name = Column(String, nullable=False)
     phone_number = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
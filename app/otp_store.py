@@ -0,0 +1,362 @@
+"""Where one-time login codes live between /signin (or /login) and /verify-otp.
+
+OTP_STORE selects the backend:
+
+- ``sql`` (default): the otp_verifications table, changed on the request's
+  session so it commits with the rest of the request;
+- ``memory``: a dict in this process. Only for a single worker: a code issued
+  by one worker is unknown to the others;
+- ``redis``: any Redis-protocol server at OTP_REDIS_URL. Keys expire on their
+  own, and OTP traffic no longer touches the database at all.
+
+Handlers get the configured store through the get_otp_store dependency:
+
+    code = await otp_store.new_code(db, email, apartment_id)
+    await otp_store.issue(db, email, apartment_id, code)     # replaces earlier codes
+    await otp_store.consume(db, email, apartment_id, code)   # -> OTPCheck
+
+The memory and Redis stores apply changes immediately, not at commit: a code
+consumed by a request that then fails stays used, and the user asks for a new one.
+Codes are remembered OTP_STATUS_RETENTION_SECONDS past expiry so that a late
+attempt is told the code expired or was used, not that it is wrong.
+
+With OTP_MODE=stateless nothing is stored when a code is sent: the code is an
+HMAC of (OTP_SECRET_KEY, email, apartment, time window, per-user nonce), and
+/verify-otp recomputes it. A code is accepted in the window it was sent in and
+the next one, so it lives between OTP_EXPIRE_MINUTES and twice that. The nonce
+counts the codes used so far and is the only thing written (on verification,
+to OTP_STORE), so using a code invalidates it and every other outstanding one.
+Asking again within a window sends the same code. Anyone who knows the key can
+derive codes, so stateless mode refuses to start without OTP_SECRET_KEY or a
+SECRET_KEY of its own.
+"""
+import enum
+import hashlib
+import hmac
+import os
+import random
+import string
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import statements
+from .jwt_keys import DEFAULT_SECRET_KEY
+from .models import OTPVerification, OTPNonce
+from .resp import RespClient
+
+OTP_STORE = os.getenv("OTP_STORE", "sql").lower()
+OTP_REDIS_URL = os.getenv("OTP_REDIS_URL", "redis://localhost:6379/0")
+OTP_EXPIRE_MINUTES = 10
+OTP_STATUS_RETENTION_SECONDS = int(os.getenv("OTP_STATUS_RETENTION_SECONDS", "3600"))
+OTP_MODE = os.getenv("OTP_MODE", "stored").lower()
+OTP_SECRET_KEY = os.getenv("OTP_SECRET_KEY") or os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+
+
+def generate_otp() -> str:
+    """Generate a 4-digit OTP"""
+    return ''.join(random.choices(string.digits, k=4))
+
+
+class OTPCheck(enum.Enum):
+    VALID = "valid"
+    USED = "used"
+    EXPIRED = "expired"
+    INVALID = "invalid"
+
+
+class OTPStore(ABC):
+    """Interface of the OTP backends; db is the request's session (only the SQL store uses it)"""
+
+    async def new_code(self, db: AsyncSession, email: str, apartment_id: str) -> str:
+        return generate_otp()
+
+    @abstractmethod
+    async def issue(self, db: AsyncSession, email: str, apartment_id: str, code: str,
+                    ttl_seconds: int = OTP_EXPIRE_MINUTES * 60):
+        ...
+
+    @abstractmethod
+    async def consume(self, db: AsyncSession, email: str, apartment_id: str, code: str) -> OTPCheck:
+        """Use up the code if it is live; otherwise say why it can't be used"""
+
+
+class SQLOTPStore(OTPStore):
+    """otp_verifications rows, staged on the request's session"""
+
+    async def issue(self, db, email, apartment_id, code, ttl_seconds=OTP_EXPIRE_MINUTES * 60):
+        # Delete any existing OTP for this email/apartment combination
+        await db.execute(
+            delete(OTPVerification).where(
+                OTPVerification.email == email,
+                OTPVerification.apartment_id == apartment_id,
+            )
+        )
+        db.add(OTPVerification(
+            email=email,
+            apartment_id=apartment_id,
+            otp_code=code,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds),
+        ))
+
+    async def consume(self, db, email, apartment_id, code):
+        # One query whatever the outcome; the reason for a failure is read off the row
+        candidate = (await db.execute(statements.OTP_CANDIDATE, {
+            "email": email, "apartment_id": apartment_id, "otp_code": code, "now": datetime.utcnow(),
+        })).first()
+        if candidate is None:
+            return OTPCheck.INVALID
+        otp_record, live = candidate
+        if otp_record.is_verified:
+            return OTPCheck.USED
+        if not live:
+            return OTPCheck.EXPIRED
+        otp_record.is_verified = 1
+        return OTPCheck.VALID
+
+
+class _MemoryOTP:
+    __slots__ = ("code", "expires_at", "used")
+
+    def __init__(self, code: str, expires_at: float):
+        self.code = code
+        self.expires_at = expires_at
+        self.used = False
+
+
+class MemoryOTPStore(OTPStore):
+    """Codes in a dict of this process (single worker / development only)"""
+
+    def __init__(self, retention_seconds: int = OTP_STATUS_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._codes: dict[tuple, _MemoryOTP] = {}
+        self._purged_at = time.time()
+
+    def _purge(self, now: float):
+        """Forget codes past their retention (at most once a minute)"""
+        if now - self._purged_at < 60:
+            return
+        self._purged_at = now
+        stale = [key for key, otp in self._codes.items() if otp.expires_at + self.retention_seconds <= now]
+        for key in stale:
+            del self._codes[key]
+
+    async def issue(self, db, email, apartment_id, code, ttl_seconds=OTP_EXPIRE_MINUTES * 60):
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            self._codes[(apartment_id, email)] = _MemoryOTP(code, now + ttl_seconds)
+
+    async def consume(self, db, email, apartment_id, code):
+        now = time.time()
+        with self._lock:
+            otp = self._codes.get((apartment_id, email))
+            if otp is None or otp.code != code or otp.expires_at + self.retention_seconds <= now:
+                return OTPCheck.INVALID
+            if otp.used:
+                return OTPCheck.USED
+            if otp.expires_at <= now:
+                return OTPCheck.EXPIRED
+            otp.used = True
+            return OTPCheck.VALID
+
+
+class RedisOTPStore(OTPStore):
+    """Codes in a Redis-protocol server (needs SET ... GET, Redis >= 6.2 or compatible).
+
+    otp:<apartment>:<email> holds the current code; otp:<apartment>:<email>:<code>
+    holds "live:<expiry ms>" or "used". Both expire after the retention period.
+    Consuming swaps "live" for "used" with one SET ... XX GET, so of concurrent
+    attempts with the same code exactly one succeeds.
+    """
+
+    def __init__(self, client: RespClient, retention_seconds: int = OTP_STATUS_RETENTION_SECONDS):
+        self.client = client
+        self.retention_seconds = retention_seconds
+
+    @staticmethod
+    def _current_key(email: str, apartment_id: str) -> str:
+        return f"otp:{apartment_id}:{email}"
+
+    async def issue(self, db, email, apartment_id, code, ttl_seconds=OTP_EXPIRE_MINUTES * 60):
+        expires_ms = int((time.time() + ttl_seconds) * 1000)
+        keep_ms = (ttl_seconds + self.retention_seconds) * 1000
+        current_key = self._current_key(email, apartment_id)
+        await self.client.execute("SET", f"{current_key}:{code}", f"live:{expires_ms}", "PX", keep_ms)
+        await self.client.execute("SET", current_key, code, "PX", keep_ms)
+
+    async def consume(self, db, email, apartment_id, code):
+        current_key = self._current_key(email, apartment_id)
+        code_key = f"{current_key}:{code}"
+        current, state = await self.client.execute("MGET", current_key, code_key)
+        if state is None or current != code:
+            # Unknown, or replaced by a newer code
+            return OTPCheck.INVALID
+        if state == "used":
+            return OTPCheck.USED
+        if int(state.split(":", 1)[1]) <= time.time() * 1000:
+            return OTPCheck.EXPIRED
+        previous = await self.client.execute("SET", code_key, "used", "XX", "KEEPTTL", "GET")
+        return OTPCheck.VALID if previous is not None and previous.startswith("live:") else OTPCheck.USED
+
+
+class OTPNonces(ABC):
+    """Where the stateless store keeps each user's nonce: (generation, last used code)"""
+
+    @abstractmethod
+    async def get(self, db: AsyncSession, email: str, apartment_id: str) -> tuple:
+        ...
+
+    @abstractmethod
+    async def advance(self, db: AsyncSession, email: str, apartment_id: str, seen: int, code: str) -> bool:
+        """Move the generation on from seen; False if another verification did first"""
+
+
+class SQLOTPNonces(OTPNonces):
+    """otp_nonces rows, staged on the request's session"""
+
+    async def get(self, db, email, apartment_id):
+        row = (await db.execute(
+            statements.OTP_NONCE_BY_APARTMENT_EMAIL, {"apartment_id": apartment_id, "email": email}
+        )).scalars().first()
+        return (row.generation, row.last_code) if row is not None else (0, None)
+
+    async def advance(self, db, email, apartment_id, seen, code):
+        if seen:
+            result = await db.execute(statements.ADVANCE_OTP_NONCE, {
+                "apartment_id": apartment_id, "email": email, "seen": seen, "code": code,
+            })
+            return result.rowcount == 1
+        # First code of this user: create the row unless a concurrent verification just did
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        result = await db.execute(
+            dialect.insert(OTPNonce)
+            .values(apartment_id=apartment_id, email=email, generation=1, last_code=code)
+            .on_conflict_do_nothing(index_elements=["apartment_id", "email"])
+        )
+        return result.rowcount == 1
+
+
+class MemoryOTPNonces(OTPNonces):
+    """Nonces in a dict of this process (single worker / development only)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nonces: dict[tuple, tuple] = {}
+
+    async def get(self, db, email, apartment_id):
+        return self._nonces.get((apartment_id, email), (0, None))
+
+    async def advance(self, db, email, apartment_id, seen, code):
+        with self._lock:
+            if self._nonces.get((apartment_id, email), (0, None))[0] != seen:
+                return False
+            self._nonces[(apartment_id, email)] = (seen + 1, code)
+            return True
+
+
+class RedisOTPNonces(OTPNonces):
+    """otp-nonce:<apartment>:<email> counts up with INCR; only the caller that
+    moves it from seen to seen + 1 used the code. One small key per user, no expiry."""
+
+    def __init__(self, client: RespClient):
+        self.client = client
+
+    async def get(self, db, email, apartment_id):
+        generation, last_code = await self.client.execute(
+            "MGET", f"otp-nonce:{apartment_id}:{email}", f"otp-last:{apartment_id}:{email}"
+        )
+        return int(generation or 0), last_code
+
+    async def advance(self, db, email, apartment_id, seen, code):
+        if await self.client.execute("INCR", f"otp-nonce:{apartment_id}:{email}") != seen + 1:
+            # Lost to a concurrent verification (the extra increment only retires its codes too)
+            return False
+        await self.client.execute("SET", f"otp-last:{apartment_id}:{email}", code)
+        return True
+
+
+class StatelessOTPStore(OTPStore):
+    """Codes derived with an HMAC instead of stored; see the module docstring"""
+
+    def __init__(self, nonces: OTPNonces, secret: str = OTP_SECRET_KEY,
+                 window_seconds: int = OTP_EXPIRE_MINUTES * 60, clock=time.time):
+        if not secret or secret == DEFAULT_SECRET_KEY:
+            raise RuntimeError(
+                "OTP_MODE=stateless needs OTP_SECRET_KEY, or a SECRET_KEY other than the default: "
+                "with the public default anyone can derive the codes"
+            )
+        self.nonces = nonces
+        self.key = hashlib.sha256(b"flatfund otp\0" + secret.encode()).digest()
+        self.window_seconds = window_seconds
+        self.clock = clock
+
+    def derive(self, email: str, apartment_id: str, window: int, generation: int) -> str:
+        message = f"{apartment_id}\0{email}\0{window}\0{generation}".encode()
+        digest = hmac.new(self.key, message, hashlib.sha256).digest()
+        return "%04d" % (int.from_bytes(digest[:4], "big") % 10000)
+
+    def _window(self) -> int:
+        return int(self.clock() // self.window_seconds)
+
+    async def new_code(self, db, email, apartment_id):
+        generation, _ = await self.nonces.get(db, email, apartment_id)
+        return self.derive(email, apartment_id, self._window(), generation)
+
+    async def issue(self, db, email, apartment_id, code, ttl_seconds=OTP_EXPIRE_MINUTES * 60):
+        pass  # Nothing to store: verification recomputes the code
+
+    async def consume(self, db, email, apartment_id, code):
+        generation, last_code = await self.nonces.get(db, email, apartment_id)
+        window = self._window()
+        if code in (self.derive(email, apartment_id, window, generation),
+                    self.derive(email, apartment_id, window - 1, generation)):
+            if await self.nonces.advance(db, email, apartment_id, generation, code):
+                return OTPCheck.VALID
+            return OTPCheck.USED
+        if code == last_code:
+            return OTPCheck.USED
+        if code == self.derive(email, apartment_id, window - 2, generation):
+            return OTPCheck.EXPIRED
+        return OTPCheck.INVALID
+
+
+def build_otp_nonces(kind: str = OTP_STORE) -> OTPNonces:
+    if kind == "sql":
+        return SQLOTPNonces()
+    if kind == "memory":
+        return MemoryOTPNonces()
+    if kind == "redis":
+        return RedisOTPNonces(RespClient(OTP_REDIS_URL))
+    raise RuntimeError(f"Unknown OTP_STORE {kind!r} (use sql, memory or redis)")
+
+
+def build_otp_store(kind: str = OTP_STORE, mode: str = OTP_MODE) -> OTPStore:
+    if mode == "stateless":
+        return StatelessOTPStore(build_otp_nonces(kind))
+    if mode != "stored":
+        raise RuntimeError(f"Unknown OTP_MODE {mode!r} (use stored or stateless)")
+    if kind == "sql":
+        return SQLOTPStore()
+    if kind == "memory":
+        return MemoryOTPStore()
+    if kind == "redis":
+        return RedisOTPStore(RespClient(OTP_REDIS_URL))
+    raise RuntimeError(f"Unknown OTP_STORE {kind!r} (use sql, memory or redis)")
+
+
+otp_store = build_otp_store()
+if OTP_MODE == "stateless":
+    print(f"🔐 Stateless OTPs, nonces kept in the {OTP_STORE} store")
+elif OTP_STORE != "sql":
+    print(f"🔐 OTPs kept in the {OTP_STORE} store")
+
+
+def get_otp_store() -> OTPStore:
+    return otp_store
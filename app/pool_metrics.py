@@ -0,0 +1,178 @@
+"""Connection pool statistics.
+
+Records how long requests wait for a pooled connection and how long they keep
+it checked out, broken down per route, so the pool can be sized from real data.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# ASGI scope of the request currently being served (set by PoolMetricsMiddleware)
+_current_scope: ContextVar[Optional[dict]] = ContextVar("pool_metrics_scope", default=None)
+
+
+def _current_route() -> str:
+    """Route template of the current request, e.g. /api/v1/apartments/{apartment_id}"""
+    scope = _current_scope.get()
+    if scope is None:
+        return "<no request>"
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    return scope.get("path", "<unknown>")
+
+
+class _RouteStats:
+    __slots__ = ("checkouts", "wait_total", "wait_max", "held_total", "held_max")
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.held_total = 0.0
+        self.held_max = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 3),
+            "avg_checkout_ms": round(self.held_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_checkout_ms": round(self.held_max * 1000, 3),
+        }
+
+
+class PoolMetrics:
+    """Thread-safe per-route wait/checkout-duration counters for one pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[str, _RouteStats] = {}
+        self.timeouts = 0
+
+    def _stats(self, route: str) -> _RouteStats:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = self._routes[route] = _RouteStats()
+        return stats
+
+    def record_wait(self, route: str, seconds: float):
+        with self._lock:
+            stats = self._stats(route)
+            stats.checkouts += 1
+            stats.wait_total += seconds
+            stats.wait_max = max(stats.wait_max, seconds)
+
+    def record_checkout(self, route: str, seconds: float):
+        with self._lock:
+            stats = self._stats(route)
+            stats.held_total += seconds
+            stats.held_max = max(stats.held_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {route: stats.as_dict() for route, stats in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.timeouts = 0
+
+
+class _InstrumentedPoolMixin:
+    """Times Pool.connect() so we know how long callers queue for a connection"""
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        route = _current_route()
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_wait(route, time.perf_counter() - started)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool; keep counting into the same metrics
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(pool):
+    """Attach metrics and checkout/checkin timing to an instrumented pool"""
+    pool.metrics = PoolMetrics()
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        connection_record.info["checked_out_route"] = _current_route()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        route = connection_record.info.pop("checked_out_route", "<unknown>")
+        if started is not None:
+            pool.metrics.record_checkout(route, time.perf_counter() - started)
+
+    return pool
+
+
+def pool_status(pool) -> dict:
+    """Live pool occupancy plus the recorded per-route timings"""
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status["checkout_timeouts"] = metrics.timeouts
+        status["routes"] = metrics.snapshot()
+    return status
+
+
+class PoolMetricsMiddleware:
+    """ASGI middleware exposing the request scope to the pool instrumentation.
+
+    The router fills in scope["route"] before the endpoint runs, so by the time a
+    connection is checked out the route template is available.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
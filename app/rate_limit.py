@@ -0,0 +1,300 @@
+"""Rate limiting of the endpoints that send email or check OTPs.
+
+/signin, /login and /invite-flatmate write a row and send an email per call,
+and /verify-otp is where a 4-digit code can be guessed, so each is limited per
+email, per apartment and per client IP (RATE_LIMITED_ROUTES). A request over
+any of its limits gets 429 with Retry-After, before any handler or database
+work runs.
+
+Limits are token buckets: `capacity` requests at once, refilled at
+capacity / per_seconds a second. RATE_LIMIT_BACKEND selects where they live:
+
+- ``memory`` (default): in this process, in sharded dicts (each shard with
+  its own lock and LRU bound), so a check costs a few microseconds. With
+  several workers each allows the full limit;
+- ``redis``: shared by all workers on a Redis-protocol server, one pipelined
+  round trip per request. Each bucket becomes a counter over a per_seconds
+  window (INCR needs no server-side script). If the server is unreachable,
+  the in-process buckets are used until it is back.
+
+Client IPs come from the connection, or from X-Forwarded-For with
+RATE_LIMIT_TRUST_PROXY=true (behind the load balancer).
+"""
+import hashlib
+import hmac
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from .resp import RespClient
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Bodies are only read for the limited routes, and only this much of them
+MAX_BODY_BYTES = 64 * 1024
+
+
+class Limit(NamedTuple):
+    scope: str  # "ip", "email" or "apt"
+    capacity: int
+    per_seconds: float
+
+
+class RouteLimits(NamedTuple):
+    email_field: Optional[str]
+    limits: tuple
+
+
+RATE_LIMITED_ROUTES = {
+    "/api/v1/signin": RouteLimits("admin_email", (
+        Limit("email", 5, 900), Limit("apt", 200, 3600), Limit("ip", 30, 60),
+    )),
+    "/api/v1/login": RouteLimits("email_id", (
+        Limit("email", 5, 900), Limit("apt", 200, 3600), Limit("ip", 30, 60),
+    )),
+    "/api/v1/verify-otp": RouteLimits("admin_email", (
+        Limit("email", 10, 600), Limit("apt", 500, 3600), Limit("ip", 60, 60),
+    )),
+    "/api/v1/invite-flatmate": RouteLimits("owner_email_id", (
+        Limit("email", 20, 3600), Limit("apt", 100, 3600), Limit("ip", 30, 60),
+    )),
+}
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [tokens, updated_at, allowed, denied], least recently used first
+        self.buckets: OrderedDict = OrderedDict()
+
+
+class TokenBuckets:
+    """In-process token buckets, spread over shards to keep lock hold times short"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, shards: int = 16):
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def take(self, key: str, limit: Limit, now: Optional[float] = None) -> float:
+        """Take a token; 0 if allowed, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        rate = limit.capacity / limit.per_seconds
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                bucket = shard.buckets[key] = [float(limit.capacity), now, 0, 0]
+                if len(shard.buckets) > self.max_keys_per_shard:
+                    shard.buckets.popitem(last=False)
+            else:
+                shard.buckets.move_to_end(key)
+            tokens = min(float(limit.capacity), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                bucket[2] += 1
+                return 0.0
+            bucket[0] = tokens
+            bucket[3] += 1
+            return (1 - tokens) / rate
+
+    def count(self, key: str, allowed: bool):
+        """Record a decision made elsewhere (shared backend) in the per-key counters"""
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                bucket = shard.buckets[key] = [0.0, 0.0, 0, 0]
+                if len(shard.buckets) > self.max_keys_per_shard:
+                    shard.buckets.popitem(last=False)
+            bucket[2 if allowed else 3] += 1
+
+    def counters(self) -> list:
+        """(key, allowed, denied) of every tracked key"""
+        result = []
+        for shard in self._shards:
+            with shard.lock:
+                result.extend((key, bucket[2], bucket[3]) for key, bucket in shard.buckets.items())
+        return result
+
+
+class RespWindows:
+    """Shared limits on a Redis-protocol server: a counter per key and window"""
+
+    def __init__(self, client: RespClient):
+        self.client = client
+
+    async def take_many(self, checks: list) -> list:
+        """For each (key, limit): 0 if allowed, else seconds until the window resets"""
+        commands = []
+        for key, limit in checks:
+            window_ms = int(limit.per_seconds * 1000)
+            commands += [("SET", f"ratelimit:{key}", 0, "NX", "PX", window_ms),
+                         ("INCR", f"ratelimit:{key}"),
+                         ("PTTL", f"ratelimit:{key}")]
+        replies = await self.client.pipeline(*commands)
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        waits = []
+        for n, (key, limit) in enumerate(checks):
+            count, ttl_ms = replies[3 * n + 1], replies[3 * n + 2]
+            waits.append(0.0 if count <= limit.capacity else max(ttl_ms, 1) / 1000)
+        return waits
+
+
+# Random per process: the IPv4 space is small enough to reverse a plain hash
+_IP_MASK_KEY = secrets.token_bytes(16)
+
+
+def _mask(key: str) -> str:
+    """Hide the email or client IP in keys shown on the health endpoint"""
+    path, scope, value = key.split(":", 2)
+    if scope == "email":
+        local, at, domain = value.rpartition("@")
+        value = f"{local[:2]}***@{domain}" if at else f"{value[:2]}***"
+    elif scope == "ip":
+        # Stable within this worker, so repeat offenders still stand out
+        value = hmac.new(_IP_MASK_KEY, value.encode(), hashlib.sha256).hexdigest()[:12]
+    return f"{path}:{scope}:{value}"
+
+
+class RateLimiter:
+    def __init__(self, backend: str = RATE_LIMIT_BACKEND, trust_proxy: bool = RATE_LIMIT_TRUST_PROXY,
+                 redis_url: str = RATE_LIMIT_REDIS_URL):
+        self.buckets = TokenBuckets()
+        self.shared = RespWindows(RespClient(redis_url)) if backend == "redis" else None
+        self.trust_proxy = trust_proxy
+        self.shared_errors = 0
+        self._shared_down_until = 0.0
+
+    def client_ip(self, scope) -> str:
+        if self.trust_proxy:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def checks(self, path: str, route: RouteLimits, scope, body: dict) -> list:
+        """(key, limit) pairs for one request"""
+        values = {
+            "ip": self.client_ip(scope),
+            "email": str(body.get(route.email_field) or "").strip().lower() or None,
+            "apt": str(body.get("apt_id") or "").strip() or None,
+        }
+        return [
+            (f"{path}:{limit.scope}:{values[limit.scope]}", limit)
+            for limit in route.limits
+            if values[limit.scope] is not None
+        ]
+
+    async def check(self, checks: list) -> float:
+        """0 if the request may proceed, else seconds to wait (the longest of its limits)"""
+        if self.shared is not None and time.monotonic() >= self._shared_down_until:
+            try:
+                waits = await self.shared.take_many(checks)
+            except Exception as e:
+                self.shared_errors += 1
+                self._shared_down_until = time.monotonic() + 10
+                print(f"⚠️  Rate limit backend unavailable, limiting per worker: {e}")
+            else:
+                for (key, _), wait in zip(checks, waits):
+                    self.buckets.count(key, not wait)
+                return max(waits, default=0.0)
+        return max((self.buckets.take(key, limit) for key, limit in checks), default=0.0)
+
+    def stats(self, top: int = 10) -> dict:
+        counters = self.buckets.counters()
+        by_route: dict = {}
+        for key, allowed, denied in counters:
+            route = by_route.setdefault(key.split(":", 1)[0], {"allowed": 0, "denied": 0})
+            route["allowed"] += allowed
+            route["denied"] += denied
+        most_denied = sorted((c for c in counters if c[2]), key=lambda c: c[2], reverse=True)[:top]
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "backend": "redis" if self.shared is not None else "memory",
+            "shared_backend_errors": self.shared_errors,
+            "tracked_keys": len(counters),
+            "routes": by_route,
+            "most_denied": [
+                {"key": _mask(key), "allowed": allowed, "denied": denied}
+                for key, allowed, denied in most_denied
+            ],
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimitMiddleware:
+    """Answers 429 with Retry-After for requests over a limit in RATE_LIMITED_ROUTES"""
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter, routes: dict = RATE_LIMITED_ROUTES):
+        self.app = app
+        self.limiter = limiter
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope.get("path")) if scope["type"] == "http" else None
+        if route is None or scope["method"] != "POST" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        # Read the (small JSON) body for the email and apartment, then hand it on
+        chunks, size, more_body = [], 0, True
+        while more_body and size <= MAX_BODY_BYTES:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        try:
+            fields = json.loads(body) if size <= MAX_BODY_BYTES else {}
+        except ValueError:
+            fields = {}
+        if not isinstance(fields, dict):
+            fields = {}
+
+        wait = await self.limiter.check(self.limiter.checks(scope["path"], route, scope, fields))
+        if wait > 0:
+            retry_after = max(1, math.ceil(wait))
+            content = json.dumps({
+                "detail": f"Too many requests. Please try again in {retry_after} seconds."
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(content)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": content})
+            return
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            return await receive()
+
+        await self.app(scope, replay, send)
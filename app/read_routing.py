@@ -0,0 +1,101 @@
+"""Read-your-writes support for read-replica routing.
+
+Read endpoints opt into the replica through get_read_db / get_async_read_db.
+A client that has just written can lag behind on the replica, so:
+
+- any request that committed a write gets a short-lived cookie, and requests
+  carrying it are served from the primary until it expires;
+- clients that don't keep cookies (mobile) can send ``X-Consistency: primary``;
+- within a single request, reads after a write also go to the primary.
+"""
+import os
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "ff_last_write"
+CONSISTENCY_HEADER = b"x-consistency"
+
+# Per-request routing state, shared (by reference) with threadpool workers
+_request_state: ContextVar[Optional[dict]] = ContextVar("read_routing_state", default=None)
+
+
+def use_primary_for_reads() -> bool:
+    """True when the current request must not read from the replica"""
+    state = _request_state.get()
+    if state is None:
+        return False
+    return state["primary"] or state["wrote"]
+
+
+def _mark_write():
+    state = _request_state.get()
+    if state is not None:
+        state["wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_flushed_session(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _record_committed_write(session):
+    if session.info.pop("has_writes", False):
+        _mark_write()
+
+
+def _wants_primary(scope) -> bool:
+    last_write = None
+    for name, value in scope.get("headers", []):
+        if name == CONSISTENCY_HEADER and value.strip().lower() == b"primary":
+            return True
+        if name == b"cookie":
+            cookie = SimpleCookie()
+            try:
+                cookie.load(value.decode("latin-1"))
+            except Exception:
+                continue
+            if READ_YOUR_WRITES_COOKIE in cookie:
+                last_write = cookie[READ_YOUR_WRITES_COOKIE].value
+    if last_write is None:
+        return False
+    try:
+        return time.time() - float(last_write) < READ_YOUR_WRITES_SECONDS
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """Routes a client's reads to the primary for a few seconds after it writes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = {"primary": _wants_primary(scope), "wrote": False}
+        token = _request_state.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; "
+                    f"Max-Age={READ_YOUR_WRITES_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_state.reset(token)
@@ -0,0 +1,259 @@
+"""Refresh token issue and rotation.
+
+Refresh tokens are opaque random strings stored as their SHA-256 digest. Each
+use rotates the token: the old one is revoked and a successor is issued.
+
+A client that fires several refreshes at once (the mobile app does when it
+resumes) must not be logged out by its own rotation, so within
+REFRESH_GRACE_SECONDS of a rotation the old token keeps yielding the same
+successor:
+
+- in one process, concurrent refreshes of a token share a single rotation
+  (single flight) and the result is remembered for the grace window;
+- across processes, the rotated row keeps its successor encrypted with a key
+  derived from the old token (``successor_sealed``), so only a holder of the
+  old token can recover it, and any worker can hand it out again.
+
+Tokens rotated from one login form a family. Presenting a rotated token after
+the grace window means it was copied, so with REFRESH_REUSE_DETECTION the
+whole family is revoked and both the thief and the victim have to log in again.
+"""
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import update, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import statements
+from .identifiers import uuid7
+from .models import RefreshToken
+
+REFRESH_TOKEN_EXPIRE_DAYS = 60  # Long-lived refresh token
+REFRESH_GRACE_SECONDS = float(os.getenv("REFRESH_GRACE_SECONDS", "30"))
+REFRESH_REUSE_DETECTION = os.getenv("REFRESH_REUSE_DETECTION", "true").lower() == "true"
+REFRESH_RESULT_CACHE_SIZE = int(os.getenv("REFRESH_RESULT_CACHE_SIZE", "10000"))
+
+_SEAL_CONTEXT = b"flatfund refresh successor\0"
+
+
+def hash_refresh_token(token: str) -> bytes:
+    """Refresh tokens are stored as their SHA-256 digest only"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _seal_key(token: str) -> bytes:
+    return hashlib.sha256(_SEAL_CONTEXT + token.encode()).digest()
+
+
+def seal_successor(token: str, successor: bytes) -> bytes:
+    """Encrypt the 32 random bytes of the successor under a key only token's holder can derive"""
+    return bytes(a ^ b for a, b in zip(successor, _seal_key(token)))
+
+
+def unseal_successor(token: str, sealed: bytes) -> str:
+    return bytes(a ^ b for a, b in zip(sealed, _seal_key(token))).hex()
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def create_refresh_token(db: AsyncSession, user_id: int, revoke_existing: bool = True) -> str:
+    """Generate a secure opaque refresh token, stage it on the session, and return it.
+
+    Starts a new token family. The caller commits as part of its unit of work.
+    revoke_existing=False skips revoking the user's other tokens.
+    """
+    if revoke_existing:
+        # Invalidate all old refresh tokens for this user for better security.
+        # Literal 0 (not a bound parameter) so the PostgreSQL partial index on live tokens applies.
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == user_id, RefreshToken.is_revoked == literal_column("0"))
+            .values(is_revoked=1)
+        )
+
+    token = secrets.token_bytes(32).hex()
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+class Rotation:
+    __slots__ = ("user_id", "refresh_token", "rotated")
+
+    def __init__(self, user_id: int, refresh_token: str, rotated: bool):
+        self.user_id = user_id
+        self.refresh_token = refresh_token
+        # False when refresh_token is the successor issued by an earlier rotation
+        self.rotated = rotated
+
+
+async def _claim(db: AsyncSession, params: dict) -> Optional[tuple]:
+    """(user_id, family_id) if this caller rotated the live token, else None"""
+    if db.bind.dialect.update_returning:
+        return (await db.execute(statements.CLAIM_REFRESH_TOKEN, params)).first()
+
+    # SQLite before 3.35 has no UPDATE ... RETURNING: check the rowcount instead
+    result = await db.execute(statements.ROTATE_LIVE_REFRESH_TOKEN, params)
+    if result.rowcount != 1:
+        return None
+    claimed = (await db.execute(
+        statements.REFRESH_TOKEN_BY_HASH, {"token_hash": params["claim_hash"]}
+    )).scalars().first()
+    return claimed.user_id, claimed.family_id
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[Rotation]:
+    """Exchange a refresh token for its successor; None if it can't be used.
+
+    Stages the changes on db; the caller commits, also when None is returned
+    (a replayed token revokes its family).
+    """
+    now = datetime.utcnow()
+    token_hash = hash_refresh_token(token)
+    successor = secrets.token_bytes(32)
+    claimed = await _claim(db, {
+        "claim_hash": token_hash,
+        "now": now,
+        "sealed": seal_successor(token, successor),
+        "new_family": uuid7(),
+    })
+    if claimed is not None:
+        user_id, family_id = claimed
+        successor_token = successor.hex()
+        db.add(RefreshToken(
+            token_hash=hash_refresh_token(successor_token),
+            user_id=user_id,
+            family_id=family_id,
+            expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        ))
+        return Rotation(user_id, successor_token, rotated=True)
+
+    row = (await db.execute(
+        statements.REFRESH_TOKEN_BY_HASH, {"token_hash": token_hash}
+    )).scalars().first()
+    if row is None or row.rotated_at is None:
+        # Unknown, expired, or revoked by a new login rather than by rotation
+        return None
+
+    if now - _utc_naive(row.rotated_at) <= timedelta(seconds=REFRESH_GRACE_SECONDS):
+        # A concurrent refresh (possibly on another worker) rotated it just now
+        if row.successor_sealed is None:
+            return None
+        successor_token = unseal_successor(token, row.successor_sealed)
+        current = (await db.execute(
+            statements.REFRESH_TOKEN_BY_HASH, {"token_hash": hash_refresh_token(successor_token)}
+        )).scalars().first()
+        if current is None or current.is_revoked or _utc_naive(current.expires_at) <= now:
+            return None
+        return Rotation(row.user_id, successor_token, rotated=False)
+
+    if REFRESH_REUSE_DETECTION and row.family_id is not None:
+        await db.execute(statements.REVOKE_REFRESH_TOKEN_FAMILY, {"family": row.family_id})
+        print(f"⚠️  Refresh token reuse for user {row.user_id}: revoked token family {row.family_id}")
+    return None
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str, user_id: int):
+    """Stage revoking a refresh token of user_id, with every token rotated from the same login"""
+    token_hash = hash_refresh_token(token)
+    row = (await db.execute(
+        statements.REFRESH_TOKEN_BY_HASH, {"token_hash": token_hash}
+    )).scalars().first()
+    if row is None or row.user_id != user_id:
+        return
+    if row.family_id is not None:
+        await db.execute(statements.REVOKE_REFRESH_TOKEN_FAMILY, {"family": row.family_id})
+    else:
+        row.is_revoked = 1
+    refresh_flights.forget(token_hash)
+
+
+class RefreshFlights:
+    """Single-flight coalescing of refreshes of the same token, per process.
+
+    run(key, fn) awaits fn() once per key at a time; concurrent callers with
+    the same key wait for that call and get its result (or its exception).
+    Successful results are remembered for ttl seconds, so a refresh that
+    arrives just after the rotation finished gets the same token pair too.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._flights: dict = {}
+        self._results: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.rotations = 0
+        self.coalesced = 0
+        self.replayed = 0
+
+    def _cached(self, key: bytes):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._results[key]
+            return None
+        return result
+
+    async def run(self, key: bytes, fn):
+        result = self._cached(key)
+        if result is not None:
+            self.replayed += 1
+            return result
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await fn()
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # retrieved, even if nobody was waiting
+            raise
+        else:
+            flight.set_result(result)
+            self.rotations += 1
+            if self.maxsize > 0 and self.ttl > 0:
+                self._results[key] = (time.monotonic() + self.ttl, result)
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+            return result
+        finally:
+            del self._flights[key]
+
+    def forget(self, key: bytes):
+        self._results.pop(key, None)
+
+    def clear(self):
+        self._results.clear()
+
+    def stats(self) -> dict:
+        return {
+            "grace_seconds": self.ttl,
+            "in_flight": len(self._flights),
+            "remembered": len(self._results),
+            "rotations": self.rotations,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+        }
+
+
+refresh_flights = RefreshFlights(REFRESH_RESULT_CACHE_SIZE, REFRESH_GRACE_SECONDS)
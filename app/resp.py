@@ -0,0 +1,131 @@
+"""Minimal asyncio client for the Redis protocol (RESP2).
+
+Just enough for short-lived keys (OTPs, rate limits): send a command (or a
+pipeline of them), read the reply. Works with Redis, Valkey, KeyDB and any stand-in server speaking
+RESP, so there is no client library to install.
+
+    client = RespClient("redis://:password@localhost:6379/0")
+    await client.execute("SET", "key", "value", "PX", "60000")
+"""
+import asyncio
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """An error reply from the server"""
+
+
+def encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """One reply: str for simple and bulk strings, int, list, or None for nil"""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by server")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RespError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2].decode()
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"unexpected reply type {kind!r}")
+
+
+class RespClient:
+    """Pool of connections to one server; a command takes one while it waits for the reply"""
+
+    def __init__(self, url: str, timeout: float = 2.0, max_idle: int = 16):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password: Optional[str] = parsed.password
+        self.database = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: list = []
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = (reader, writer)
+        try:
+            if self.password:
+                await self._call(connection, "AUTH", self.password)
+            if self.database:
+                await self._call(connection, "SELECT", self.database)
+        except BaseException:
+            writer.close()
+            raise
+        return connection
+
+    @staticmethod
+    async def _call(connection, *args):
+        reader, writer = connection
+        writer.write(encode_command(*args))
+        await writer.drain()
+        return await read_reply(reader)
+
+    @staticmethod
+    async def _call_many(connection, commands):
+        reader, writer = connection
+        writer.write(b"".join(encode_command(*args) for args in commands))
+        await writer.drain()
+        replies = []
+        for _ in commands:
+            try:
+                replies.append(await read_reply(reader))
+            except RespError as e:
+                replies.append(e)
+        return replies
+
+    async def execute(self, *args):
+        """Run one command and return its reply; RespError for an error reply"""
+        (reply,) = await self.pipeline(args)
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def pipeline(self, *commands):
+        """Send several commands in one round trip; their replies, a RespError for an error reply"""
+        connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = await asyncio.wait_for(self._connect(), self.timeout)
+            replies = await asyncio.wait_for(self._call_many(connection, commands), self.timeout)
+        except BaseException:
+            # Timed out or broken: replies may still arrive, so the connection can't be reused
+            if connection is not None:
+                connection[1].close()
+            raise
+        self._release(connection)
+        return replies
+
+    def _release(self, connection):
+        if len(self._idle) < self.max_idle:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            await writer.wait_closed()
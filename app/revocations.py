@@ -0,0 +1,213 @@
+"""Access token revocation.
+
+Access tokens live for 30 days, so logging out has to be able to kill them.
+The token_revocations table holds two kinds of rows:
+
+- a ``jti``: that one access token is revoked (logout);
+- a ``user_id`` with ``not_before``: every access token of the user issued
+  (``iat``) before that time is revoked (logout everywhere, role change).
+
+Checking the table on every request would cost a query per request, so each
+worker keeps a snapshot: a Bloom filter of the revoked jtis and a map of user
+cutoffs. At most every REVOCATION_SYNC_SECONDS it reads the rows added since
+the last one it saw (by id), so a revocation anywhere takes effect everywhere
+within that interval; in the worker that made it, immediately. A token whose
+jti is not in the filter is certainly not revoked; a hit (about 1% false
+positives) is confirmed with one indexed lookup.
+
+The filter can't forget, so it is rebuilt from the live rows every
+REVOCATION_REBUILD_SECONDS, or sooner once it holds more jtis than it was sized
+for. The rebuild also picks up a row whose id was allocated before, but
+committed after, a newer one that was already read (PostgreSQL sequences).
+"""
+import hashlib
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import statements
+from .auth_cache import auth_cache
+from .models import TokenRevocation
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "2"))
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "600"))
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+REVOCATION_FILTER_ERROR_RATE = 0.01
+
+
+def _epoch(value: datetime) -> int:
+    """Whole seconds since the epoch; naive datetimes are UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings (k positions from one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """Per-process snapshot of token_revocations, synced incrementally"""
+
+    def __init__(self, capacity: int, sync_interval: float, rebuild_interval: float):
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._reset(capacity)
+        self.synced_at = 0.0
+        self._syncing = False
+        self.checks = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+        self.revoked = 0
+        self.syncs = 0
+
+    def _reset(self, capacity: int):
+        self.filter = BloomFilter(capacity, REVOCATION_FILTER_ERROR_RATE)
+        self.user_cutoffs: dict[int, int] = {}
+        self.last_id = 0
+        self.built_at = time.monotonic()
+
+    def add_jti(self, jti: str):
+        self.filter.add(jti)
+
+    def add_cutoff(self, user_id: int, not_before: datetime):
+        cutoff = _epoch(not_before)
+        if cutoff > self.user_cutoffs.get(user_id, 0):
+            self.user_cutoffs[user_id] = cutoff
+
+    def _apply(self, rows):
+        for row_id, jti, user_id, not_before in rows:
+            if jti is not None:
+                self.add_jti(jti)
+            if user_id is not None and not_before is not None:
+                self.add_cutoff(user_id, not_before)
+                # Also drops the cached role/apartment of a user whose role changed
+                auth_cache.invalidate_user(user_id)
+            self.last_id = max(self.last_id, row_id)
+
+    async def sync(self, db: AsyncSession):
+        """Read the revocations added since the last sync (all of them when rebuilding)"""
+        now = time.monotonic()
+        rebuild = now - self.built_at >= self.rebuild_interval or self.filter.count > self.filter.capacity
+        rows = (await db.execute(
+            statements.REVOCATIONS_SINCE,
+            {"last_id": 0 if rebuild else self.last_id, "now": datetime.utcnow()},
+        )).all()
+        if rebuild:
+            # Swapped in only now, so concurrent checks never see an empty snapshot
+            jtis = sum(1 for row in rows if row.jti is not None)
+            self._reset(max(REVOCATION_FILTER_CAPACITY, jtis * 2))
+        self._apply(rows)
+        self.synced_at = now
+        self.syncs += 1
+
+    async def _sync_if_stale(self, db: AsyncSession):
+        if time.monotonic() - self.synced_at < self.sync_interval:
+            return
+        if self._syncing and self.synced_at:
+            # Another request is already syncing; the current snapshot is recent enough
+            return
+        self._syncing = True
+        try:
+            await self.sync(db)
+        finally:
+            self._syncing = False
+
+    async def is_revoked(self, db: AsyncSession, claims: dict) -> bool:
+        """Whether the access token with these (verified) claims has been revoked"""
+        await self._sync_if_stale(db)
+        self.checks += 1
+
+        try:
+            user_id = int(claims.get("user_id"))
+        except (TypeError, ValueError):
+            user_id = None
+        cutoff = self.user_cutoffs.get(user_id)
+        # Tokens without iat predate revocation and are caught by any cutoff.
+        # Tokens issued in the cutoff's own second are kept, so a client that
+        # refreshes right after a role change isn't rejected.
+        if cutoff is not None and claims.get("iat", 0) < cutoff:
+            self.revoked += 1
+            return True
+
+        jti = claims.get("jti")
+        if jti is None or jti not in self.filter:
+            return False
+        self.filter_hits += 1
+        if (await db.execute(statements.REVOCATION_BY_JTI, {"jti": jti})).first() is None:
+            self.false_positives += 1
+            return False
+        self.revoked += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "revoked_jtis": self.filter.count,
+            "filter_capacity": self.filter.capacity,
+            "filter_bytes": len(self.filter.bits),
+            "user_cutoffs": len(self.user_cutoffs),
+            "last_id": self.last_id,
+            "sync_interval_seconds": self.sync_interval,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "false_positives": self.false_positives,
+            "revoked": self.revoked,
+            "syncs": self.syncs,
+        }
+
+
+revocation_list = RevocationList(REVOCATION_FILTER_CAPACITY, REVOCATION_SYNC_SECONDS, REVOCATION_REBUILD_SECONDS)
+
+
+def revoke_access_token(db, claims: dict) -> Optional[TokenRevocation]:
+    """Stage the revocation of one access token; None if it has no jti.
+
+    After committing, call revocation_list.add_jti(claims["jti"]) so this
+    worker rejects it at once.
+    """
+    jti = claims.get("jti")
+    if jti is None:
+        return None
+    revocation = TokenRevocation(jti=jti, expires_at=datetime.utcfromtimestamp(claims["exp"]))
+    db.add(revocation)
+    return revocation
+
+
+def revoke_user_tokens(db, user_id: int, expires_at: datetime) -> TokenRevocation:
+    """Stage a cutoff revoking every access token of user_id issued until now.
+
+    expires_at is when a token issued now would expire.
+    After committing, call revocation_list.add_cutoff(user_id, revocation.not_before).
+    """
+    revocation = TokenRevocation(
+        user_id=user_id,
+        not_before=datetime.utcnow(),
+        expires_at=expires_at,
+    )
+    db.add(revocation)
+    return revocation
@@ -19,12 +19,12 @@ def create_apartment(
         )
 
 @router.get("/", response_model=list[schemas.ApartmentOut])
-def get_apartments(db: Session = Depends(database.get_db)):
+def get_apartments(db: Session = Depends(database.get_read_db)):
     """Get all apartments"""
     return crud.get_all_apartments(db)
 
 @router.get("/{apartment_id}", response_model=schemas.ApartmentOut)
-def get_apartment(apartment_id: str, db: Session = Depends(database.get_db)):
+def get_apartment(apartment_id: str, db: Session = Depends(database.get_read_db)):
     """Get apartment by apartment_id"""
     apartment = crud.get_apartment_by_apartment_id(db, apartment_id)
     if not apartment:
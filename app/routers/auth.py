@@ -1,23 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Header
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.responses import JSONResponse
+from typing import Optional
+from sqlalchemy import select, update, delete, literal_column
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-import random
-import string
 import os
 from dotenv import load_dotenv
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
 
-from ..database import get_db
+from ..database import get_db, get_async_db, get_read_db, get_async_read_db
+from ..unit_of_work import UnitOfWork, get_uow
+from .. import email_templates, statements
+from ..auth_cache import auth_cache
+from ..auth_deps import Principal, get_principal
+from ..jwt_keys import key_ring
+from ..identifiers import uuid7
+from ..brevo import BREVO_API_KEY, brevo
+from ..email_outbox import email_outbox
+from ..invitation_codes import invitation_codes
+from ..otp_store import OTP_EXPIRE_MINUTES, OTPCheck, OTPStore, get_otp_store
+from ..refresh_tokens import (
+    create_refresh_token, hash_refresh_token, refresh_flights, revoke_refresh_token, rotate_refresh_token,
+)
+from ..revocations import revocation_list, revoke_access_token, revoke_user_tokens
 import secrets
-from ..models import Apartment, User, OTPVerification, UserRole, FlatmateInvitation, RefreshToken, Security
+from ..models import Apartment, User, UserRole, FlatmateInvitation, RefreshToken, Security
 from ..schemas import (
     SendOTPRequest, VerifyOTPRequest, AuthResponse, AssignTenantRequest, AssignTenantResponse,
     InviteFlatmateRequest, InviteFlatmateResponse, FlatmateSignupRequest, FlatmateSignupResponse,
     SelectApartmentRequest, SelectApartmentResponse, LoginRequest, LoginResponse, RefreshTokenRequest, TokenResponse,
+    LogoutRequest,
     UpdateFlatmateDetailsRequest, UpdateFlatmateDetailsResponse, GetFlatmateDetailsResponse, SuggestedFlatDetails
 )
 
@@ -27,330 +42,19 @@ load_dotenv()
 router = APIRouter(prefix="/api/v1", tags=["authentication"])
 
 # JWT Configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 43200  # 30 days
-REFRESH_TOKEN_EXPIRE_DAYS = 60  # Long-lived refresh token
-
-# Brevo Configuration
-BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 
-def generate_otp() -> str:
-    """Generate a 4-digit OTP"""
-    return ''.join(random.choices(string.digits, k=4))
+# A new invitation code can only clash with one generated before app/invitation_codes.py
+INVITATION_CODE_ATTEMPTS = 3
 
-def generate_invitation_code() -> str:
-    """Generate a 6-character alphanumeric invitation code"""
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(characters, k=6))
 
 def send_otp_email(email: str, otp: str, apartment_name: str):
     """Send OTP via Brevo email service"""
     if not BREVO_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="Email service not configured. Please set BREVO_API_KEY environment variable."
-        )
-    
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-    
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        raise RuntimeError("Email service not configured. Please set BREVO_API_KEY environment variable.")
     
     subject = f"🔐 Your FlatFund Access Code for {apartment_name}"
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>FlatFund OTP Verification</title>
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-            
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-                line-height: 1.6;
-            }}
-            
-            .email-container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(20px);
-                border-radius: 24px;
-                box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                overflow: hidden;
-            }}
-            
-            .header {{
-                background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-                padding: 40px 30px;
-                text-align: center;
-                position: relative;
-                overflow: hidden;
-            }}
-            
-            .header::before {{
-                content: '';
-                position: absolute;
-                top: -50%;
-                right: -50%;
-                width: 200%;
-                height: 200%;
-                background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 70%);
-                animation: float 6s ease-in-out infinite;
-            }}
-            
-            @keyframes float {{
-                0%, 100% {{ transform: translateY(0px) rotate(0deg); }}
-                50% {{ transform: translateY(-20px) rotate(180deg); }}
-            }}
-            
-            .logo {{
-                font-size: 32px;
-                font-weight: 700;
-                color: white;
-                margin-bottom: 10px;
-                position: relative;
-                z-index: 2;
-            }}
-            
-            .header-subtitle {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 16px;
-                font-weight: 500;
-                position: relative;
-                z-index: 2;
-            }}
-            
-            .content {{
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            
-            .greeting {{
-                font-size: 24px;
-                font-weight: 600;
-                color: #1F2937;
-                margin-bottom: 16px;
-            }}
-            
-            .message {{
-                font-size: 16px;
-                color: #6B7280;
-                margin-bottom: 32px;
-                line-height: 1.7;
-            }}
-            
-            .apartment-info {{
-                background: linear-gradient(135deg, #F3F4F6 0%, #E5E7EB 100%);
-                border-radius: 16px;
-                padding: 20px;
-                margin-bottom: 32px;
-                border: 1px solid rgba(0, 0, 0, 0.05);
-            }}
-            
-            .apartment-name {{
-                font-size: 18px;
-                font-weight: 600;
-                color: #374151;
-                margin-bottom: 4px;
-            }}
-            
-            .otp-container {{
-                background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-                border-radius: 20px;
-                padding: 32px;
-                margin: 32px 0;
-                position: relative;
-                overflow: hidden;
-                box-shadow: 0 10px 25px rgba(79, 70, 229, 0.3);
-            }}
-            
-            .otp-container::before {{
-                content: '';
-                position: absolute;
-                top: -2px;
-                left: -2px;
-                right: -2px;
-                bottom: -2px;
-                background: linear-gradient(45deg, #4F46E5, #7C3AED, #EC4899, #EF4444, #F59E0B, #10B981, #06B6D4);
-                border-radius: 22px;
-                z-index: -1;
-                animation: gradient 3s ease infinite;
-                background-size: 400% 400%;
-            }}
-            
-            @keyframes gradient {{
-                0% {{ background-position: 0% 50%; }}
-                50% {{ background-position: 100% 50%; }}
-                100% {{ background-position: 0% 50%; }}
-            }}
-            
-            .otp-label {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 14px;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                margin-bottom: 12px;
-            }}
-            
-            .otp-code {{
-                font-size: 48px;
-                font-weight: 700;
-                color: white;
-                letter-spacing: 8px;
-                margin: 0;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.3);
-                font-family: 'Monaco', 'Menlo', monospace;
-            }}
-            
-            .timer-info {{
-                background: linear-gradient(135deg, #FEF3C7 0%, #FDE68A 100%);
-                border-radius: 12px;
-                padding: 16px 20px;
-                margin: 24px 0;
-                border-left: 4px solid #F59E0B;
-            }}
-            
-            .timer-icon {{
-                font-size: 20px;
-                margin-right: 8px;
-            }}
-            
-            .timer-text {{
-                color: #92400E;
-                font-weight: 500;
-                font-size: 14px;
-            }}
-            
-            .security-note {{
-                background: linear-gradient(135deg, #DBEAFE 0%, #BFDBFE 100%);
-                border-radius: 12px;
-                padding: 20px;
-                margin: 24px 0;
-                border-left: 4px solid #3B82F6;
-            }}
-            
-            .security-text {{
-                color: #1E40AF;
-                font-size: 14px;
-                line-height: 1.6;
-            }}
-            
-            .footer {{
-                background: #F9FAFB;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #E5E7EB;
-            }}
-            
-            .footer-text {{
-                color: #6B7280;
-                font-size: 14px;
-                margin-bottom: 16px;
-            }}
-            
-            .company-info {{
-                color: #9CA3AF;
-                font-size: 12px;
-            }}
-            
-            .divider {{
-                height: 1px;
-                background: linear-gradient(90deg, transparent 0%, #E5E7EB 50%, transparent 100%);
-                margin: 24px 0;
-            }}
-            
-            @media (max-width: 600px) {{
-                .email-container {{
-                    margin: 10px;
-                    border-radius: 20px;
-                }}
-                
-                .content {{
-                    padding: 30px 20px;
-                }}
-                
-                .otp-code {{
-                    font-size: 36px;
-                    letter-spacing: 4px;
-                }}
-                
-                .header {{
-                    padding: 30px 20px;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <div class="logo">🏢 FlatFund</div>
-                <div class="header-subtitle">Secure Apartment Management</div>
-            </div>
-            
-            <div class="content">
-                <div class="greeting">Hello! 👋</div>
-                
-                <div class="message">
-                    You've requested access to your apartment management dashboard. 
-                    Please use the verification code below to complete your sign-in.
-                </div>
-                
-                <div class="apartment-info">
-                    <div class="apartment-name">🏠 {apartment_name}</div>
-                    <div style="color: #6B7280; font-size: 14px;">Your apartment management portal</div>
-                </div>
-                
-                <div class="otp-container">
-                    <div class="otp-label">Your Verification Code</div>
-                    <div class="otp-code">{otp}</div>
-                </div>
-                
-                <div class="timer-info">
-                    <span class="timer-icon">⏰</span>
-                    <span class="timer-text">This code expires in 10 minutes</span>
-                </div>
-                
-                <div class="divider"></div>
-                
-                <div class="security-note">
-                    <div class="security-text">
-                        <strong>🔒 Security Note:</strong><br>
-                        Never share this code with anyone. FlatFund staff will never ask for your verification code.
-                        If you didn't request this code, please ignore this email.
-                    </div>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <div class="footer-text">
-                    Best regards,<br>
-                    <strong>The FlatFund Team</strong>
-                </div>
-                
-                <div class="company-info">
-                    This email was sent from a secure FlatFund server.<br>
-                    © 2025 FlatFund. All rights reserved.
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = email_templates.render("otp", apartment_name=apartment_name, otp=otp)
     
     sender = {"name": "FlatFund Team", "email": "team.nulltheory@gmail.com"}
     to = [{"email": email}]
@@ -363,276 +67,22 @@ def send_otp_email(email: str, otp: str, apartment_name: str):
     )
     
     try:
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        brevo.send(send_smtp_email)
         return True
     except ApiException as e:
         print(f"Exception when calling SMTPApi->send_transac_email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send OTP email")
+        raise RuntimeError("Failed to send OTP email") from e
 
 def send_flatmate_invitation_email(email: str, apartment_name: str, flat_number: str, flat_floor: str, invitation_code: str):
     """Send flatmate invitation email with 6-character code"""
     if not BREVO_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="Email service not configured. Please set BREVO_API_KEY environment variable."
-        )
-    
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-    
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        raise RuntimeError("Email service not configured. Please set BREVO_API_KEY environment variable.")
     
     subject = f"🏠 You're Invited to Join {apartment_name} on FlatFund!"
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>FlatFund Invitation</title>
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-            
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-                line-height: 1.6;
-            }}
-            
-            .email-container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(20px);
-                border-radius: 24px;
-                box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                overflow: hidden;
-            }}
-            
-            .header {{
-                background: linear-gradient(135deg, #10B981 0%, #059669 100%);
-                padding: 40px 30px;
-                text-align: center;
-                position: relative;
-                overflow: hidden;
-            }}
-            
-            .header::before {{
-                content: '';
-                position: absolute;
-                top: -50%;
-                right: -50%;
-                width: 200%;
-                height: 200%;
-                background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 70%);
-                animation: float 6s ease-in-out infinite;
-            }}
-            
-            @keyframes float {{
-                0%, 100% {{ transform: translateY(0px) rotate(0deg); }}
-                50% {{ transform: translateY(-20px) rotate(180deg); }}
-            }}
-            
-            .logo {{
-                font-size: 32px;
-                font-weight: 700;
-                color: white;
-                margin-bottom: 10px;
-                position: relative;
-                z-index: 2;
-            }}
-            
-            .header-subtitle {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 16px;
-                font-weight: 500;
-                position: relative;
-                z-index: 2;
-            }}
-            
-            .content {{
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            
-            .greeting {{
-                font-size: 24px;
-                font-weight: 600;
-                color: #1F2937;
-                margin-bottom: 16px;
-            }}
-            
-            .message {{
-                font-size: 16px;
-                color: #6B7280;
-                margin-bottom: 32px;
-                line-height: 1.7;
-            }}
-            
-            .apartment-info {{
-                background: linear-gradient(135deg, #F3F4F6 0%, #E5E7EB 100%);
-                border-radius: 16px;
-                padding: 24px;
-                margin-bottom: 32px;
-                border: 1px solid rgba(0, 0, 0, 0.05);
-            }}
-            
-            .apartment-name {{
-                font-size: 20px;
-                font-weight: 600;
-                color: #374151;
-                margin-bottom: 8px;
-            }}
-            
-            .flat-info {{
-                font-size: 16px;
-                color: #6B7280;
-                font-weight: 500;
-            }}
-            
-            .code-container {{
-                background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-                border-radius: 20px;
-                padding: 32px;
-                margin: 32px 0;
-                position: relative;
-                overflow: hidden;
-                box-shadow: 0 10px 25px rgba(79, 70, 229, 0.3);
-            }}
-            
-            .code-container::before {{
-                content: '';
-                position: absolute;
-                top: -2px;
-                left: -2px;
-                right: -2px;
-                bottom: -2px;
-                background: linear-gradient(45deg, #4F46E5, #7C3AED, #EC4899, #EF4444, #F59E0B, #10B981, #06B6D4);
-                border-radius: 22px;
-                z-index: -1;
-                animation: gradient 3s ease infinite;
-                background-size: 400% 400%;
-            }}
-            
-            @keyframes gradient {{
-                0% {{ background-position: 0% 50%; }}
-                50% {{ background-position: 100% 50%; }}
-                100% {{ background-position: 0% 50%; }}
-            }}
-            
-            .code-label {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 14px;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                margin-bottom: 12px;
-            }}
-            
-            .invitation-code {{
-                font-size: 36px;
-                font-weight: 700;
-                color: white;
-                letter-spacing: 4px;
-                margin: 0;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.3);
-                font-family: 'Monaco', 'Menlo', monospace;
-            }}
-            
-            .instructions {{
-                background: linear-gradient(135deg, #FEF3C7 0%, #FDE68A 100%);
-                border-radius: 12px;
-                padding: 20px;
-                margin: 24px 0;
-                border-left: 4px solid #F59E0B;
-            }}
-            
-            .instructions-text {{
-                color: #92400E;
-                font-size: 14px;
-                line-height: 1.6;
-            }}
-            
-            .footer {{
-                background: #F9FAFB;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #E5E7EB;
-            }}
-            
-            .footer-text {{
-                color: #6B7280;
-                font-size: 14px;
-                margin-bottom: 16px;
-            }}
-            
-            .company-info {{
-                color: #9CA3AF;
-                font-size: 12px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <div class="logo">🏢 FlatFund</div>
-                <div class="header-subtitle">You're Invited!</div>
-            </div>
-            
-            <div class="content">
-                <div class="greeting">Welcome to the Community! 🎉</div>
-                
-                <div class="message">
-                    You have been invited to join the apartment management system for your new home.
-                    Use the code below to complete your registration and start managing your apartment.
-                </div>
-                
-                <div class="apartment-info">
-                    <div class="apartment-name">🏠 {apartment_name}</div>
-                    <div class="flat-info">📍 Flat Number: {flat_number} (Floor: {flat_floor})</div>
-                </div>
-                
-                <div class="code-container">
-                    <div class="code-label">Your Invitation Code</div>
-                    <div class="invitation-code">{invitation_code}</div>
-                </div>
-                
-                <div class="instructions">
-                    <div class="instructions-text">
-                        <strong>📋 Next Steps:</strong><br>
-                        1. Visit the FlatFund signup page<br>
-                        2. Enter your email address (this one)<br>
-                        3. Enter the invitation code above<br>
-                        4. Complete your registration<br>
-                        5. Login to access your apartment dashboard
-                    </div>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <div class="footer-text">
-                    Welcome to your new home management system!<br>
-                    <strong>The FlatFund Team</strong>
-                </div>
-                
-                <div class="company-info">
-                    This invitation expires in 7 days. If you need help, contact your apartment admin.<br>
-                    © 2025 FlatFund. All rights reserved.
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = email_templates.render(
+        "flatmate_invitation",
+        apartment_name=apartment_name, flat_number=flat_number, flat_floor=flat_floor, invitation_code=invitation_code
+    )
     
     sender = {"name": "FlatFund Team", "email": "team.nulltheory@gmail.com"}
     to = [{"email": email}]
@@ -645,207 +95,22 @@ def send_flatmate_invitation_email(email: str, apartment_name: str, flat_number:
     )
     
     try:
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        brevo.send(send_smtp_email)
         return True
     except ApiException as e:
         print(f"Exception when calling SMTPApi->send_transac_email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send invitation email")
+        raise RuntimeError("Failed to send invitation email") from e
 
 def send_login_otp_email(email: str, otp: str, apartment_name: str, flat_number: str, flat_floor: str, role: str):
     """Send login OTP email to user"""
     if not BREVO_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="Email service not configured. Please set BREVO_API_KEY environment variable."
-        )
-    
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-    
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        raise RuntimeError("Email service not configured. Please set BREVO_API_KEY environment variable.")
     
     subject = f"🔐 Your FlatFund Login Code for {apartment_name}"
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>FlatFund Login OTP</title>
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-            
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-                line-height: 1.6;
-            }}
-            
-            .email-container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(20px);
-                border-radius: 24px;
-                box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                overflow: hidden;
-            }}
-            
-            .header {{
-                background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-                padding: 40px 30px;
-                text-align: center;
-                position: relative;
-                overflow: hidden;
-            }}
-            
-            .logo {{
-                font-size: 32px;
-                font-weight: 700;
-                color: white;
-                margin-bottom: 10px;
-            }}
-            
-            .header-subtitle {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 16px;
-                font-weight: 500;
-            }}
-            
-            .content {{
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            
-            .greeting {{
-                font-size: 24px;
-                font-weight: 600;
-                color: #1F2937;
-                margin-bottom: 16px;
-            }}
-            
-            .user-info {{
-                background: linear-gradient(135deg, #F3F4F6 0%, #E5E7EB 100%);
-                border-radius: 16px;
-                padding: 24px;
-                margin-bottom: 32px;
-                border: 1px solid rgba(0, 0, 0, 0.05);
-            }}
-            
-            .apartment-name {{
-                font-size: 20px;
-                font-weight: 600;
-                color: #374151;
-                margin-bottom: 8px;
-            }}
-            
-            .user-details {{
-                font-size: 14px;
-                color: #6B7280;
-            }}
-            
-            .otp-container {{
-                background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-                border-radius: 20px;
-                padding: 32px;
-                margin: 32px 0;
-                position: relative;
-                overflow: hidden;
-                box-shadow: 0 10px 25px rgba(79, 70, 229, 0.3);
-            }}
-            
-            .otp-label {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 14px;
-                font-weight: 500;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                margin-bottom: 12px;
-            }}
-            
-            .otp-code {{
-                font-size: 48px;
-                font-weight: 700;
-                color: white;
-                letter-spacing: 8px;
-                margin: 0;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.3);
-                font-family: 'Monaco', 'Menlo', monospace;
-            }}
-            
-            .timer-info {{
-                background: linear-gradient(135deg, #FEF3C7 0%, #FDE68A 100%);
-                border-radius: 12px;
-                padding: 16px 20px;
-                margin: 24px 0;
-                border-left: 4px solid #F59E0B;
-            }}
-            
-            .timer-text {{
-                color: #92400E;
-                font-weight: 500;
-                font-size: 14px;
-            }}
-            
-            .footer {{
-                background: #F9FAFB;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #E5E7EB;
-            }}
-            
-            .footer-text {{
-                color: #6B7280;
-                font-size: 14px;
-                margin-bottom: 16px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <div class="logo">🏢 FlatFund</div>
-                <div class="header-subtitle">Secure Login</div>
-            </div>
-            
-            <div class="content">
-                <div class="greeting">Welcome back! 👋</div>
-                
-                <div class="user-info">
-                    <div class="apartment-name">🏠 {apartment_name}</div>
-                    <div class="user-details">
-                        📍 Flat: {flat_number} (Floor: {flat_floor}) | 👤 Role: {role.title()}
-                    </div>
-                </div>
-                
-                <div class="otp-container">
-                    <div class="otp-label">Your Login Code</div>
-                    <div class="otp-code">{otp}</div>
-                </div>
-                
-                <div class="timer-info">
-                    <span class="timer-text">⏰ This code expires in 10 minutes</span>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <div class="footer-text">
-                    <strong>The FlatFund Team</strong>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = email_templates.render(
+        "login_otp",
+        apartment_name=apartment_name, flat_number=flat_number, flat_floor=flat_floor, role=role.title(), otp=otp
+    )
     
     sender = {"name": "FlatFund Team", "email": "team.nulltheory@gmail.com"}
     to = [{"email": email}]
@@ -858,11 +123,11 @@ def send_login_otp_email(email: str, otp: str, apartment_name: str, flat_number:
     )
     
     try:
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        brevo.send(send_smtp_email)
         return True
     except ApiException as e:
         print(f"Exception when calling SMTPApi->send_transac_email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send login OTP email")
+        raise RuntimeError("Failed to send login OTP email") from e
 
 def send_welcome_email(email: str, apartment_name: str, flat_number: str, flat_floor: str, role: str):
     """Send welcome email after successful registration"""
@@ -870,194 +135,11 @@ def send_welcome_email(email: str, apartment_name: str, flat_number: str, flat_f
         print("Email service not configured - skipping welcome email")
         return
     
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-    
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-    
     subject = f"🎉 Welcome to {apartment_name} - Registration Successful!"
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Welcome to FlatFund</title>
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-            
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-                line-height: 1.6;
-            }}
-            
-            .email-container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(20px);
-                border-radius: 24px;
-                box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                overflow: hidden;
-            }}
-            
-            .header {{
-                background: linear-gradient(135deg, #10B981 0%, #059669 100%);
-                padding: 40px 30px;
-                text-align: center;
-                position: relative;
-                overflow: hidden;
-            }}
-            
-            .logo {{
-                font-size: 32px;
-                font-weight: 700;
-                color: white;
-                margin-bottom: 10px;
-            }}
-            
-            .header-subtitle {{
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 16px;
-                font-weight: 500;
-            }}
-            
-            .content {{
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            
-            .greeting {{
-                font-size: 24px;
-                font-weight: 600;
-                color: #1F2937;
-                margin-bottom: 16px;
-            }}
-            
-            .message {{
-                font-size: 16px;
-                color: #6B7280;
-                margin-bottom: 32px;
-                line-height: 1.7;
-            }}
-            
-            .registration-info {{
-                background: linear-gradient(135deg, #F3F4F6 0%, #E5E7EB 100%);
-                border-radius: 16px;
-                padding: 24px;
-                margin-bottom: 32px;
-                border: 1px solid rgba(0, 0, 0, 0.05);
-            }}
-            
-            .apartment-name {{
-                font-size: 20px;
-                font-weight: 600;
-                color: #374151;
-                margin-bottom: 8px;
-            }}
-            
-            .details {{
-                font-size: 14px;
-                color: #6B7280;
-                margin: 4px 0;
-            }}
-            
-            .role-badge {{
-                display: inline-block;
-                background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-                color: white;
-                padding: 6px 12px;
-                border-radius: 20px;
-                font-size: 12px;
-                font-weight: 600;
-                text-transform: uppercase;
-                letter-spacing: 0.5px;
-                margin-top: 8px;
-            }}
-            
-            .next-steps {{
-                background: linear-gradient(135deg, #DBEAFE 0%, #BFDBFE 100%);
-                border-radius: 12px;
-                padding: 20px;
-                margin: 24px 0;
-                border-left: 4px solid #3B82F6;
-            }}
-            
-            .next-steps-text {{
-                color: #1E40AF;
-                font-size: 14px;
-                line-height: 1.6;
-                text-align: left;
-            }}
-            
-            .footer {{
-                background: #F9FAFB;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #E5E7EB;
-            }}
-            
-            .footer-text {{
-                color: #6B7280;
-                font-size: 14px;
-                margin-bottom: 16px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <div class="logo">🏢 FlatFund</div>
-                <div class="header-subtitle">Registration Successful!</div>
-            </div>
-            
-            <div class="content">
-                <div class="greeting">Welcome to your new home! 🎉</div>
-                
-                <div class="message">
-                    Congratulations! Your registration has been completed successfully. 
-                    You are now part of the apartment management system.
-                </div>
-                
-                <div class="registration-info">
-                    <div class="apartment-name">🏠 {apartment_name}</div>
-                    <div class="details">📍 <strong>Flat:</strong> {flat_number} (Floor: {flat_floor})</div>
-                    <div class="details">📧 <strong>Email:</strong> {email}</div>
-                    <div class="role-badge">{role.title()}</div>
-                </div>
-                
-                <div class="next-steps">
-                    <div class="next-steps-text">
-                        <strong>🚀 What's Next?</strong><br>
-                        1. <strong>Login:</strong> Use the login page to access your dashboard<br>
-                        2. <strong>Select Apartment:</strong> Choose your apartment from the list<br>
-                        3. <strong>OTP Verification:</strong> You'll receive a login code via email<br>
-                        4. <strong>Complete Profile:</strong> Add your personal details and preferences<br>
-                        5. <strong>Start Managing:</strong> Track expenses, communicate with neighbors, and more!
-                    </div>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <div class="footer-text">
-                    Welcome to the community!<br>
-                    <strong>The FlatFund Team</strong>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = email_templates.render(
+        "welcome",
+        apartment_name=apartment_name, flat_number=flat_number, flat_floor=flat_floor, email=email, role=role.title()
+    )
     
     sender = {"name": "FlatFund Team", "email": "team.nulltheory@gmail.com"}
     to = [{"email": email}]
@@ -1070,50 +152,37 @@ def send_welcome_email(email: str, apartment_name: str, flat_number: str, flat_f
     )
     
     try:
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        brevo.send(send_smtp_email)
         return True
     except ApiException as e:
         print(f"Exception when calling SMTPApi->send_transac_email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send welcome email")
+        raise RuntimeError("Failed to send welcome email") from e
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # jti and iat let a token be revoked before it expires (see app/revocations.py)
+    to_encode.update({"exp": expire, "iat": now, "jti": str(uuid7())})
+    encoded_jwt = key_ring.sign(to_encode)
     return encoded_jwt
 
-def create_refresh_token(db: Session, user_id: int) -> str:
-    """Generate a secure opaque refresh token, store it, and return it."""
-    # Invalidate all old refresh tokens for this user for better security
-    db.query(RefreshToken).filter(RefreshToken.user_id == user_id).update({"is_revoked": 1})
-
-    # Generate a new secure random token
-    token = secrets.token_hex(32)
-    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    
-    db_refresh_token = RefreshToken(
-        token=token,
-        user_id=user_id,
-        expires_at=expires_at
-    )
-    db.add(db_refresh_token)
-    db.commit()
-    db.refresh(db_refresh_token)
-    
-    return token
-
 @router.post("/signin")
-async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
+async def send_otp(
+    request: SendOTPRequest,
+    uow: UnitOfWork = Depends(get_uow),
+    otp_store: OTPStore = Depends(get_otp_store),
+):
     """Send OTP to admin email for apartment signin"""
+    db = uow.session
     
     # Verify apartment exists
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == request.apt_id
-    ).first()
+    apartment = (await db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": request.apt_id}
+    )).scalars().first()
     
     if not apartment:
         raise HTTPException(
@@ -1125,49 +194,33 @@ async def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
     # For now, we allow both admin_email and other emails to request OTP
     # The role will be determined during verification
     
-    # Generate OTP
-    otp_code = generate_otp()
-    expires_at = datetime.utcnow() + timedelta(minutes=10)  # 10 minutes expiry
-    
-    # Delete any existing OTP for this email/apartment combination
-    db.query(OTPVerification).filter(
-        OTPVerification.email == request.admin_email,
-        OTPVerification.apartment_id == request.apt_id
-    ).delete()
-    
-    # Create new OTP record
-    otp_record = OTPVerification(
-        email=request.admin_email,
-        apartment_id=request.apt_id,
-        otp_code=otp_code,
-        expires_at=expires_at
-    )
-    db.add(otp_record)
-    db.commit()
+    # Generate OTP (replaces any earlier OTP for this email/apartment combination)
+    otp_code = await otp_store.new_code(db, request.admin_email, request.apt_id)
+    await otp_store.issue(db, request.admin_email, request.apt_id, otp_code)
     
-    # Send OTP via email
-    try:
-        send_otp_email(request.admin_email, otp_code, apartment.apartment_name)
-    except Exception as e:
-        # Rollback OTP record if email fails
-        db.delete(otp_record)
-        db.commit()
-        raise e
+    # Queue the OTP email in the same transaction; it is sent in the background
+    email_outbox.enqueue(uow, send_otp_email, request.admin_email, otp_code, apartment.apartment_name)
+    await uow.commit()
     
     return {
         "status": True,
         "message": "OTP sent successfully to your email",
-        "expires_in_minutes": 10
+        "expires_in_minutes": OTP_EXPIRE_MINUTES
     }
 
 @router.post("/verify-otp", response_model=AuthResponse)
-async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
+async def verify_otp(
+    request: VerifyOTPRequest,
+    uow: UnitOfWork = Depends(get_uow),
+    otp_store: OTPStore = Depends(get_otp_store),
+):
     """Verify OTP and return authentication token"""
+    db = uow.session
     
     # Get apartment details
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == request.apt_id
-    ).first()
+    apartment = (await db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": request.apt_id}
+    )).scalars().first()
     
     if not apartment:
         return JSONResponse(
@@ -1175,26 +228,14 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
             content={"status": False, "message": "Apartment not found"}
         )
     
-    # Verify OTP
-    otp_record = db.query(OTPVerification).filter(
-        OTPVerification.email == request.admin_email,
-        OTPVerification.apartment_id == request.apt_id,
-        OTPVerification.otp_code == request.otp,
-        OTPVerification.is_verified == 0,
-        OTPVerification.expires_at > datetime.utcnow()
-    ).first()
-    
-    if not otp_record:
-        # Check for specific reasons for failure for better client-side feedback
-        existing_otp = db.query(OTPVerification).filter(
-            OTPVerification.email == request.admin_email,
-            OTPVerification.apartment_id == request.apt_id,
-            OTPVerification.otp_code == request.otp
-        ).first()
-
-        if existing_otp and existing_otp.is_verified:
+    # Verify OTP and mark it as used
+    otp_check = await otp_store.consume(db, request.admin_email, request.apt_id, request.otp)
+    
+    if otp_check is not OTPCheck.VALID:
+        # Specific reasons for failure for better client-side feedback
+        if otp_check is OTPCheck.USED:
             message = "OTP has already been used."
-        elif existing_otp and existing_otp.expires_at <= datetime.utcnow():
+        elif otp_check is OTPCheck.EXPIRED:
             message = "OTP has expired. Please request a new one."
         else:
             message = "Invalid OTP. Please check the code and try again."
@@ -1204,10 +245,6 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
             content={"status": False, "message": message}
         )
     
-    # Mark OTP as verified
-    otp_record.is_verified = 1
-    db.commit()
-    
     # Determine user role based on email comparison
     if request.admin_email.lower() == apartment.admin_email.lower():
         user_role = UserRole.ADMIN
@@ -1219,10 +256,11 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
         flat_id_prefix = "owner"
     
     # Check if user exists, if not create one
-    user = db.query(User).filter(
-        User.user_email_id == request.admin_email,
-        User.apartment_id == request.apt_id
-    ).first()
+    role_revocation = None
+    user = (await db.execute(
+        statements.USER_BY_APARTMENT_EMAIL,
+        {"apartment_id": request.apt_id, "email": request.admin_email},
+    )).scalars().first()
     
     if not user:
         # Create new user with appropriate role
@@ -1234,8 +272,7 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
             role=user_role
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await uow.flush()  # assigns user.id for the token claims
     else:
         # For existing users, only update role if they are changing from/to admin  
         # Keep existing OWNER/TENANT roles as they are (don't override)
@@ -1243,8 +280,10 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
            (user.role != UserRole.ADMIN and user_role == UserRole.ADMIN):
             user.role = user_role
             user.flat_id = f"{flat_id_prefix}_{apartment.apartment_id}"
-            db.commit()
-            db.refresh(user)
+            # Tokens issued before carry the old role; the one issued below is spared
+            role_revocation = revoke_user_tokens(
+                db, user.id, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+            )
     
     # Create JWT token
     token_data = {
@@ -1255,7 +294,7 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
         "role": user.role.value
     }
     access_token = create_access_token(token_data)
-    refresh_token = create_refresh_token(db=db, user_id=user.id)
+    refresh_token = await create_refresh_token(db=db, user_id=user.id)
     
     # Check if user details are filled
     is_all_user_details_filled = bool(
@@ -1269,10 +308,12 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
     suggested_flat_details = None
     if not is_all_user_details_filled:
         # Look for any invitation (used or unused) for this user to get flat suggestions
-        invitation = db.query(FlatmateInvitation).filter(
-            FlatmateInvitation.apartment_id == request.apt_id,
-            FlatmateInvitation.invited_email == request.admin_email
-        ).order_by(FlatmateInvitation.created_at.desc()).first()
+        invitation = (await db.execute(
+            select(FlatmateInvitation).where(
+                FlatmateInvitation.apartment_id == request.apt_id,
+                FlatmateInvitation.invited_email == request.admin_email
+            ).order_by(FlatmateInvitation.created_at.desc())
+        )).scalars().first()
         
         if invitation:
             suggested_flat_details = {
@@ -1280,6 +321,12 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
                 "flat_floor": invitation.floor
             }
     
+    # Single commit: OTP consumed, user created/updated and refresh token rotated together
+    await uow.commit()
+    if role_revocation is not None:
+        revocation_list.add_cutoff(user.id, role_revocation.not_before)
+        auth_cache.invalidate_user(user.id)
+    
     response_data = {
         "apt_id": apartment.apartment_id,
         "apt_uuid": str(apartment.apartment_uuid),
@@ -1299,35 +346,34 @@ async def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
     )
 
 @router.post("/token/refresh", response_model=TokenResponse)
-async def refresh_access_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+async def refresh_access_token(request: RefreshTokenRequest, uow: UnitOfWork = Depends(get_uow)):
     """
     Refresh the access token using a secure, opaque refresh token.
-    Implements token rotation for enhanced security.
+    Implements token rotation for enhanced security; concurrent refreshes of
+    the same token within the grace window all get the same new refresh token.
     """
-    token = request.refresh_token
-    
-    # Find the refresh token in the database
-    db_refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == token,
-        RefreshToken.is_revoked == 0,
-        RefreshToken.expires_at > datetime.utcnow()
-    ).first()
+    return await refresh_flights.run(
+        hash_refresh_token(request.refresh_token),
+        lambda: _refresh_access_token(request.refresh_token, uow),
+    )
+
 
-    if not db_refresh_token:
-        # This could be a sign of a compromised token being reused.
-        # For extra security, you could log this event.
+async def _refresh_access_token(refresh_token: str, uow: UnitOfWork) -> TokenResponse:
+    db = uow.session
+
+    # --- Token Rotation ---
+    rotation = await rotate_refresh_token(db, refresh_token)
+
+    if rotation is None:
+        # Commit anyway: a replayed token has just had its whole family revoked
+        await uow.commit()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # --- Token Rotation ---
-    # Invalidate the used refresh token
-    db_refresh_token.is_revoked = 1
-    db.commit()
-
-    user = db_refresh_token.user
+    user = (await db.execute(statements.USER_BY_ID, {"user_id": rotation.user_id})).scalars().first()
     if not user:
         # This case should be rare due to database foreign key constraints
         raise HTTPException(
@@ -1344,17 +390,61 @@ async def refresh_access_token(request: RefreshTokenRequest, db: Session = Depen
         "role": user.role.value,
     }
     new_access_token = create_access_token(data=token_data)
-    
-    # Issue a new refresh token
-    new_refresh_token = create_refresh_token(db=db, user_id=user.id)
 
-    return TokenResponse(access_token=new_access_token, refresh_token=new_refresh_token)
+    if rotation.rotated:
+        await uow.commit()
+
+    return TokenResponse(access_token=new_access_token, refresh_token=rotation.refresh_token)
+
+@router.post("/logout")
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    principal: Principal = Depends(get_principal),
+    uow: UnitOfWork = Depends(get_uow),
+):
+    """
+    Log out this session: revoke the access token and, if given, the refresh token.
+    Tokens issued before revocation existed (no jti) can only be revoked by /logout-all.
+    """
+    db = uow.session
+    revoked = revoke_access_token(db, principal.claims)
+    if request is not None and request.refresh_token:
+        await revoke_refresh_token(db, request.refresh_token, principal.user_id)
+    await uow.commit()
+
+    if revoked is not None:
+        revocation_list.add_jti(revoked.jti)
+    return {"status": True, "message": "Logged out successfully"}
+
+
+@router.post("/logout-all")
+async def logout_everywhere(principal: Principal = Depends(get_principal), uow: UnitOfWork = Depends(get_uow)):
+    """Log out every session of the current user: all access and refresh tokens"""
+    db = uow.session
+    cutoff = revoke_user_tokens(
+        db, principal.user_id, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    # The cutoff spares tokens issued in its own second; this one goes regardless
+    revoked = revoke_access_token(db, principal.claims)
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == principal.user_id, RefreshToken.is_revoked == literal_column("0"))
+        .values(is_revoked=1)
+    )
+    await uow.commit()
+
+    revocation_list.add_cutoff(principal.user_id, cutoff.not_before)
+    if revoked is not None:
+        revocation_list.add_jti(revoked.jti)
+    auth_cache.invalidate_user(principal.user_id)
+    return {"status": True, "message": "Logged out of all sessions"}
+
 
 @router.put("/user/{user_id}/role")
 async def update_user_role(
     user_id: int,
     new_role: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user role (admin can change owner <-> tenant, only admin email can be admin)"""
     
@@ -1368,7 +458,7 @@ async def update_user_role(
         )
     
     # Get user
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(statements.USER_BY_ID, {"user_id": user_id})).scalars().first()
     if not user:
         raise HTTPException(
             status_code=404,
@@ -1376,9 +466,9 @@ async def update_user_role(
         )
     
     # Get apartment to check admin email
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == user.apartment_id
-    ).first()
+    apartment = (await db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": user.apartment_id}
+    )).scalars().first()
     
     if not apartment:
         raise HTTPException(
@@ -1411,9 +501,16 @@ async def update_user_role(
         user.flat_id = f"owner_{apartment.apartment_id}"
     else:  # TENANT
         user.flat_id = f"tenant_{apartment.apartment_id}"
-    
-    db.commit()
-    db.refresh(user)
+
+    # Existing access tokens carry the old role: revoke them. The refresh
+    # token stays valid, so the client just refreshes to get the new role.
+    revocation = revoke_user_tokens(
+        db, user.id, datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+    await db.commit()
+    revocation_list.add_cutoff(user.id, revocation.not_before)
+    auth_cache.invalidate_user(user.id)
     
     return {
         "status": True,
@@ -1452,13 +549,14 @@ async def update_user_role(
             - Secure invitation code display
             """,
             tags=["Authentication", "Invitations"])
-async def invite_flatmate(request: InviteFlatmateRequest, db: Session = Depends(get_db)):
+async def invite_flatmate(request: InviteFlatmateRequest, uow: UnitOfWork = Depends(get_uow)):
     """Admin invites a flatmate by providing apt_id, flat_number, and owner_email_id"""
+    db = uow.session
     
     # Verify apartment exists
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == request.apt_id
-    ).first()
+    apartment = (await db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": request.apt_id}
+    )).scalars().first()
     
     if not apartment:
         raise HTTPException(
@@ -1467,13 +565,16 @@ async def invite_flatmate(request: InviteFlatmateRequest, db: Session = Depends(
         )
     
     # Check if there's already an active invitation for this email + apartment + flat
-    existing_invitation = db.query(FlatmateInvitation).filter(
-        FlatmateInvitation.apartment_id == request.apt_id,
-        FlatmateInvitation.flat_number == request.flat_number,
-        FlatmateInvitation.invited_email == request.owner_email_id,
-        FlatmateInvitation.is_used == 0,
-        FlatmateInvitation.expires_at > datetime.utcnow()
-    ).first()
+    # (is_used compared to a literal so the PostgreSQL partial index on pending invitations applies)
+    existing_invitation = (await db.execute(
+        select(FlatmateInvitation).where(
+            FlatmateInvitation.apartment_id == request.apt_id,
+            FlatmateInvitation.flat_number == request.flat_number,
+            FlatmateInvitation.invited_email == request.owner_email_id,
+            FlatmateInvitation.is_used == literal_column("0"),
+            FlatmateInvitation.expires_at > datetime.utcnow()
+        )
+    )).scalars().first()
     
     if existing_invitation:
         raise HTTPException(
@@ -1481,44 +582,48 @@ async def invite_flatmate(request: InviteFlatmateRequest, db: Session = Depends(
             detail="Active invitation already exists for this email and flat. Please wait for it to expire or be used."
         )
     
-    # Generate unique 6-character invitation code
-    invitation_code = generate_invitation_code()
-    
-    # Ensure code is unique
-    while db.query(FlatmateInvitation).filter(FlatmateInvitation.invitation_code == invitation_code).first():
-        invitation_code = generate_invitation_code()
-    
-    # Create invitation record
+    # Create invitation record with a unique 6-character code (unique by construction,
+    # see app/invitation_codes.py; only a code from before that can clash)
     expires_at = datetime.utcnow() + timedelta(days=7)  # 7 days expiry
     
-    invitation = FlatmateInvitation(
-        apartment_id=request.apt_id,
-        flat_number=request.flat_number,
-        floor=request.floor,
-        invited_email=request.owner_email_id,
-        invitation_code=invitation_code,
-        invited_by_admin_email=apartment.admin_email,
-        expires_at=expires_at
-    )
-    
-    db.add(invitation)
-    db.commit()
-    db.refresh(invitation)
-    
-    # Send invitation email
-    try:
-        send_flatmate_invitation_email(
-            request.owner_email_id, 
-            apartment.apartment_name, 
-            request.flat_number,
-            request.floor,  # Include floor from request
-            invitation_code
+    for attempt in range(INVITATION_CODE_ATTEMPTS):
+        invitation_code = await invitation_codes.next_code()
+        invitation = FlatmateInvitation(
+            apartment_id=request.apt_id,
+            flat_number=request.flat_number,
+            floor=request.floor,
+            invited_email=request.owner_email_id,
+            invitation_code=invitation_code,
+            invited_by_admin_email=apartment.admin_email,
+            expires_at=expires_at
+        )
+        db.add(invitation)
+        try:
+            await uow.flush()
+            break
+        except IntegrityError:
+            await uow.rollback()
+            # The rollback expired the apartment; load it again
+            apartment = (await db.execute(
+                statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": request.apt_id}
+            )).scalars().first()
+    else:
+        raise HTTPException(
+            status_code=503,
+            detail="Could not allocate an invitation code. Please try again."
         )
-    except Exception as e:
-        # Rollback invitation if email fails
-        db.delete(invitation)
-        db.commit()
-        raise e
+    
+    # Queue the invitation email in the same transaction; it is sent in the background
+    email_outbox.enqueue(
+        uow,
+        send_flatmate_invitation_email,
+        request.owner_email_id, 
+        apartment.apartment_name, 
+        request.flat_number,
+        request.floor,  # Include floor from request
+        invitation_code
+    )
+    await uow.commit()
     
     response_data = {
         "invitation_id": str(invitation.invitation_uuid),
@@ -1570,69 +675,47 @@ async def invite_flatmate(request: InviteFlatmateRequest, db: Session = Depends(
             - Next steps for apartment management
             """,
             tags=["Authentication", "Registration"])
-async def flatmate_signup(request: FlatmateSignupRequest, db: Session = Depends(get_db)):
+async def flatmate_signup(request: FlatmateSignupRequest, uow: UnitOfWork = Depends(get_uow)):
     """Secure flatmate signup with apartment, flat, email and invitation code verification"""
+    db = uow.session
     
-    # Step 1: Verify apartment exists and matches the provided apartment_name
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == request.apt_id,
-        Apartment.apartment_name == request.apartment_name
-    ).first()
+    # Steps 1-2: the apartment (id and name must match) and the invitation for this
+    # flat, email and code, in one query; failures are classified from that row
+    candidate = (await db.execute(statements.SIGNUP_CANDIDATE, {
+        "apartment_id": request.apt_id,
+        "apartment_name": request.apartment_name,
+        "flat_number": request.flat_number,
+        "email": request.email_id,
+        "invitation_code": request.unique_code,
+        "now": datetime.utcnow(),
+    })).first()
     
-    if not apartment:
+    if not candidate:
         raise HTTPException(
             status_code=400,
             detail="Invalid apartment details. Please check apartment name and ID."
         )
+    apartment, invitation, invitation_live = candidate
     
-    # Step 2: Find valid invitation with comprehensive verification
-    invitation = db.query(FlatmateInvitation).filter(
-        FlatmateInvitation.apartment_id == request.apt_id,
-        FlatmateInvitation.flat_number == request.flat_number,
-        FlatmateInvitation.invited_email == request.email_id,
-        FlatmateInvitation.invitation_code == request.unique_code,
-        FlatmateInvitation.is_used == 0,
-        FlatmateInvitation.expires_at > datetime.utcnow()
-    ).first()
-    
-    if not invitation:
-        # Provide specific error messages for better security
-        # Check if invitation exists but is expired
-        expired_invitation = db.query(FlatmateInvitation).filter(
-            FlatmateInvitation.apartment_id == request.apt_id,
-            FlatmateInvitation.flat_number == request.flat_number,
-            FlatmateInvitation.invited_email == request.email_id,
-            FlatmateInvitation.invitation_code == request.unique_code,
-            FlatmateInvitation.is_used == 0
-        ).first()
-        
-        if expired_invitation:
-            raise HTTPException(
-                status_code=400,
-                detail="Your invitation code has expired. Please contact the apartment admin for a new invitation."
-            )
-        
-        # Check if invitation exists but is already used
-        used_invitation = db.query(FlatmateInvitation).filter(
-            FlatmateInvitation.apartment_id == request.apt_id,
-            FlatmateInvitation.flat_number == request.flat_number,
-            FlatmateInvitation.invited_email == request.email_id,
-            FlatmateInvitation.invitation_code == request.unique_code,
-            FlatmateInvitation.is_used == 1
-        ).first()
-        
-        if used_invitation:
-            raise HTTPException(
-                status_code=400,
-                detail="This invitation code has already been used. If you need access, please contact the apartment admin."
-            )
-        
+    if invitation is None:
         # Generic error for invalid details
         raise HTTPException(
             status_code=400,
             detail="Invalid invitation details. Please verify apartment ID, flat number, email, and invitation code."
         )
     
+    if invitation.is_used:
+        raise HTTPException(
+            status_code=400,
+            detail="This invitation code has already been used. If you need access, please contact the apartment admin."
+        )
+    
+    if not invitation_live:
+        raise HTTPException(
+            status_code=400,
+            detail="Your invitation code has expired. Please contact the apartment admin for a new invitation."
+        )
+    
     # Step 3: Additional security - verify the invitation was sent by the apartment admin
     if invitation.invited_by_admin_email != apartment.admin_email:
         raise HTTPException(
@@ -1641,10 +724,12 @@ async def flatmate_signup(request: FlatmateSignupRequest, db: Session = Depends(
         )
     
     # Step 4: Check if user already exists for this apartment and flat combination
-    existing_user = db.query(User).filter(
-        User.apartment_id == request.apt_id,
-        User.flat_number == request.flat_number
-    ).first()
+    existing_user = (await db.execute(
+        select(User).where(
+            User.apartment_id == request.apt_id,
+            User.flat_number == request.flat_number
+        )
+    )).scalars().first()
     
     # Step 5: Determine role based on existing users in the flat
     if existing_user:
@@ -1680,21 +765,17 @@ async def flatmate_signup(request: FlatmateSignupRequest, db: Session = Depends(
     invitation.is_used = 1
     invitation.used_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(user)
-    
-    # Step 8: Send welcome email
-    try:
-        send_welcome_email(
-            request.email_id,
-            apartment.apartment_name,
-            request.flat_number,
-            user.flat_floor,  # Include floor from user record
-            user.role.value
-        )
-    except Exception as e:
-        # Don't fail registration if email fails, just log
-        print(f"Failed to send welcome email: {e}")
+    # Step 8: Queue the welcome email (sent in the background; registration doesn't wait for it)
+    email_outbox.enqueue(
+        uow,
+        send_welcome_email,
+        request.email_id,
+        apartment.apartment_name,
+        request.flat_number,
+        user.flat_floor,  # Include floor from user record
+        user.role.value
+    )
+    await uow.commit()
     
     response_data = {
         "user_id": f"user_{user.id}",
@@ -1739,13 +820,13 @@ async def flatmate_signup(request: FlatmateSignupRequest, db: Session = Depends(
             - Role verification across apartments
             """,
             tags=["User Management", "Apartments"])
-async def get_user_apartments(request: SelectApartmentRequest, db: Session = Depends(get_db)):
+async def get_user_apartments(request: SelectApartmentRequest, db: AsyncSession = Depends(get_async_read_db)):
     """Get list of apartments where user is registered"""
     
     # Find all apartments where user is registered
-    users = db.query(User).filter(
-        User.user_email_id == request.email_id
-    ).all()
+    users = (await db.execute(
+        select(User).where(User.user_email_id == request.email_id)
+    )).scalars().all()
     
     if not users:
         raise HTTPException(
@@ -1755,9 +836,9 @@ async def get_user_apartments(request: SelectApartmentRequest, db: Session = Dep
     
     apartments = []
     for user in users:
-        apartment = db.query(Apartment).filter(
-            Apartment.apartment_id == user.apartment_id
-        ).first()
+        apartment = (await db.execute(
+            statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": user.apartment_id}
+        )).scalars().first()
         
         if apartment:
             apartments.append({
@@ -1800,14 +881,19 @@ async def get_user_apartments(request: SelectApartmentRequest, db: Session = Dep
             - Automatic cleanup of expired OTPs
             """,
             tags=["Authentication", "OTP"])
-async def login_user(request: LoginRequest, db: Session = Depends(get_db)):
+async def login_user(
+    request: LoginRequest,
+    uow: UnitOfWork = Depends(get_uow),
+    otp_store: OTPStore = Depends(get_otp_store),
+):
     """User selects apartment and email, receives OTP for login"""
+    db = uow.session
     
     # Verify user exists in the selected apartment
-    user = db.query(User).filter(
-        User.apartment_id == request.apt_id,
-        User.user_email_id == request.email_id
-    ).first()
+    user = (await db.execute(
+        statements.USER_BY_APARTMENT_EMAIL,
+        {"apartment_id": request.apt_id, "email": request.email_id},
+    )).scalars().first()
     
     if not user:
         raise HTTPException(
@@ -1816,9 +902,9 @@ async def login_user(request: LoginRequest, db: Session = Depends(get_db)):
         )
     
     # Get apartment details
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == request.apt_id
-    ).first()
+    apartment = (await db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": request.apt_id}
+    )).scalars().first()
     
     if not apartment:
         raise HTTPException(
@@ -1826,49 +912,32 @@ async def login_user(request: LoginRequest, db: Session = Depends(get_db)):
             detail="Apartment not found"
         )
     
-    # Generate OTP
-    otp_code = generate_otp()
-    expires_at = datetime.utcnow() + timedelta(minutes=10)  # 10 minutes expiry
-    
-    # Delete any existing OTP for this email/apartment combination
-    db.query(OTPVerification).filter(
-        OTPVerification.email == request.email_id,
-        OTPVerification.apartment_id == request.apt_id
-    ).delete()
-    
-    # Create new OTP record
-    otp_record = OTPVerification(
-        email=request.email_id,
-        apartment_id=request.apt_id,
-        otp_code=otp_code,
-        expires_at=expires_at
-    )
-    db.add(otp_record)
-    db.commit()
+    # Generate OTP (replaces any earlier OTP for this email/apartment combination)
+    otp_code = await otp_store.new_code(db, request.email_id, request.apt_id)
+    await otp_store.issue(db, request.email_id, request.apt_id, otp_code)
     
-    # Send OTP via email
-    try:
-        send_login_otp_email(request.email_id, otp_code, apartment.apartment_name, user.flat_number, user.flat_floor, user.role.value)
-    except Exception as e:
-        # Rollback OTP record if email fails
-        db.delete(otp_record)
-        db.commit()
-        raise e
+    # Queue the OTP email in the same transaction; it is sent in the background
+    email_outbox.enqueue(
+        uow, send_login_otp_email,
+        request.email_id, otp_code, apartment.apartment_name, user.flat_number, user.flat_floor, user.role.value
+    )
+    await uow.commit()
     
     return LoginResponse(
         status=True,
         message="OTP sent successfully to your email",
-        expires_in_minutes=10
+        expires_in_minutes=OTP_EXPIRE_MINUTES
     )
 
 @router.post("/assign-additional-tenant", response_model=AssignTenantResponse)
-async def assign_additional_tenant(request: AssignTenantRequest, db: Session = Depends(get_db)):
+async def assign_additional_tenant(request: AssignTenantRequest, uow: UnitOfWork = Depends(get_uow)):
     """Owner can assign an additional tenant to an existing flat (direct assignment without invitation)"""
+    db = uow.session
     
     # Verify apartment exists
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == request.apt_id
-    ).first()
+    apartment = (await db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": request.apt_id}
+    )).scalars().first()
     
     if not apartment:
         raise HTTPException(
@@ -1877,10 +946,10 @@ async def assign_additional_tenant(request: AssignTenantRequest, db: Session = D
         )
     
     # Check if tenant email already exists in this apartment
-    existing_user = db.query(User).filter(
-        User.user_email_id == request.tenant_email_id,
-        User.apartment_id == request.apt_id
-    ).first()
+    existing_user = (await db.execute(
+        statements.USER_BY_APARTMENT_EMAIL,
+        {"apartment_id": request.apt_id, "email": request.tenant_email_id},
+    )).scalars().first()
     
     if existing_user:
         raise HTTPException(
@@ -1898,15 +967,12 @@ async def assign_additional_tenant(request: AssignTenantRequest, db: Session = D
     )
     
     db.add(tenant_user)
-    db.commit()
-    db.refresh(tenant_user)
     
-    # Send notification email to tenant
-    try:
-        send_invitation_email(request.tenant_email_id, apartment.apartment_name, request.flat_id)
-    except Exception as e:
-        # Don't rollback user creation if email fails, just log the error
-        print(f"Failed to send tenant assignment email: {e}")
+    # Queue the notification email to the tenant (sent in the background)
+    email_outbox.enqueue(
+        uow, send_invitation_email, request.tenant_email_id, apartment.apartment_name, request.flat_id
+    )
+    await uow.commit()
     
     response_data = {
         "tenant_user_id": f"user_{tenant_user.id}",
@@ -1926,144 +992,10 @@ async def assign_additional_tenant(request: AssignTenantRequest, db: Session = D
 def send_invitation_email(email: str, apartment_name: str, flat_id: str):
     """Send invitation email to tenant"""
     if not BREVO_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="Email service not configured. Please set BREVO_API_KEY environment variable."
-        )
-    
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = BREVO_API_KEY
-    
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        raise RuntimeError("Email service not configured. Please set BREVO_API_KEY environment variable.")
     
     subject = f"🏠 Welcome to FlatFund - {apartment_name}"
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>FlatFund Invitation</title>
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-            
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-                line-height: 1.6;
-            }}
-            
-            .email-container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(20px);
-                border-radius: 24px;
-                background: linear-gradient(135deg, #F3F4F6 0%, #E5E7EB 100%);
-                border-radius: 16px;
-                padding: 24px;
-                margin-bottom: 32px;
-                border: 1px solid rgba(0, 0, 0, 0.05);
-            }}
-            
-            .apartment-name {{
-                font-size: 20px;
-                font-weight: 600;
-                color: #374151;
-                margin-bottom: 8px;
-            }}
-            
-            .flat-info {{
-                font-size: 16px;
-                color: #6B7280;
-                font-weight: 500;
-            }}
-            
-            .welcome-note {{
-                background: linear-gradient(135deg, #DBEAFE 0%, #BFDBFE 100%);
-                border-radius: 12px;
-                padding: 20px;
-                margin: 24px 0;
-                border-left: 4px solid #3B82F6;
-            }}
-            
-            .welcome-text {{
-                color: #1E40AF;
-                font-size: 14px;
-                line-height: 1.6;
-            }}
-            
-            .footer {{
-                background: #F9FAFB;
-                padding: 30px;
-                text-align: center;
-                border-top: 1px solid #E5E7EB;
-            }}
-            
-            .footer-text {{
-                color: #6B7280;
-                font-size: 14px;
-                margin-bottom: 16px;
-            }}
-            
-            .company-info {{
-                color: #9CA3AF;
-                font-size: 12px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="email-container">
-            <div class="header">
-                <div class="logo">🏢 FlatFund</div>
-                <div class="header-subtitle">You've been invited!</div>
-            </div>
-            
-            <div class="content">
-                <div class="greeting">Welcome to FlatFund! 🎉</div>
-                
-                <div class="message">
-                    You have been invited as a tenant to join the apartment management system.
-                    You can now access your apartment dashboard and manage your flat.
-                </div>
-                
-                <div class="apartment-info">
-                    <div class="apartment-name">🏠 {apartment_name}</div>
-                    <div class="flat-info">📍 Flat ID: {flat_id}</div>
-                </div>
-                
-                <div class="welcome-note">
-                    <div class="welcome-text">
-                        <strong>🔐 Getting Started:</strong><br>
-                        You can now sign in to FlatFund using this email address. 
-                        Simply request an OTP and start managing your flat expenses and communications.
-                    </div>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <div class="footer-text">
-                    Welcome to the community!<br>
-                    <strong>The FlatFund Team</strong>
-                </div>
-                
-                <div class="company-info">
-                    This invitation was sent by your apartment owner.<br>
-                    © 2025 FlatFund. All rights reserved.
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_content = email_templates.render("tenant_invitation", apartment_name=apartment_name, flat_id=flat_id)
     
     sender = {"name": "FlatFund Team", "email": "team.nulltheory@gmail.com"}
     to = [{"email": email}]
@@ -2076,51 +1008,32 @@ def send_invitation_email(email: str, apartment_name: str, flat_id: str):
     )
     
     try:
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        brevo.send(send_smtp_email)
         return True
     except ApiException as e:
         print(f"Exception when calling SMTPApi->send_transac_email: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send invitation email")
+        raise RuntimeError("Failed to send invitation email") from e
 
 
-def get_current_user_from_token(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
-    """
-    Get current user from JWT token in Authorization header
-    """
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
-    
-    token = authorization.split(" ")[1]
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        flat_id: str = payload.get("sub")
-        if flat_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(User).filter(User.flat_id == flat_id).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    return user
+# Delivered by the outbox worker; the rows store these names
+email_outbox.register(
+    send_otp_email, send_flatmate_invitation_email, send_login_otp_email, send_welcome_email, send_invitation_email
+)
 
 
 @router.put("/updateflatmatedetails", response_model=UpdateFlatmateDetailsResponse)
 def update_flatmate_details(
     request: UpdateFlatmateDetailsRequest,
-    authorization: Optional[str] = Header(None),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db)
 ):
     """
     Update user details (name, phone number, flat number, and flat floor) for authenticated user
     """
-    # Get current user from JWT token
-    current_user = get_current_user_from_token(authorization, db)
+    # Load the user through this session, we're modifying it
+    current_user = db.execute(statements.USER_BY_ID, {"user_id": principal.user_id}).scalars().first()
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="User not found")
     
     # Update user details
     current_user.user_name = request.user_name
@@ -2159,19 +1072,18 @@ def update_flatmate_details(
 
 @router.get("/flatmatedetails", response_model=GetFlatmateDetailsResponse)
 def get_flatmate_details(
-    authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get current user details from JWT token
     """
-    # Get current user from JWT token
-    current_user = get_current_user_from_token(authorization, db)
+    current_user = principal.user
     
     # Get apartment details
-    apartment = db.query(Apartment).filter(
-        Apartment.apartment_id == current_user.apartment_id
-    ).first()
+    apartment = db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": current_user.apartment_id}
+    ).scalars().first()
     
     if not apartment:
         raise HTTPException(status_code=404, detail="Apartment not found")
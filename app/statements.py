@@ -0,0 +1,141 @@
+"""Prebuilt statements for the queries that run on nearly every request.
+
+Building ``select(...).where(...)`` (or ``db.query(...).filter(...)``) constructs a
+new statement and walks it to compute the compiled-cache key on every call.
+These module-level statements are built once with bound parameters and their
+cache key is memoized, so a call only binds values:
+
+    apartment = db.execute(
+        statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": apt_id}
+    ).scalars().first()
+
+Works with both Session and AsyncSession. benchmark_statements.py measures the
+per-call saving.
+"""
+from sqlalchemy import select, update, and_, bindparam, func, literal_column
+
+from .models import (
+    GUID, Apartment, User, RefreshToken, Security, TokenRevocation, OTPNonce, OTPVerification, FlatmateInvitation,
+)
+
+APARTMENT_BY_APARTMENT_ID = select(Apartment).where(
+    Apartment.apartment_id == bindparam("apartment_id")
+)
+
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+USER_BY_APARTMENT_EMAIL = select(User).where(
+    User.apartment_id == bindparam("apartment_id"),
+    User.user_email_id == bindparam("email"),
+)
+
+# The OTP row for a code, whatever its state, with whether it is still live
+# (compared in SQL, as stored). The caller tells valid / used / expired apart,
+# so a wrong or stale code costs the same single query as a right one.
+# Parameters: email, apartment_id, otp_code, now.
+OTP_CANDIDATE = select(
+    OTPVerification, (OTPVerification.expires_at > bindparam("now")).label("live")
+).where(
+    OTPVerification.email == bindparam("email"),
+    OTPVerification.apartment_id == bindparam("apartment_id"),
+    OTPVerification.otp_code == bindparam("otp_code"),
+)
+
+# Flatmate signup: the apartment (by id and name) and the invitation matching
+# flat, email and code whatever its state, in one round trip. The invitation
+# columns are NULL when no invitation matches. Parameters: apartment_id,
+# apartment_name, flat_number, email, invitation_code, now.
+SIGNUP_CANDIDATE = (
+    select(Apartment, FlatmateInvitation, (FlatmateInvitation.expires_at > bindparam("now")).label("live"))
+    .outerjoin(FlatmateInvitation, and_(
+        FlatmateInvitation.apartment_id == Apartment.apartment_id,
+        FlatmateInvitation.flat_number == bindparam("flat_number"),
+        FlatmateInvitation.invited_email == bindparam("email"),
+        FlatmateInvitation.invitation_code == bindparam("invitation_code"),
+    ))
+    .where(
+        Apartment.apartment_id == bindparam("apartment_id"),
+        Apartment.apartment_name == bindparam("apartment_name"),
+    )
+)
+
+REFRESH_TOKEN_BY_HASH = select(RefreshToken).where(
+    RefreshToken.token_hash == bindparam("token_hash")
+)
+
+# Rotate a live (not revoked, not expired) refresh token: revoke it, record when
+# and its sealed successor, and give it a family if it predates families. A
+# single conditional UPDATE, so of concurrent callers with the same token exactly
+# one matches the row. Parameters: claim_hash, now (utcnow()), sealed, new_family
+# (an UPDATE can't bind parameters named like its columns).
+ROTATE_LIVE_REFRESH_TOKEN = (
+    update(RefreshToken)
+    .where(
+        RefreshToken.token_hash == bindparam("claim_hash"),
+        RefreshToken.is_revoked == literal_column("0"),
+        RefreshToken.expires_at > bindparam("now"),
+    )
+    .values(
+        is_revoked=1,
+        rotated_at=bindparam("now"),
+        successor_sealed=bindparam("sealed"),
+        family_id=func.coalesce(RefreshToken.family_id, bindparam("new_family", type_=GUID())),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Same, returning the owner and family (UPDATE ... RETURNING: PostgreSQL, SQLite >= 3.35)
+CLAIM_REFRESH_TOKEN = ROTATE_LIVE_REFRESH_TOKEN.returning(RefreshToken.user_id, RefreshToken.family_id)
+
+# Revoke every live token of a family (a rotated token was replayed)
+REVOKE_REFRESH_TOKEN_FAMILY = (
+    update(RefreshToken)
+    .where(
+        RefreshToken.family_id == bindparam("family"),
+        RefreshToken.is_revoked == literal_column("0"),
+    )
+    .values(is_revoked=1)
+    .execution_options(synchronize_session=False)
+)
+
+OTP_NONCE_BY_APARTMENT_EMAIL = select(OTPNonce).where(
+    OTPNonce.apartment_id == bindparam("apartment_id"),
+    OTPNonce.email == bindparam("email"),
+)
+
+# Use up a stateless OTP: move the nonce on from the generation the code was
+# derived with. Conditional, so of concurrent verifications exactly one matches.
+# Parameters: apartment_id, email, seen (current generation), code.
+ADVANCE_OTP_NONCE = (
+    update(OTPNonce)
+    .where(
+        OTPNonce.apartment_id == bindparam("apartment_id"),
+        OTPNonce.email == bindparam("email"),
+        OTPNonce.generation == bindparam("seen"),
+    )
+    .values(generation=OTPNonce.generation + 1, last_code=bindparam("code"))
+    .execution_options(synchronize_session=False)
+)
+
+# Live revocations added after the last one a worker has seen
+REVOCATIONS_SINCE = (
+    select(
+        TokenRevocation.id,
+        TokenRevocation.jti,
+        TokenRevocation.user_id,
+        TokenRevocation.not_before,
+    )
+    .where(
+        TokenRevocation.id > bindparam("last_id"),
+        TokenRevocation.expires_at > bindparam("now"),
+    )
+    .order_by(TokenRevocation.id)
+)
+
+REVOCATION_BY_JTI = select(TokenRevocation.id).where(TokenRevocation.jti == bindparam("jti"))
+
+SECURITY_BY_APARTMENT = (
+    select(Security)
+    .where(Security.apartment_id == bindparam("apartment_id"))
+    .order_by(Security.created_at.desc())
+)
@@ -0,0 +1,228 @@
+"""Background deletion of expired and revoked rows.
+
+Nothing else ever deletes from these tables, so without the sweeper they and
+their indexes only grow:
+
+- otp_verifications: expired codes;
+- flatmate_invitations: expired invitations that were never used (used ones
+  stay: /verify-otp suggests flat details from them);
+- refresh_tokens: expired tokens, and revoked ones (by rotation or a new login);
+- token_revocations: rows whose tokens have all expired;
+- email_outbox: sent and dead emails.
+
+Rows are kept SWEEP_RETENTION_DAYS past expiry or revocation, so a replayed
+refresh token is still recognised (and its family revoked) and support can see
+recent history. Deletes run in batches of SWEEP_BATCH_SIZE rows, each its own
+short transaction, with a pause in between so request writes are not starved.
+
+Every worker runs the loop (every SWEEP_INTERVAL_SECONDS, started from the app
+lifespan), but only one sweeps at a time: on PostgreSQL it holds an advisory
+lock, on SQLite a lease row in job_locks. One pass can also be run from cron:
+
+    python -m app.sweeper
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, literal_column, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import database
+from .models import EmailOutbox, FlatmateInvitation, JobLock, OTPVerification, RefreshToken, TokenRevocation
+
+SWEEPER_ENABLED = os.getenv("SWEEPER_ENABLED", "true").lower() == "true"
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "3600"))
+SWEEP_RETENTION_DAYS = float(os.getenv("SWEEP_RETENTION_DAYS", "7"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "5000"))
+SWEEP_BATCH_PAUSE_SECONDS = float(os.getenv("SWEEP_BATCH_PAUSE_SECONDS", "0.05"))
+
+LOCK_NAME = "sweeper"
+# A lease not renewed for this long is taken over (the holder died mid-sweep)
+LOCK_LEASE_SECONDS = 300
+# pg_advisory_lock key: a fixed 32-bit number for this job
+ADVISORY_LOCK_KEY = zlib.crc32(b"flatfund:sweeper")
+
+
+def sweep_targets(now: datetime, retention: timedelta) -> list:
+    """(name, model, condition) of the rows to delete"""
+    cutoff = now - retention
+    return [
+        ("otp_verifications", OTPVerification, OTPVerification.expires_at < cutoff),
+        ("flatmate_invitations", FlatmateInvitation, and_(
+            FlatmateInvitation.is_used == literal_column("0"),
+            FlatmateInvitation.expires_at < cutoff,
+        )),
+        ("refresh_tokens", RefreshToken, or_(
+            RefreshToken.expires_at < cutoff,
+            and_(
+                RefreshToken.is_revoked == literal_column("1"),
+                func.coalesce(RefreshToken.rotated_at, RefreshToken.created_at) < cutoff,
+            ),
+        )),
+        # Useless as soon as every token it matches has expired
+        ("token_revocations", TokenRevocation, TokenRevocation.expires_at < now),
+        ("email_outbox", EmailOutbox, and_(
+            EmailOutbox.status != "pending",
+            EmailOutbox.created_at < cutoff,
+        )),
+    ]
+
+
+class Sweeper:
+    """Deletes expired rows in batches while holding the sweeper lock"""
+
+    def __init__(self, engine, retention_days: float = SWEEP_RETENTION_DAYS,
+                 batch_size: int = SWEEP_BATCH_SIZE, batch_pause: float = SWEEP_BATCH_PAUSE_SECONDS):
+        self.engine = engine
+        self.retention = timedelta(days=retention_days)
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.runs = 0
+        self.skipped = 0
+        self.purged_total: dict = {}
+        self.last_run = None
+
+    # --- lock -------------------------------------------------------------
+
+    def _acquire_lease(self) -> bool:
+        """Take or renew the job_locks lease (SQLite)"""
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=LOCK_LEASE_SECONDS)
+        with self.engine.begin() as connection:
+            renewed = connection.execute(
+                update(JobLock)
+                .where(
+                    JobLock.name == LOCK_NAME,
+                    or_(JobLock.holder == self.holder, JobLock.locked_until < now),
+                )
+                .values(holder=self.holder, locked_until=until)
+            )
+            if renewed.rowcount == 1:
+                return True
+            dialect = postgresql if self.engine.dialect.name == "postgresql" else sqlite
+            created = connection.execute(
+                dialect.insert(JobLock)
+                .values(name=LOCK_NAME, holder=self.holder, locked_until=until)
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+            return created.rowcount == 1
+
+    def _release_lease(self):
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(JobLock)
+                .where(JobLock.name == LOCK_NAME, JobLock.holder == self.holder)
+                .values(locked_until=datetime.utcnow())
+            )
+
+    # --- sweeping ---------------------------------------------------------
+
+    def _delete_batch(self, model, condition) -> int:
+        batch = select(model.__mapper__.primary_key[0]).where(condition).limit(self.batch_size)
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                delete(model)
+                .where(model.__mapper__.primary_key[0].in_(batch.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+        return result.rowcount
+
+    def _sweep(self, renew) -> dict:
+        purged = {}
+        for name, model, condition in sweep_targets(datetime.utcnow(), self.retention):
+            purged[name] = 0
+            while True:
+                deleted = self._delete_batch(model, condition)
+                purged[name] += deleted
+                if deleted < self.batch_size:
+                    break
+                renew()
+                if self.batch_pause:
+                    time.sleep(self.batch_pause)
+        return purged
+
+    def run_once(self):
+        """One sweep; rows purged per table, or None if another worker holds the lock"""
+        started = time.perf_counter()
+        started_at = datetime.utcnow()
+        if self.engine.dialect.name == "postgresql":
+            # Session-level advisory lock, held on its own connection for the whole sweep
+            with self.engine.connect() as lock_connection:
+                locked = lock_connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+                ).scalar()
+                lock_connection.commit()
+                if not locked:
+                    self.skipped += 1
+                    return None
+                try:
+                    purged = self._sweep(renew=lambda: None)
+                finally:
+                    lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                    lock_connection.commit()
+        else:
+            if not self._acquire_lease():
+                self.skipped += 1
+                return None
+            try:
+                purged = self._sweep(renew=self._acquire_lease)
+            finally:
+                self._release_lease()
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        self.runs += 1
+        for name, count in purged.items():
+            self.purged_total[name] = self.purged_total.get(name, 0) + count
+        self.last_run = {
+            "started_at": started_at.isoformat() + "Z",
+            "duration_ms": round(duration_ms, 1),
+            "purged": purged,
+        }
+        print(f"🧹 Sweeper purged {sum(purged.values())} rows in {duration_ms:.0f} ms: {purged}")
+        return purged
+
+    async def run_forever(self, interval: float = SWEEP_INTERVAL_SECONDS):
+        """Sweep every interval seconds (in a thread, so requests keep being served)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                print(f"⚠️  Sweeper failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SWEEPER_ENABLED,
+            "interval_seconds": SWEEP_INTERVAL_SECONDS,
+            "retention_days": self.retention.total_seconds() / 86400,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "skipped_locked": self.skipped,
+            "purged_total": self.purged_total,
+            "last_run": self.last_run,
+        }
+
+
+sweeper = Sweeper(database.engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.sweeper", description="Delete expired and revoked rows once")
+    parser.add_argument("--retention-days", type=float, default=SWEEP_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    purged = Sweeper(database.engine, args.retention_days, args.batch_size).run_once()
+    if purged is None:
+        print("Another worker is sweeping; nothing done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Request-scoped unit of work.
+
+Handlers make all their changes on one AsyncSession, flush when they need
+generated values (ids), and commit exactly once at the end. Side effects are
+registered with after_commit() and only run once the commit has succeeded, so a
+rolled-back request never triggers anything. (Emails go through the outbox in
+app/email_outbox.py instead: a row in the same transaction.)
+"""
+import inspect
+
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import get_async_db
+
+
+class UnitOfWork:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._after_commit = []
+        self.committed = False
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    async def flush(self):
+        """Send pending changes without committing (e.g. to get generated ids)"""
+        await self.session.flush()
+
+    def after_commit(self, func, *args, critical: bool = True, **kwargs):
+        """Run func(*args, **kwargs) after a successful commit.
+
+        Blocking functions run in the threadpool. If a critical callback raises,
+        the error propagates to the handler; otherwise it is logged and ignored.
+        """
+        self._after_commit.append((func, args, kwargs, critical))
+
+    async def commit(self):
+        await self.session.commit()
+        self.committed = True
+        callbacks, self._after_commit = self._after_commit, []
+        for func, args, kwargs, critical in callbacks:
+            try:
+                if inspect.iscoroutinefunction(func):
+                    await func(*args, **kwargs)
+                else:
+                    await run_in_threadpool(func, *args, **kwargs)
+            except Exception as e:
+                if critical:
+                    raise
+                print(f"⚠️  after-commit {getattr(func, '__name__', func)} failed: {e}")
+
+    async def rollback(self):
+        self._after_commit.clear()
+        await self.session.rollback()
+
+
+async def get_uow(db: AsyncSession = Depends(get_async_db)):
+    uow = UnitOfWork(db)
+    try:
+        yield uow
+    finally:
+        # Nothing registered for a request that never committed may run later
+        uow._after_commit.clear()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: email rendering time and payload size (app/email_templates).
+
+For each template, times:
+  f-string - the unminified HTML as an f-string, as routers/auth.py had it
+  parse    - reading, minifying and compiling the template on every send
+  compiled - render() of the template compiled at import (what the senders do)
+
+and reports the HTML sent to Brevo per email, before and after minifying, raw
+and gzipped (the request bodies Brevo receives are JSON with the HTML inside).
+
+Usage:
+    python benchmark_email_templates.py [--calls 20000]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+
+from app.email_templates import SLOT, TEMPLATE_DIR, TEMPLATES, Template
+
+SAMPLE = {
+    "apartment_name": "Green Park Residency", "otp": "0427", "flat_number": "101", "flat_floor": "G",
+    "invitation_code": "AB12CD", "email": "flatmate@example.com", "role": "Owner", "flat_id": "owner_101",
+}
+
+
+def time_calls(fn, calls: int) -> float:
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def brevo_body(html: str) -> bytes:
+    return json.dumps({
+        "sender": {"name": "FlatFund Team", "email": "team@example.com"},
+        "to": [{"email": SAMPLE["email"]}],
+        "subject": "Your FlatFund Access Code",
+        "htmlContent": html,
+    }).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("✉️  FlatFund email templates: render time and payload size")
+    print("=" * 72)
+    print(f"   {'template':<22}{'f-string µs':>13}{'parse µs':>11}{'compiled µs':>13}")
+    sizes = []
+    for name, template in TEMPLATES.items():
+        path = os.path.join(TEMPLATE_DIR, f"{name}.html")
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        values = {slot: SAMPLE[slot] for slot in template.slots}
+        # The old f-string: the whole indented template with the values dropped in
+        fstring = "".join(
+            piece.replace("{", "{{").replace("}", "}}") if n % 2 == 0 else "{%s}" % piece
+            for n, piece in enumerate(SLOT.split(source))
+        )
+        inline = eval(f"lambda {', '.join(sorted(template.slots))}: f{fstring!r}")
+
+        def parse():
+            with open(path, encoding="utf-8") as f:
+                Template(name, f.read()).render(**values)
+
+        timings = (
+            time_calls(lambda: inline(**values), args.calls),
+            time_calls(parse, max(1, args.calls // 20)),
+            time_calls(lambda: template.render(**values), args.calls),
+        )
+        print(f"   {name:<22}" + "".join(f"{t:>{w}.1f}" for t, w in zip(timings, (13, 11, 13))))
+        before, after = inline(**values), template.render(**values)
+        sizes.append((name, brevo_body(before), brevo_body(after)))
+
+    print(f"\n📦 Brevo request body per email (bytes)")
+    print(f"   {'template':<22}{'before':>9}{'after':>9}{'saved':>8}{'gzip before':>14}{'gzip after':>12}")
+    for name, before, after in sizes:
+        print(f"   {name:<22}{len(before):>9,}{len(after):>9,}{1 - len(after) / len(before):>8.0%}"
+              f"{len(gzip.compress(before)):>14,}{len(gzip.compress(after)):>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: UUID storage on SQLite, 36-char text (old GUID) vs 16-byte blob (GUID).
+
+Loads N users (default 100k) with flat_uuid / apartment_uuid into two scratch
+databases, one per storage mode, then reports:
+  - insert time
+  - time to read every row back through the ORM (result processing)
+  - time for 5k point lookups by flat_uuid (bind processing + index)
+  - on-disk size of the table and its UUID indexes (dbstat)
+
+Usage:
+    python benchmark_guid.py [--users 100000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, Column, Integer, String, CHAR, TypeDecorator, select, text
+from sqlalchemy.orm import declarative_base, Session
+
+from app.models import GUID
+
+
+class TextGUID(TypeDecorator):
+    """GUID as it was before binary storage: CHAR(36), re-parsed on every value"""
+    impl = CHAR
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(CHAR(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        if not isinstance(value, uuid.UUID):
+            return str(uuid.UUID(value))
+        return str(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        if not isinstance(value, uuid.UUID):
+            return uuid.UUID(value)
+        return value
+
+
+def user_model(guid_type):
+    Base = declarative_base()
+
+    class BenchUser(Base):
+        __tablename__ = "users"
+        id = Column(Integer, primary_key=True)
+        flat_uuid = Column(guid_type(), unique=True, index=True)
+        apartment_uuid = Column(guid_type(), index=True)
+        apartment_id = Column(String)
+        user_email_id = Column(String)
+
+    return Base, BenchUser
+
+
+def run_mode(guid_type, users, uuids, apartment_uuids):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="flatfund_guid_bench_"), "bench.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base, BenchUser = user_model(guid_type)
+    Base.metadata.create_all(engine)
+    results = {}
+
+    start = time.perf_counter()
+    with Session(engine) as db:
+        db.execute(BenchUser.__table__.insert(), [
+            {
+                "flat_uuid": uuids[n],
+                "apartment_uuid": apartment_uuids[n % len(apartment_uuids)],
+                "apartment_id": f"APT{n % len(apartment_uuids):03d}",
+                "user_email_id": f"user{n}@example.com",
+            }
+            for n in range(users)
+        ])
+        db.commit()
+    results["insert_s"] = time.perf_counter() - start
+
+    with Session(engine) as db:
+        start = time.perf_counter()
+        loaded = db.execute(select(BenchUser)).scalars().all()
+        results["load_s"] = time.perf_counter() - start
+        assert len(loaded) == users and isinstance(loaded[0].flat_uuid, uuid.UUID)
+
+    lookup = select(BenchUser.id).where(BenchUser.flat_uuid == uuids[0])
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for n in range(0, users, max(1, users // 5000)):
+            conn.execute(
+                select(BenchUser.id).where(BenchUser.flat_uuid == uuids[n])
+            ).scalar_one()
+        results["lookups_s"] = time.perf_counter() - start
+        conn.execute(lookup).scalar_one()
+
+        sizes = dict(conn.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all())
+    results["table_kb"] = sizes.get("users", 0) / 1024
+    results["uuid_index_kb"] = sum(
+        size for name, size in sizes.items() if "uuid" in name
+    ) / 1024
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    uuids = [uuid.uuid4() for _ in range(args.users)]
+    apartment_uuids = [uuid.uuid4() for _ in range(500)]
+
+    print("🚀 FlatFund GUID storage benchmark (SQLite)")
+    print("=" * 72)
+    print(f"   users: {args.users}\n")
+
+    rows = []
+    for label, guid_type in (("text CHAR(36)", TextGUID), ("blob 16 bytes", GUID)):
+        print(f"🔄 Running {label}...")
+        rows.append((label, run_mode(guid_type, args.users, uuids, apartment_uuids)))
+
+    print("\n📊 Results")
+    print(f"   {'storage':<16}{'insert s':>10}{'load s':>10}{'5k lookups s':>14}{'table KB':>10}{'uuid idx KB':>13}")
+    for label, r in rows:
+        print(
+            f"   {label:<16}{r['insert_s']:>10.2f}{r['load_s']:>10.2f}{r['lookups_s']:>14.2f}"
+            f"{r['table_kb']:>10.0f}{r['uuid_index_kb']:>13.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
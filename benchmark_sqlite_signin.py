@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/v1/signin write throughput on SQLite with and without the
+high-concurrency pragmas (WAL, synchronous=NORMAL, busy_timeout, ...).
+
+Several worker processes (like several uvicorn workers) hammer /api/v1/signin
+against the same database file. Every call deletes and inserts an
+otp_verifications row. Emails are not sent: the Brevo call is replaced by a no-op.
+
+Usage:
+    python benchmark_sqlite_signin.py [--workers 4] [--seconds 10]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+
+def run_worker(db_path, pragmas, apt_id, worker_id, seconds, results):
+    """One 'uvicorn worker': its own engines and app instance"""
+    os.environ["USE_LOCAL_DB"] = "true"
+    os.environ["LOCAL_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SQLITE_PRAGMAS"] = "true" if pragmas else "false"
+    os.environ.setdefault("BREVO_API_KEY", "benchmark")
+    # Every request comes from one client IP; measure the database, not the limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from fastapi.testclient import TestClient
+    from app import main
+
+    # Not entered as a context manager, so no lifespan: the OTP emails are only
+    # queued in email_outbox, never sent
+    client = TestClient(main.app)
+    ok = locked = failed = 0
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        email = f"user{worker_id}_{i % 50}@example.com"
+        i += 1
+        try:
+            response = client.post("/api/v1/signin", json={"apt_id": apt_id, "admin_email": email})
+        except Exception as e:
+            if "database is locked" in str(e):
+                locked += 1
+            else:
+                failed += 1
+            continue
+        if response.status_code == 200:
+            ok += 1
+        else:
+            failed += 1
+    results.put((ok, locked, failed))
+
+
+def prepare_database(db_path):
+    """Create the schema and one apartment to sign in to"""
+    os.environ["USE_LOCAL_DB"] = "true"
+    os.environ["LOCAL_DATABASE_URL"] = f"sqlite:///{db_path}"
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app import models
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(models.Apartment(
+            apartment_id="BENCH",
+            apartment_name="Bench Towers",
+            apartment_address="Bench Road",
+            admin_email="admin@example.com",
+        ))
+        db.commit()
+    engine.dispose()
+    return "BENCH"
+
+
+def run_mode(pragmas, workers, seconds):
+    tmp_dir = tempfile.mkdtemp(prefix="flatfund_bench_")
+    db_path = os.path.join(tmp_dir, "apartments.db")
+    apt_id = prepare_database(db_path)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=run_worker, args=(db_path, pragmas, apt_id, n, seconds, results))
+        for n in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    totals = [0, 0, 0]
+    for _ in processes:
+        for idx, value in enumerate(results.get()):
+            totals[idx] += value
+    for p in processes:
+        p.join()
+
+    ok, locked, failed = totals
+    return ok / seconds, locked, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print("🚀 FlatFund SQLite /api/v1/signin write benchmark")
+    print("=" * 60)
+    print(f"   workers: {args.workers}, duration: {args.seconds}s per mode\n")
+
+    rows = []
+    for label, pragmas in (("before (rollback journal)", False), ("after (WAL + pragmas)", True)):
+        print(f"🔄 Running {label}...")
+        writes_per_sec, locked, failed = run_mode(pragmas, args.workers, args.seconds)
+        rows.append((label, writes_per_sec, locked, failed))
+
+    print("\n📊 Results")
+    print(f"   {'mode':<28}{'writes/s':>10}{'locked':>10}{'other errors':>14}")
+    for label, writes_per_sec, locked, failed in rows:
+        print(f"   {label:<28}{writes_per_sec:>10.1f}{locked:>10}{failed:>14}")
+
+
+if __name__ == "__main__":
+    main()
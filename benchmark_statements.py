@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call overhead of the hot ORM lookups, built per call vs prebuilt.
+
+For each lookup in app/statements.py, compares:
+  query   - db.query(Model).filter(...).first()    (the old code path)
+  select  - db.execute(select(Model).where(...))   (built on every call)
+  prebuilt- db.execute(statements.X, params)       (built once, cache key memoized)
+
+Runs against a scratch SQLite database so the numbers are mostly ORM/Python
+overhead, not I/O. The identity map is cleared between calls so every call
+really loads the row.
+
+Usage:
+    python benchmark_statements.py [--calls 20000]
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.mkdtemp(prefix="flatfund_stmt_bench_")
+os.environ["USE_LOCAL_DB"] = "true"
+os.environ["LOCAL_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'apartments.db')}"
+os.environ.setdefault("AUTO_MIGRATE", "true")
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import migrations, statements
+from app.models import Apartment, User, RefreshToken
+
+
+def prepare_database(engine):
+    migrations.upgrade(engine)
+    with Session(engine) as db:
+        for n in range(200):
+            db.add(Apartment(
+                apartment_id=f"APT{n:03d}",
+                apartment_name=f"Bench Towers {n}",
+                apartment_address="Bench Road",
+                admin_email="admin@example.com",
+            ))
+            db.add(User(
+                apartment_id=f"APT{n:03d}",
+                user_email_id=f"user{n}@example.com",
+                flat_number="101",
+            ))
+        db.flush()
+        db.add(RefreshToken(
+            token_hash=hashlib.sha256(b"bench-token").digest(),
+            user_id=1,
+            expires_at=datetime.utcnow() + timedelta(days=30),
+        ))
+        db.commit()
+
+
+def lookups():
+    """name -> (query variant, select variant, prebuilt variant), each fn(db)"""
+    token_hash = hashlib.sha256(b"bench-token").digest()
+    return {
+        "Apartment by apartment_id": (
+            lambda db: db.query(Apartment).filter(Apartment.apartment_id == "APT042").first(),
+            lambda db: db.execute(
+                select(Apartment).where(Apartment.apartment_id == "APT042")
+            ).scalars().first(),
+            lambda db: db.execute(
+                statements.APARTMENT_BY_APARTMENT_ID, {"apartment_id": "APT042"}
+            ).scalars().first(),
+        ),
+        "User by id": (
+            lambda db: db.query(User).filter(User.id == 42).first(),
+            lambda db: db.execute(select(User).where(User.id == 42)).scalars().first(),
+            lambda db: db.execute(statements.USER_BY_ID, {"user_id": 42}).scalars().first(),
+        ),
+        "User by (apartment_id, email)": (
+            lambda db: db.query(User).filter(
+                User.apartment_id == "APT042", User.user_email_id == "user42@example.com"
+            ).first(),
+            lambda db: db.execute(select(User).where(
+                User.apartment_id == "APT042", User.user_email_id == "user42@example.com"
+            )).scalars().first(),
+            lambda db: db.execute(
+                statements.USER_BY_APARTMENT_EMAIL,
+                {"apartment_id": "APT042", "email": "user42@example.com"},
+            ).scalars().first(),
+        ),
+        "RefreshToken by token_hash": (
+            lambda db: db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).first(),
+            lambda db: db.execute(
+                select(RefreshToken).where(RefreshToken.token_hash == token_hash)
+            ).scalars().first(),
+            lambda db: db.execute(
+                statements.REFRESH_TOKEN_BY_HASH, {"token_hash": token_hash}
+            ).scalars().first(),
+        ),
+    }
+
+
+def time_calls(engine, fn, calls):
+    with Session(engine) as db:
+        for _ in range(200):  # warm the compiled cache
+            assert fn(db) is not None
+            db.expunge_all()
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn(db)
+            db.expunge_all()
+        return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["LOCAL_DATABASE_URL"])
+    prepare_database(engine)
+
+    print("🚀 FlatFund hot lookup statement benchmark")
+    print("=" * 78)
+    print(f"   {args.calls} calls per variant, µs per call\n")
+    print(f"   {'lookup':<32}{'query':>10}{'select':>10}{'prebuilt':>10}{'saving':>12}")
+    for name, variants in lookups().items():
+        query_us, select_us, prebuilt_us = (time_calls(engine, fn, args.calls) for fn in variants)
+        saving = (query_us - prebuilt_us) / query_us * 100
+        print(f"   {name:<32}{query_us:>10.1f}{select_us:>10.1f}{prebuilt_us:>10.1f}{saving:>11.0f}%")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark: refresh token lookups on a table full of stale rows, before and
+after the sweeper (app/sweeper.py) deletes them.
+
+Fills a scratch SQLite refresh_tokens table with --stale rotated-long-ago
+tokens (10M by default, as a long-running deployment accumulates) and --live
+live ones, then times, before sweeping, after sweeping, and after VACUUM:
+
+  by hash  - REFRESH_TOKEN_BY_HASH for a live token (every /token/refresh)
+  unknown  - the same for a token that doesn't exist (replays, garbage)
+  by user  - live tokens of a user (every login revokes them)
+
+and reports how long the sweep took and the database file size.
+
+Usage:
+    python benchmark_sweeper.py [--stale 10000000] [--live 10000] [--lookups 20000]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.mkdtemp(prefix="flatfund_sweep_bench_")
+DB_PATH = os.path.join(_tmp_dir, "apartments.db")
+os.environ["USE_LOCAL_DB"] = "true"
+os.environ["LOCAL_DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("AUTO_MIGRATE", "true")
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app import migrations, statements
+from app.models import RefreshToken
+from app.sweeper import Sweeper
+
+USERS = 10000
+FILL_BATCH = 100000
+
+
+def fill(engine, stale: int, live: int) -> list:
+    """Insert the tokens with executemany; return the live tokens"""
+    migrations.upgrade(engine)
+    old = (datetime.utcnow() - timedelta(days=90)).isoformat(sep=" ")
+    soon = (datetime.utcnow() + timedelta(days=30)).isoformat(sep=" ")
+    insert = (
+        "INSERT INTO refresh_tokens (token_hash, user_id, expires_at, is_revoked, family_id, rotated_at, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        done = 0
+        while done < stale:
+            count = min(FILL_BATCH, stale - done)
+            cursor.executemany(insert, (
+                (os.urandom(32), random.randrange(USERS), soon, 1, os.urandom(16), old, old)
+                for _ in range(count)
+            ))
+            connection.commit()
+            done += count
+            print(f"\r   stale rows: {done:,}/{stale:,}", end="", flush=True)
+        print()
+        live_tokens = [os.urandom(32).hex() for _ in range(live)]
+        cursor.executemany(insert, (
+            (hashlib.sha256(token.encode()).digest(), n % USERS, soon, 0, os.urandom(16), None, old)
+            for n, token in enumerate(live_tokens)
+        ))
+        connection.commit()
+    finally:
+        connection.close()
+    return live_tokens
+
+
+def time_calls(fn, args: list) -> tuple:
+    """(median, p99) in microseconds"""
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def measure(engine, live_tokens: list, lookups: int) -> dict:
+    hashes = [hashlib.sha256(random.choice(live_tokens).encode()).digest() for _ in range(lookups)]
+    unknown = [os.urandom(32) for _ in range(lookups)]
+    users = [random.randrange(USERS) for _ in range(lookups)]
+    with Session(engine) as db:
+        def by_hash(token_hash):
+            assert db.execute(statements.REFRESH_TOKEN_BY_HASH, {"token_hash": token_hash}).scalars().first()
+            db.expunge_all()
+
+        def by_unknown(token_hash):
+            db.execute(statements.REFRESH_TOKEN_BY_HASH, {"token_hash": token_hash}).scalars().first()
+
+        def by_user(user_id):
+            db.execute(
+                select(func.count()).select_from(RefreshToken).where(
+                    RefreshToken.user_id == user_id, RefreshToken.is_revoked == 0
+                )
+            ).scalar()
+
+        return {
+            "by hash": time_calls(by_hash, hashes),
+            "unknown": time_calls(by_unknown, unknown),
+            "by user": time_calls(by_user, users),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stale", type=int, default=10_000_000)
+    parser.add_argument("--live", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    print("🧹 FlatFund sweeper benchmark: refresh token lookups with stale rows")
+    print("=" * 60)
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    live_tokens = fill(engine, args.stale, args.live)
+
+    rows = [("before sweep", measure(engine, live_tokens, args.lookups), os.path.getsize(DB_PATH))]
+
+    sweeper = Sweeper(engine, retention_days=7, batch_size=args.batch_size, batch_pause=0)
+    start = time.perf_counter()
+    purged = sweeper.run_once()
+    sweep_seconds = time.perf_counter() - start
+    rows.append(("after sweep", measure(engine, live_tokens, args.lookups), os.path.getsize(DB_PATH)))
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+    rows.append(("after VACUUM", measure(engine, live_tokens, args.lookups), os.path.getsize(DB_PATH)))
+
+    deleted = purged["refresh_tokens"]
+    print(f"\n   swept {deleted:,} refresh tokens in {sweep_seconds:.1f}s "
+          f"({deleted / sweep_seconds:,.0f} rows/s, batches of {args.batch_size:,})")
+    print("\n📊 Lookup latency, median / p99 (µs)")
+    print(f"   {'':<14}{'by hash':>18}{'unknown':>18}{'by user':>18}{'file MB':>10}")
+    for label, timings, size in rows:
+        cells = "".join(f"{f'{median:.0f} / {p99:.0f}':>18}" for median, p99 in timings.values())
+        print(f"   {label:<14}{cells}{size / 1e6:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
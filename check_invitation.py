@@ -5,10 +5,13 @@ Script to check invitation details for UUID: 801239d5-3e95-4fda-8e0b-d876ce4028a
 
 import sqlite3
 import sys
+import uuid
 from datetime import datetime
 
 def check_invitation():
     invitation_uuid = '801239d5-3e95-4fda-8e0b-d876ce4028a6'
+    # UUID columns hold the 16 raw bytes on SQLite
+    invitation_key = uuid.UUID(invitation_uuid).bytes
     
     try:
         # Connect to the database
@@ -32,7 +35,7 @@ def check_invitation():
         cursor.execute('''
             SELECT * FROM flatmate_invitations 
             WHERE invitation_uuid = ?
-        ''', (invitation_uuid,))
+        ''', (invitation_key,))
         
         result = cursor.fetchone()
         
@@ -56,6 +59,8 @@ def check_invitation():
                     except:
                         formatted_value = value
                     print(f"   {field_name:20}: {formatted_value}")
+                elif isinstance(value, bytes) and len(value) == 16:
+                    print(f"   {field_name:20}: {uuid.UUID(bytes=value)}")
                 else:
                     print(f"   {field_name:20}: {value}")
             
@@ -76,7 +81,7 @@ def check_invitation():
                     SELECT invited_email FROM flatmate_invitations 
                     WHERE invitation_uuid = ?
                 )
-            ''', (invitation_uuid, invitation_uuid, invitation_uuid))
+            ''', (invitation_key, invitation_key, invitation_key))
             
             user_result = cursor.fetchone()
             
@@ -113,7 +118,7 @@ def check_invitation():
                 print("-" * 80)
                 
                 for inv in recent_invitations:
-                    uuid_short = inv[0][:8] if inv[0] else 'N/A'
+                    uuid_short = str(uuid.UUID(bytes=inv[0]))[:8] if isinstance(inv[0], bytes) else (inv[0] or 'N/A')[:8]
                     created_short = inv[6][:16] if inv[6] else 'N/A'
                     print(f"{uuid_short:<12} {inv[1]:<8} {inv[2]:<6} {inv[3]:<6} {inv[4]:<25} {inv[5]:<5} {created_short}")
             else:
@@ -0,0 +1,37 @@
+"""Shared test setup: the app runs against scratch SQLite files, never ./apartments.db.
+
+app.database binds its engines when it is first imported, so the environment
+has to point at a scratch file before any test module imports the app. pytest
+loads this file before collecting the tests, and the test modules import it
+ahead of the app themselves, so `python test_x.py` gets the same setup.
+"""
+import os
+import tempfile
+
+import pytest
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="flatfund_tests_")
+
+
+def scratch_database_url(name: str) -> str:
+    """An SQLite file of its own under SCRATCH_DIR, for a test module's own engine"""
+    return f"sqlite:///{os.path.join(SCRATCH_DIR, f'{name}.db')}"
+
+
+# The app's engines (migrated on startup, AUTO_MIGRATE, when app.main is imported)
+DATABASE_URL = scratch_database_url("app")
+os.environ["USE_LOCAL_DB"] = "true"
+os.environ["LOCAL_DATABASE_URL"] = DATABASE_URL
+os.environ.pop("LOCAL_READ_DATABASE_URL", None)
+os.environ["AUTO_MIGRATE"] = "true"
+# The app refuses to derive invitation codes from the public default secret
+os.environ.setdefault("SECRET_KEY", "flatfund-tests")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def app_database():
+    """app.database, checked to be bound to the scratch file before any test seeds it"""
+    from app import database
+
+    assert str(database.engine.url) == DATABASE_URL, f"app.database is bound to {database.engine.url}"
+    return database
@@ -72,7 +72,12 @@ ssh -i "$KEY_FILE" "$SERVER_USER@$SERVER_IP" << EOF
     # Restart services
     cd $DEPLOY_PATH
     sudo docker-compose down
-    sudo docker-compose up --build -d
+    sudo docker-compose build
+
+    # Apply database migrations once, before the workers start
+    sudo docker-compose run --rm app python -m app.migrate
+
+    sudo docker-compose up -d
     
     # Check service status
     sleep 5
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Check the authenticated-user cache (app/auth_cache.py).
+
+- an entry is dropped after its TTL, or sooner when the token expires;
+- beyond maxsize the least recently used entry is evicted;
+- invalidate_user() drops every token of that user and no other, and a user
+  loaded before an invalidation is not cached;
+- updating or deleting a user through the ORM (crud_users.update_user,
+  db.delete) invalidates it once the change commits, not when it is rolled
+  back.
+
+Usage:
+    python test_auth_cache.py      (or: python -m pytest test_auth_cache.py)
+"""
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from conftest import scratch_database_url
+from app import crud_users, migrations
+from app.auth_cache import AuthCache, auth_cache
+from app.models import Apartment, User, UserRole
+
+engine = create_engine(scratch_database_url("auth_cache"))
+migrations.upgrade(engine)
+
+
+def _user(user_id: int, role: UserRole = UserRole.OWNER) -> User:
+    return User(id=user_id, apartment_id="APT1", user_email_id=f"user{user_id}@example.com",
+                flat_id=f"{role.value}_APT1", role=role)
+
+
+def _put(cache: AuthCache, token: str, user: User, claims: dict = None):
+    cache.put(token, claims or {"user_id": user.id}, user, cache.generation)
+
+
+def test_ttl_and_token_expiry():
+    cache = AuthCache(maxsize=10, ttl=0.05)
+    _put(cache, "short-ttl", _user(1))
+    _put(cache, "expiring", _user(2), {"user_id": 2, "exp": time.time() + 0.05})
+    long_cache = AuthCache(maxsize=10, ttl=60)
+    _put(long_cache, "expiring", _user(2), {"user_id": 2, "exp": time.time() + 0.05})
+    assert cache.get("short-ttl").user().id == 1 and long_cache.get("expiring") is not None
+    time.sleep(0.06)
+    assert cache.get("short-ttl") is None and cache.get("expiring") is None
+    # A 60 s TTL doesn't outlive the token itself
+    assert long_cache.get("expiring") is None
+    assert cache.stats()["size"] == 0 and (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction():
+    cache = AuthCache(maxsize=3, ttl=60)
+    for n in range(1, 4):
+        _put(cache, f"token{n}", _user(n))
+    assert cache.get("token1") is not None  # now the most recently used
+    _put(cache, "token4", _user(4))
+    assert cache.get("token2") is None
+    assert all(cache.get(f"token{n}") is not None for n in (1, 3, 4))
+    assert cache.evictions == 1 and cache.stats()["size"] == 3
+
+
+def test_invalidate_user():
+    cache = AuthCache(maxsize=10, ttl=60)
+    _put(cache, "phone", _user(1))
+    _put(cache, "laptop", _user(1))
+    _put(cache, "other", _user(2))
+    generation = cache.generation
+    cache.invalidate_user(1)
+    assert cache.get("phone") is None and cache.get("laptop") is None
+    assert cache.get("other") is not None
+    # Loaded before the invalidation (e.g. with the old role): not cached
+    cache.put("stale", {"user_id": 1}, _user(1, UserRole.ADMIN), generation)
+    assert cache.get("stale") is None and cache.stats()["size"] == 1
+
+
+def test_orm_delete_invalidates_on_commit():
+    auth_cache.clear()
+    with Session(engine) as db:
+        db.add(Apartment(apartment_id="APTCACHE", apartment_name="Cache Court",
+                         apartment_address="LRU Lane", admin_email="admin@example.com"))
+        user = User(apartment_id="APTCACHE", user_email_id="gone@example.com", flat_number="101")
+        db.add(user)
+        db.commit()
+        _put(auth_cache, "gone-token", user)
+
+        db.delete(user)
+        db.flush()
+        db.rollback()
+        assert auth_cache.get("gone-token") is not None
+
+        db.delete(user)
+        db.commit()
+        assert auth_cache.get("gone-token") is None
+
+
+def test_orm_update_invalidates_on_commit():
+    auth_cache.clear()
+    with Session(engine) as db:
+        db.add(Apartment(apartment_id="APTUPDATE", apartment_name="Update Towers",
+                         apartment_address="Dirty Street", admin_email="admin@example.com"))
+        user = User(apartment_id="APTUPDATE", user_email_id="renamed@example.com", flat_number="101")
+        db.add(user)
+        db.commit()
+        _put(auth_cache, "renamed-token", user)
+
+        user.user_name = "Rolled Back"
+        db.flush()
+        db.rollback()
+        assert auth_cache.get("renamed-token") is not None
+
+        crud_users.update_user(db, user.id, {"user_name": "Renamed"})
+        assert auth_cache.get("renamed-token") is None
+
+
+if __name__ == "__main__":
+    test_ttl_and_token_expiry()
+    print("✅ entries expire after the TTL, or with their token")
+    test_lru_eviction()
+    print("✅ least recently used entry evicted beyond maxsize")
+    test_invalidate_user()
+    print("✅ invalidate_user drops that user's tokens; stale loads aren't cached")
+    test_orm_delete_invalidates_on_commit()
+    print("✅ ORM delete invalidates once committed, not on rollback")
+    test_orm_update_invalidates_on_commit()
+    print("✅ ORM updates (crud_users.update_user) invalidate once committed")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Check the authentication dependencies (app/auth_deps.py) through the app.
+
+Seeds a scratch SQLite database with an apartment, its admin and an owner,
+then:
+
+- require_roles lets the admin through and answers 403 to the owner, and 401
+  without a token;
+- a role change drops the user's cached tokens, and the old token is refused;
+- on a sync route, get_principal has given its async connection back before
+  the handler checks out its own.
+
+Usage:
+    python test_auth_deps.py      (or: python -m pytest test_auth_deps.py)
+"""
+import asyncio
+import itertools
+import time
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import conftest  # noqa: F401  (points the app at a scratch database)
+from app import database
+from app.auth_cache import auth_cache
+from app.main import app
+from app.models import Apartment, User, UserRole
+from app.routers.auth import create_access_token
+
+_apartment_numbers = itertools.count(1)
+
+
+def seed_users() -> dict:
+    """An apartment with its admin and an owner; role -> (user_id, access token)"""
+    apartment_id = f"APTAD{next(_apartment_numbers)}"
+    users = {}
+    with Session(database.engine) as db:
+        db.add(Apartment(apartment_id=apartment_id, apartment_name="Role Residency",
+                         apartment_address="Depends Street", admin_email="admin@example.com"))
+        for role, email in ((UserRole.ADMIN, "admin@example.com"), (UserRole.OWNER, "owner@example.com")):
+            user = User(apartment_id=apartment_id, user_email_id=email, flat_number="101",
+                        flat_id=f"{role.value}_{apartment_id}", role=role)
+            db.add(user)
+            db.flush()
+            users[role] = user.id
+        db.commit()
+    return {
+        role: (user_id, create_access_token({
+            "sub": f"{role.value}_{apartment_id}", "user_id": str(user_id),
+            "apt_id": apartment_id, "role": role.value,
+        }))
+        for role, user_id in users.items()
+    }
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _requests(*calls) -> list:
+    """(method, url, kwargs) calls, made one after another"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = [await client.request(method, url, **kwargs) for method, url, kwargs in calls]
+    # Close the pooled aiosqlite connections while their event loop is alive
+    await database.async_engine.dispose()
+    return responses
+
+
+def requests(*calls) -> list:
+    return asyncio.run(_requests(*calls))
+
+
+def test_require_roles_allows_and_denies():
+    users = seed_users()
+    admin, owner = users[UserRole.ADMIN][1], users[UserRole.OWNER][1]
+    security = {"name": "Guard", "phone_number": "9876543210"}
+    responses = requests(
+        ("GET", "/health/auth-cache", {"headers": _bearer(admin)}),
+        ("GET", "/health/auth-cache", {"headers": _bearer(owner)}),
+        ("GET", "/health/auth-cache", {}),
+        ("POST", "/api/v1/admin/security", {"headers": _bearer(admin), "json": security}),
+        ("POST", "/api/v1/admin/security", {"headers": _bearer(owner), "json": security}),
+    )
+    assert [r.status_code for r in responses] == [200, 403, 401, 200, 403], [r.text for r in responses]
+    assert responses[4].json()["detail"] == "Only apartment administrators can add security personnel"
+
+
+def test_role_change_invalidates_cached_tokens():
+    users = seed_users()
+    owner_id, owner = users[UserRole.OWNER]
+    (first,) = requests(("GET", "/api/v1/admin/security", {"headers": _bearer(owner)}))
+    assert first.status_code == 200 and auth_cache.get(owner) is not None, first.text
+    # Tokens issued in the revocation's own second stay valid
+    time.sleep(1.1)
+    (changed,) = requests(("PUT", f"/api/v1/user/{owner_id}/role", {"params": {"new_role": "tenant"}}))
+    assert changed.status_code == 200 and auth_cache.get(owner) is None, changed.text
+    (after,) = requests(("GET", "/api/v1/admin/security", {"headers": _bearer(owner)}))
+    assert after.status_code == 401, after.text
+
+
+def test_sync_route_holds_one_connection():
+    _, owner = seed_users()[UserRole.OWNER]
+    async_pool = database.async_engine.sync_engine.pool
+    held = []
+
+    def on_checkout(*args):
+        # The handler's sync session connecting: is get_principal's still out?
+        held.append(async_pool.checkedout())
+
+    engines = {database.engine, database.read_engine}
+    for engine in engines:
+        event.listen(engine, "checkout", on_checkout)
+    try:
+        auth_cache.clear()  # a cache miss, so get_principal loads the user
+        (response,) = requests(("GET", "/api/v1/flatmatedetails", {"headers": _bearer(owner)}))
+    finally:
+        for engine in engines:
+            event.remove(engine, "checkout", on_checkout)
+    assert response.status_code == 200, response.text
+    assert held and not any(held), held
+
+
+if __name__ == "__main__":
+    test_require_roles_allows_and_denies()
+    print("✅ require_roles: admin allowed, owner 403, no token 401")
+    test_role_change_invalidates_cached_tokens()
+    print("✅ a role change drops cached tokens and refuses the old one")
+    test_sync_route_holds_one_connection()
+    print("✅ sync routes don't hold an async connection beside their own")
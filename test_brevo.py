@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Check the shared Brevo client against a stand-in Brevo API on localhost.
+
+- sends reuse one kept-alive connection (a client per send, as the senders
+  used to build, opens a connection every time), and stats() says so;
+- a Brevo that doesn't answer fails the send after the read timeout;
+- closing the client closes the SDK's ApiClient (its connections and thread
+  pool) but keeps the counters, and the next send starts it again.
+
+Usage:
+    python test_brevo.py      (or: python -m pytest test_brevo.py)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import sib_api_v3_sdk
+
+from app.brevo import BrevoClient
+
+
+class StandInBrevo(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = set()
+    delay = 0.0
+
+    def do_POST(self):
+        StandInBrevo.connections.add(self.client_address)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(StandInBrevo.delay)
+        body = json.dumps({"messageId": "<test@example.com>"}).encode()
+        try:
+            self.send_response(201)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client timed out and hung up
+
+    def log_message(self, *args):
+        pass
+
+
+def _server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInBrevo)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StandInBrevo.connections = set()
+    StandInBrevo.delay = 0.0
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v3"
+
+
+def _message(n: int):
+    return sib_api_v3_sdk.SendSmtpEmail(
+        to=[{"email": f"user{n}@example.com"}], html_content="<p>Hi</p>",
+        sender={"name": "FlatFund Team", "email": "team@example.com"}, subject="Test",
+    )
+
+
+def test_sends_reuse_one_connection():
+    server, url = _server()
+    try:
+        client = BrevoClient(api_key="test", host=url)
+        for n in range(10):
+            client.send(_message(n))
+        stats = client.stats()
+        assert len(StandInBrevo.connections) == 1, StandInBrevo.connections
+        assert (stats["requests"], stats["connections_created"], stats["connections_reused"]) == (10, 1, 9), stats
+        assert stats["idle_connections"] == 1
+
+        StandInBrevo.connections = set()
+        for n in range(5):
+            BrevoClient(api_key="test", host=url).send(_message(n))
+        assert len(StandInBrevo.connections) == 5
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_read_timeout():
+    server, url = _server()
+    StandInBrevo.delay = 1.0
+    try:
+        client = BrevoClient(api_key="test", host=url, read_timeout=0.2)
+        start = time.perf_counter()
+        try:
+            client.send(_message(0))
+        except Exception as e:
+            assert "timed out" in str(e).lower(), e
+        else:
+            raise AssertionError("a send outlived its read timeout")
+        assert time.perf_counter() - start < 0.9
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_close_keeps_counters():
+    server, url = _server()
+    try:
+        client = BrevoClient(api_key="test", host=url)
+        client.send(_message(0))
+        client.send(_message(1))
+        api_client = client.start().api_client
+        thread_pool = api_client.pool  # the SDK starts it for async_req sends
+        client.close()
+        assert not client.stats()["started"]
+        assert len(api_client.rest_client.pool_manager.pools) == 0
+        assert api_client._pool is None and not any(worker.is_alive() for worker in thread_pool._pool)
+        client.send(_message(2))
+        stats = client.stats()
+        assert (stats["requests"], stats["connections_created"], stats["connections_reused"]) == (3, 2, 1), stats
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    test_sends_reuse_one_connection()
+    print("✅ sends reuse one kept-alive connection")
+    test_read_timeout()
+    print("✅ an unanswered send fails after the read timeout")
+    test_close_keeps_counters()
+    print("✅ close shuts the ApiClient down but keeps the counters; the next send starts a new pool")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Check the transactional email outbox on a scratch SQLite database.
+
+- an email is queued only if the unit of work commits, and a commit wakes the
+  delivery loop, which sends it without the request waiting;
+- a delivered email is marked sent and its payload (with the code) dropped;
+- a failing email is retried with backoff, then marked dead, and can be requeued;
+- the delivery loop keeps at most `concurrency` sends in flight;
+- stopping the loop lets a send in flight finish and be marked sent;
+- two workers draining the same outbox never send one email twice.
+
+Usage:
+    python test_email_outbox.py      (or: python -m pytest test_email_outbox.py)
+"""
+import asyncio
+import threading
+import time
+from contextlib import suppress
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from conftest import scratch_database_url
+from app import migrations
+from app.email_outbox import DEAD, PENDING, SENT, Outbox
+from app.models import EmailOutbox
+from app.unit_of_work import UnitOfWork
+
+DATABASE_URL = scratch_database_url("email_outbox")
+migrations.upgrade(create_engine(DATABASE_URL))
+
+
+def send_test_email(email: str, code: str):
+    """Stand-in sender; replaced per test through Outbox.senders"""
+
+
+async def _with_outbox(check, **options):
+    engine = create_async_engine(DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1))
+    outbox = Outbox(engine, **options)
+    outbox.register(send_test_email)
+    async with engine.begin() as connection:
+        await connection.execute(delete(EmailOutbox))
+    try:
+        return await check(engine, outbox)
+    finally:
+        await engine.dispose()
+
+
+async def _queue(engine, outbox, count: int = 1, commit: bool = True):
+    async with AsyncSession(engine) as session:
+        uow = UnitOfWork(session)
+        for n in range(count):
+            outbox.enqueue(uow, send_test_email, f"user{n}@example.com", f"{n:04d}")
+        if commit:
+            await uow.commit()
+        else:
+            await uow.rollback()
+
+
+async def _rows(engine) -> list:
+    async with engine.connect() as connection:
+        return (await connection.execute(select(EmailOutbox).order_by(EmailOutbox.id))).all()
+
+
+async def _until_sent(engine, count: int, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if sum(row.status == SENT for row in await _rows(engine)) >= count:
+            return
+        await asyncio.sleep(0.01)
+
+
+async def _stop(loop):
+    loop.cancel()
+    with suppress(asyncio.CancelledError):
+        await loop
+
+
+def test_commit_queues_and_wakes_delivery():
+    async def check(engine, outbox):
+        sent = []
+        outbox.senders["send_test_email"] = lambda *args: sent.append(args)
+        await _queue(engine, outbox, commit=False)
+        assert await _rows(engine) == []
+        loop = asyncio.create_task(outbox.run_forever(poll=60))
+        await asyncio.sleep(0.05)
+        await _queue(engine, outbox)
+        await _until_sent(engine, 1)
+        await _stop(loop)
+        assert sent == [("user0@example.com", "0000")]
+        (row,) = await _rows(engine)
+        assert row.status == SENT and row.payload is None and row.attempts == 1 and row.sent_at
+
+    asyncio.run(_with_outbox(check))
+
+
+def test_failures_retry_then_dead_letter():
+    async def check(engine, outbox):
+        def fail(*args):
+            raise RuntimeError("Brevo is down")
+
+        outbox.senders["send_test_email"] = fail
+        await _queue(engine, outbox)
+        for attempt in range(1, 4):
+            assert await outbox.run_once() == 1
+            (row,) = await _rows(engine)
+            assert row.attempts == attempt and "Brevo is down" in row.last_error
+            if attempt < 3:
+                assert row.status == PENDING and row.next_attempt_at > datetime.utcnow()
+                # Not due yet: nothing to do until the backoff has passed
+                assert await outbox.run_once() == 0
+                async with engine.begin() as connection:
+                    await connection.execute(update(EmailOutbox).values(next_attempt_at=datetime.utcnow()))
+        assert row.status == DEAD and outbox.dead == 1
+        assert await outbox.run_once() == 0
+        assert await outbox.requeue_dead() == 1
+        outbox.senders["send_test_email"] = lambda *args: None
+        assert await outbox.run_once() == 1
+        assert (await _rows(engine))[0].status == SENT
+
+    asyncio.run(_with_outbox(check, max_attempts=3, retry_base=60))
+
+
+def test_backoff_doubles_up_to_the_cap():
+    outbox = Outbox(None, retry_base=5, retry_max=60)
+    for attempts, ceiling in ((1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (9, 60)):
+        assert ceiling / 2 <= outbox.backoff(attempts) <= ceiling
+
+
+def test_concurrency_limit():
+    async def check(engine, outbox):
+        running, peak, done = 0, 0, []
+        lock = threading.Lock()
+
+        def slow(email, code):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.1)
+            with lock:
+                running -= 1
+                done.append(email)
+
+        outbox.senders["send_test_email"] = slow
+        await _queue(engine, outbox, count=9)
+        loop = asyncio.create_task(outbox.run_forever(poll=0.05))
+        await _until_sent(engine, 9)
+        await _stop(loop)
+        assert len(done) == 9 and peak == 3, (len(done), peak)
+
+    asyncio.run(_with_outbox(check, concurrency=3))
+
+
+def test_shutdown_finishes_sends_in_flight():
+    async def check(engine, outbox):
+        started = threading.Event()
+
+        def slow(*args):
+            started.set()
+            time.sleep(0.3)
+
+        outbox.senders["send_test_email"] = slow
+        await _queue(engine, outbox, count=2)
+        loop = asyncio.create_task(outbox.run_forever(poll=60))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await _stop(loop)
+        # Sent before the loop stopped, so not left pending to be sent again
+        assert [row.status for row in await _rows(engine)] == [SENT, SENT]
+
+    asyncio.run(_with_outbox(check))
+
+
+def test_two_workers_send_each_email_once():
+    async def check(engine, outbox):
+        sent = []
+        other = Outbox(engine, concurrency=2)
+        for worker in (outbox, other):
+            worker.senders["send_test_email"] = lambda *args: sent.append(args[0])
+        await _queue(engine, outbox, count=20)
+        await asyncio.gather(outbox.run_once(), other.run_once())
+        assert sorted(sent) == sorted(f"user{n}@example.com" for n in range(20))
+        assert {row.status for row in await _rows(engine)} == {SENT}
+
+    asyncio.run(_with_outbox(check, concurrency=2))
+
+
+if __name__ == "__main__":
+    test_commit_queues_and_wakes_delivery()
+    print("✅ committed emails are queued and delivered in the background")
+    test_failures_retry_then_dead_letter()
+    print("✅ failures retry with backoff, then dead-letter; dead emails can be requeued")
+    test_backoff_doubles_up_to_the_cap()
+    print("✅ backoff doubles up to its cap, with jitter")
+    test_concurrency_limit()
+    print("✅ at most `concurrency` sends in flight")
+    test_shutdown_finishes_sends_in_flight()
+    print("✅ stopping the loop lets the sends in flight finish and be recorded")
+    test_two_workers_send_each_email_once()
+    print("✅ two workers: every email sent exactly once")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Check the precompiled email templates (app/email_templates).
+
+- every template renders with exactly its slots, and refuses missing or extra ones;
+- minifying keeps the text and markup a reader sees, and shrinks every template;
+- values are HTML-escaped.
+
+Usage:
+    python test_email_templates.py      (or: python -m pytest test_email_templates.py)
+"""
+import os
+from html.parser import HTMLParser
+
+from app.email_templates import SLOT, TEMPLATE_DIR, TEMPLATES, render
+
+SAMPLE = {
+    "apartment_name": "Green Park", "otp": "0427", "flat_number": "101", "flat_floor": "G",
+    "invitation_code": "AB12CD", "email": "flatmate@example.com", "role": "Owner", "flat_id": "owner_101",
+}
+
+
+class _Visible(HTMLParser):
+    """Words outside <style>, and the start tags with their attributes"""
+
+    def __init__(self, markup: str):
+        super().__init__()
+        self.words, self.tags, self._in_style = [], [], False
+        self.feed(markup)
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.append((tag, attrs))
+        self._in_style = tag == "style"
+
+    def handle_endtag(self, tag):
+        self._in_style = False
+
+    def handle_data(self, data):
+        if not self._in_style:
+            self.words.extend(data.split())
+
+
+def test_templates_render_their_slots():
+    assert set(TEMPLATES) == {"otp", "login_otp", "flatmate_invitation", "welcome", "tenant_invitation"}
+    for name, template in TEMPLATES.items():
+        values = {slot: SAMPLE[slot] for slot in template.slots}
+        html = render(name, **values)
+        assert "{{" not in html and all(str(value) in html for value in values.values()), name
+        for bad in ({**values, "unknown": 1}, dict(list(values.items())[1:])):
+            try:
+                render(name, **bad)
+            except TypeError:
+                pass
+            else:
+                raise AssertionError(f"{name} rendered with {sorted(bad)}")
+
+
+def test_minifying_keeps_what_readers_see():
+    for name, template in TEMPLATES.items():
+        with open(os.path.join(TEMPLATE_DIR, f"{name}.html"), encoding="utf-8") as f:
+            source = SLOT.sub(lambda match: SAMPLE[match.group(1)], f.read())
+        rendered = render(name, **{slot: SAMPLE[slot] for slot in template.slots})
+        before, after = _Visible(source), _Visible(rendered)
+        assert before.words == after.words and before.tags == after.tags, name
+        assert template.minified_bytes < template.source_bytes * 0.8, (name, template.minified_bytes)
+
+
+def test_values_are_escaped():
+    html = render("tenant_invitation", apartment_name="<b>Tom & Jerry</b>", flat_id="owner_1")
+    assert "&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;" in html and "<b>Tom" not in html
+
+
+if __name__ == "__main__":
+    test_templates_render_their_slots()
+    print("✅ every template renders exactly its slots")
+    test_minifying_keeps_what_readers_see()
+    print("✅ minified templates keep their text and markup, and are smaller")
+    test_values_are_escaped()
+    print("✅ values are HTML-escaped")
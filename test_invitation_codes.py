@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Check the invitation code generator on a scratch SQLite database.
+
+- the keyed Feistel network is a bijection of the code space, and a different
+  key gives a different sequence;
+- codes are six characters of A-Z and 0-9;
+- two workers sharing the counter never hand out the same code, and the only
+  statements they run are the counter block reservations;
+- the generator refuses to start with no key or the public default
+  SECRET_KEY.
+
+Usage:
+    python test_invitation_codes.py      (or: python -m pytest test_invitation_codes.py)
+"""
+import asyncio
+import random
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from conftest import scratch_database_url
+from app import migrations
+from app.invitation_codes import ALPHABET, CODE_LENGTH, CODE_SPACE, FeistelPermutation, InvitationCodes, encode
+from app.jwt_keys import DEFAULT_SECRET_KEY
+
+DATABASE_URL = scratch_database_url("invitation_codes")
+engine = create_engine(DATABASE_URL)
+migrations.upgrade(engine)
+
+
+def test_permutation_is_a_bijection():
+    permutation = FeistelPermutation("test key")
+    values = [0, 1, 2, CODE_SPACE - 1] + random.sample(range(CODE_SPACE), 2000)
+    permuted = [permutation.permute(value) for value in values]
+    assert all(0 <= value < CODE_SPACE for value in permuted)
+    assert len(set(permuted)) == len(set(values))
+    assert [permutation.invert(value) for value in permuted] == values
+    other = FeistelPermutation("another key")
+    assert [other.permute(value) for value in range(100)] != permuted[:100]
+
+
+def test_codes_are_six_alphanumerics():
+    permutation = FeistelPermutation("test key")
+    for value in (0, 1, CODE_SPACE - 1):
+        code = encode(permutation.permute(value))
+        assert len(code) == CODE_LENGTH and set(code) <= set(ALPHABET), code
+    assert encode(0) == "AAAAAA" and encode(CODE_SPACE - 1) == "999999"
+
+
+async def _two_workers(count: int) -> tuple:
+    async_engine = create_async_engine(DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1))
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    workers = [InvitationCodes(async_engine, key="test key", block=7) for _ in range(2)]
+    try:
+        codes = await asyncio.gather(*(workers[n % 2].next_code() for n in range(count)))
+    finally:
+        await async_engine.dispose()
+    return codes, statements
+
+
+def test_workers_never_share_a_code():
+    codes, statements = asyncio.run(_two_workers(100))
+    assert len(set(codes)) == 100
+    assert not [s for s in statements if "invitations" in s], statements
+    # 50 codes per worker in blocks of 7: 8 reservations each
+    assert sum(s.lstrip().upper().startswith("UPDATE COUNTERS") for s in statements) == 16, statements
+
+
+def test_refuses_default_key():
+    for key in ("", DEFAULT_SECRET_KEY):
+        try:
+            InvitationCodes(engine, key=key)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError(f"started with key {key!r}")
+
+
+if __name__ == "__main__":
+    test_permutation_is_a_bijection()
+    print("✅ keyed Feistel network: a bijection of the code space")
+    test_codes_are_six_alphanumerics()
+    print("✅ codes are six characters of A-Z and 0-9")
+    test_workers_never_share_a_code()
+    print("✅ two workers: unique codes, only counter reservations, no lookups")
+    test_refuses_default_key()
+    print("✅ refuses a missing or default key")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Check the JWT key ring (app/jwt_keys.py) and /.well-known/jwks.json.
+
+- tokens are signed with the active key and carry its kid;
+- after a rotation, tokens of the old and the new key both verify, with the
+  ring and with nothing but the published JWKS (as another service would),
+  also once the old key's private half is removed;
+- a token whose kid isn't in the ring is rejected, and so is one without a
+  kid once legacy HS256 tokens are no longer accepted.
+
+Usage:
+    python test_jwt_keys.py      (or: python -m pytest test_jwt_keys.py)
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from jose import JWTError, jwt
+
+from conftest import SCRATCH_DIR
+from app import main
+from app.jwt_keys import KeyRing, generate_key, load_key_file
+
+CLAIMS = {"sub": "owner_APT1", "user_id": "7", "role": "owner"}
+
+
+def _new_key(keys_dir: str, algorithm: str):
+    kid = generate_key(keys_dir, algorithm)
+    return load_key_file(os.path.join(keys_dir, f"{kid}.pem"))
+
+
+def _claims(**extra) -> dict:
+    return {**CLAIMS, "exp": int(time.time()) + 300, **extra}
+
+
+def verify_with_jwks(token: str, jwks: dict) -> dict:
+    """What a service holding only the published JWKS does"""
+    kid = jwt.get_unverified_header(token)["kid"]
+    (key,) = [key for key in jwks["keys"] if key["kid"] == kid]
+    return jwt.decode(token, key, algorithms=[key["alg"]])
+
+
+async def _get_jwks() -> httpx.Response:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/.well-known/jwks.json")
+
+
+def test_signs_with_the_active_key():
+    keys_dir = tempfile.mkdtemp(dir=SCRATCH_DIR)
+    rsa_key, ec_key = _new_key(keys_dir, "RS256"), _new_key(keys_dir, "ES256")
+    for active in (rsa_key, ec_key):
+        ring = KeyRing([rsa_key, ec_key], active.kid)
+        token = ring.sign(_claims())
+        assert jwt.get_unverified_header(token) == {"alg": active.algorithm, "kid": active.kid, "typ": "JWT"}
+        assert ring.verify(token)["user_id"] == "7"
+
+
+def test_rotation_verifies_through_the_published_jwks():
+    keys_dir = tempfile.mkdtemp(dir=SCRATCH_DIR)
+    old = _new_key(keys_dir, "RS256")
+    old_token = KeyRing([old], old.kid).sign(_claims(jti="old"))
+
+    new = _new_key(keys_dir, "ES256")
+    ring = KeyRing([old, new], new.kid)
+    new_token = ring.sign(_claims(jti="new"))
+    assert jwt.get_unverified_header(new_token)["kid"] == new.kid
+
+    served = main.key_ring
+    main.key_ring = ring
+    try:
+        response = asyncio.run(_get_jwks())
+    finally:
+        main.key_ring = served
+    assert response.status_code == 200 and "max-age" in response.headers["cache-control"]
+    jwks = response.json()
+    assert {key["kid"] for key in jwks["keys"]} == {old.kid, new.kid}
+    assert all("d" not in key for key in jwks["keys"]), "private key material published"
+    for token, jti in ((old_token, "old"), (new_token, "new")):
+        assert ring.verify(token)["jti"] == jti
+        assert verify_with_jwks(token, jwks)["jti"] == jti
+
+    # The old key retired: only its public half is left, and it still verifies
+    old_public = old.verifying_key.to_pem()
+    assert b"PRIVATE" not in old_public
+    with open(os.path.join(keys_dir, f"{old.kid}.pem"), "wb") as f:
+        f.write(old_public)
+    retired = load_key_file(os.path.join(keys_dir, f"{old.kid}.pem"))
+    assert retired.signing_key is None
+    ring = KeyRing([retired, new], new.kid)
+    assert ring.verify(old_token)["jti"] == "old"
+    assert verify_with_jwks(old_token, ring.jwks())["jti"] == "old"
+
+
+def test_rejects_unknown_kid():
+    keys_dir = tempfile.mkdtemp(dir=SCRATCH_DIR)
+    trusted = _new_key(keys_dir, "ES256")
+    ring = KeyRing([trusted], trusted.kid, legacy_secret="legacy", accept_legacy=False)
+    stranger = _new_key(tempfile.mkdtemp(dir=SCRATCH_DIR), "ES256")
+    tokens = {
+        "unknown key": KeyRing([stranger], stranger.kid).sign(_claims()),
+        # Claims a trusted kid, but signed with another key
+        "wrong key": jwt.encode(_claims(), stranger.signing_key, algorithm="ES256", headers={"kid": trusted.kid}),
+        "no kid": jwt.encode(_claims(), "legacy", algorithm="HS256"),
+    }
+    for name, token in tokens.items():
+        try:
+            ring.verify(token)
+        except JWTError:
+            pass
+        else:
+            raise AssertionError(f"{name}: token accepted")
+    # Accepted while legacy HS256 tokens still are
+    legacy_ring = KeyRing([trusted], trusted.kid, legacy_secret="legacy", accept_legacy=True)
+    assert legacy_ring.verify(tokens["no kid"])["user_id"] == "7"
+
+
+if __name__ == "__main__":
+    test_signs_with_the_active_key()
+    print("✅ tokens are signed with the active key and carry its kid")
+    test_rotation_verifies_through_the_published_jwks()
+    print("✅ after a rotation old and new tokens verify, also through the published JWKS")
+    test_rejects_unknown_kid()
+    print("✅ unknown or mismatched kids are rejected; kid-less tokens only while legacy is on")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Check that every OTP store backend behaves the same.
+
+Runs the same checks against the SQL store (a scratch SQLite file), the
+in-process store, and the Redis store talking to a small stand-in RESP server
+started by this script (no Redis needed):
+
+- a live code is accepted once, then reported as used;
+- a wrong code is invalid, an expired one is reported as expired;
+- issuing a new code invalidates the previous one.
+
+The stateless store (OTP_MODE=stateless) is checked with a fake clock on top
+of each nonce backend: the same code is sent again within a window, a code is
+accepted once (also by exactly one of several concurrent attempts), and after
+two windows it has expired. It refuses to start with no secret or the public
+default SECRET_KEY.
+
+Usage:
+    python test_otp_store.py      (or: python -m pytest test_otp_store.py)
+"""
+import asyncio
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from conftest import scratch_database_url
+from app import migrations
+from app.jwt_keys import DEFAULT_SECRET_KEY
+from app.otp_store import (
+    OTPCheck, SQLOTPStore, MemoryOTPStore, RedisOTPStore,
+    StatelessOTPStore, SQLOTPNonces, MemoryOTPNonces, RedisOTPNonces,
+)
+from app.resp import RespClient, RespError, encode_command, read_reply
+
+DATABASE_URL = scratch_database_url("otp_store")
+
+
+class StandInRespServer:
+    """The few Redis commands the OTP store uses, with key expiry"""
+
+    def __init__(self):
+        self.data: dict = {}  # key -> (value, expires at or None)
+        self.server = None
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def _set(self, key, value, options):
+        options = [option.upper() for option in options]
+        previous = self._get(key)
+        expires_at = None
+        if "PX" in options:
+            expires_at = time.monotonic() + int(options[options.index("PX") + 1]) / 1000
+        elif "KEEPTTL" in options and previous is not None:
+            expires_at = self.data[key][1]
+        if ("XX" in options and previous is None) or ("NX" in options and previous is not None):
+            return previous if "GET" in options else None
+        self.data[key] = (value, expires_at)
+        return previous if "GET" in options else "OK"
+
+    def call(self, command, args):
+        command = command.upper()
+        if command == "PING":
+            return "PONG"
+        if command == "GET":
+            return self._get(args[0])
+        if command == "MGET":
+            return [self._get(key) for key in args]
+        if command == "SET":
+            return self._set(args[0], args[1], args[2:])
+        if command == "INCR":
+            value = int(self._get(args[0]) or 0) + 1
+            self.data[args[0]] = (str(value), self.data.get(args[0], (None, None))[1])
+            return value
+        if command == "PTTL":
+            if self._get(args[0]) is None:
+                return -2
+            expires_at = self.data[args[0]][1]
+            return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+        if command == "DEL":
+            return sum(self.data.pop(key, None) is not None for key in args)
+        raise RespError(f"ERR unknown command '{command}'")
+
+    @staticmethod
+    def encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(StandInRespServer.encode(item) for item in reply)
+        return encode_command(reply)[4:]  # bulk string without the array header
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                command, *args = await read_reply(reader)
+                try:
+                    writer.write(self.encode(self.call(command, args)))
+                except RespError as e:
+                    writer.write(b"-%s\r\n" % str(e).encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def check_store(store, db) -> dict:
+    """Run the contract against one store; every value should be True"""
+    email, apartment_id = "admin@example.com", "APTOTP1"
+    result = {}
+
+    await store.issue(db, email, apartment_id, "111111")
+    result["wrong code is invalid"] = await store.consume(db, email, apartment_id, "999999") is OTPCheck.INVALID
+    result["live code is valid"] = await store.consume(db, email, apartment_id, "111111") is OTPCheck.VALID
+    result["second use is reported"] = await store.consume(db, email, apartment_id, "111111") is OTPCheck.USED
+
+    await store.issue(db, email, apartment_id, "222222")
+    await store.issue(db, email, apartment_id, "333333")
+    result["new code replaces old"] = await store.consume(db, email, apartment_id, "222222") is OTPCheck.INVALID
+    result["new code is valid"] = await store.consume(db, email, apartment_id, "333333") is OTPCheck.VALID
+
+    await store.issue(db, email, apartment_id, "444444", ttl_seconds=-1)
+    result["expired code is reported"] = await store.consume(db, email, apartment_id, "444444") is OTPCheck.EXPIRED
+    return result
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def check_stateless_store(nonces, db, concurrent: bool = True) -> dict:
+    """Run the stateless contract on one nonce backend; every value should be True"""
+    clock = FakeClock()
+    store = StatelessOTPStore(nonces, secret="test-secret", window_seconds=600, clock=clock)
+    email, apartment_id = "resident@example.com", "APTOTP2"
+    result = {}
+
+    code = await store.new_code(db, email, apartment_id)
+    await store.issue(db, email, apartment_id, code)
+    result["same code within a window"] = await store.new_code(db, email, apartment_id) == code
+    wrong = "%04d" % ((int(code) + 1) % 10000)
+    result["wrong code is invalid"] = await store.consume(db, email, apartment_id, wrong) is OTPCheck.INVALID
+    clock.now += 600
+    result["valid in the next window"] = await store.consume(db, email, apartment_id, code) is OTPCheck.VALID
+    result["second use is reported"] = await store.consume(db, email, apartment_id, code) is OTPCheck.USED
+    result["new code after use"] = await store.new_code(db, email, apartment_id) != code
+
+    code = await store.new_code(db, email, apartment_id)
+    clock.now += 1200
+    result["expired after two windows"] = await store.consume(db, email, apartment_id, code) is OTPCheck.EXPIRED
+
+    if concurrent:
+        code = await store.new_code(db, email, apartment_id)
+        checks = await asyncio.gather(*(store.consume(db, email, apartment_id, code) for _ in range(5)))
+        result["one of concurrent attempts wins"] = sorted(c.value for c in checks) == ["used"] * 4 + ["valid"]
+    return result
+
+
+async def _check_sql() -> dict:
+    engine = create_async_engine(DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1))
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        result = await check_store(SQLOTPStore(), db)
+    async with sessions() as db:
+        # One session can't run statements concurrently, so no concurrent attempts here
+        result.update(await check_stateless_store(SQLOTPNonces(), db, concurrent=False))
+    await engine.dispose()
+    return result
+
+
+async def _check_memory() -> dict:
+    result = await check_store(MemoryOTPStore(), None)
+    result.update(await check_stateless_store(MemoryOTPNonces(), None))
+    return result
+
+
+async def _check_redis() -> dict:
+    server = StandInRespServer()
+    client = RespClient(await server.start())
+    try:
+        assert await client.execute("PING") == "PONG"
+        result = await check_store(RedisOTPStore(client), None)
+        result.update(await check_stateless_store(RedisOTPNonces(client), None))
+        return result
+    finally:
+        await client.close()
+        await server.stop()
+
+
+def _assert_all(result: dict):
+    failed = [name for name, ok in result.items() if not ok]
+    assert not failed, failed
+
+
+def test_stateless_store_refuses_default_secret():
+    for secret in ("", DEFAULT_SECRET_KEY):
+        try:
+            StatelessOTPStore(MemoryOTPNonces(), secret=secret)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError(f"started with secret {secret!r}")
+
+
+def test_sql_store():
+    migrations.upgrade(create_engine(DATABASE_URL))
+    _assert_all(asyncio.run(_check_sql()))
+
+
+def test_memory_store():
+    _assert_all(asyncio.run(_check_memory()))
+
+
+def test_redis_store():
+    _assert_all(asyncio.run(_check_redis()))
+
+
+if __name__ == "__main__":
+    test_sql_store()
+    print("✅ sql store")
+    test_memory_store()
+    print("✅ memory store")
+    test_redis_store()
+    print("✅ redis store (stand-in RESP server)")
+    test_stateless_store_refuses_default_secret()
+    print("✅ stateless store refuses a missing or default secret")
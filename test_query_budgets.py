@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Check that the auth routes stay within their query budgets.
+
+Drives the OTP, signup and invitation routes through the app against a scratch
+SQLite database, counts the SQL statements each request executes, and fails if
+a scenario runs more than QUERY_BUDGETS allows. Failure paths (wrong, used or
+expired codes) must not cost more than the success path they guard, so a storm
+of bad attempts is no more work for the database than the same number of
+logins.
+
+Usage:
+    python test_query_budgets.py      (or: python -m pytest test_query_budgets.py)
+"""
+import asyncio
+import itertools
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+import conftest  # noqa: F401  (points the app at a scratch database)
+from app import database
+from app.main import app
+from app.models import FlatmateInvitation, OTPVerification
+from app.email_outbox import email_outbox
+from app.rate_limit import TokenBuckets, rate_limiter
+
+# Statements per request, by scenario (signin, invite-flatmate and a valid signup
+# each include queueing their email in email_outbox)
+QUERY_BUDGETS = {
+    "signin": 4,
+    "verify-otp: valid (new user)": 8,
+    "verify-otp: wrong code": 2,
+    "verify-otp: used code": 2,
+    "verify-otp: expired code": 2,
+    "invite-flatmate": 4,
+    "signup: valid": 5,
+    "signup: wrong apartment": 1,
+    "signup: wrong code": 1,
+    "signup: used code": 1,
+    "signup: expired code": 1,
+}
+# Failure scenarios may cost at most as much as the success they stand in for
+FAILURE_OF = {
+    "verify-otp: wrong code": "verify-otp: valid (new user)",
+    "verify-otp: used code": "verify-otp: valid (new user)",
+    "verify-otp: expired code": "verify-otp: valid (new user)",
+    "signup: wrong apartment": "signup: valid",
+    "signup: wrong code": "signup: valid",
+    "signup: used code": "signup: valid",
+    "signup: expired code": "signup: valid",
+}
+
+sent = []
+_apartment_names = itertools.count(1)
+
+
+def _capture(*args, **kwargs):
+    sent.append(args)
+    return True
+
+
+class QueryCounter:
+    """Counts statements run on the app's engines while active"""
+
+    def __init__(self):
+        self.statements = []
+        self.active = False
+        engines = {database.engine, database.async_engine.sync_engine,
+                   database.read_engine, database.async_read_engine.sync_engine}
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        if self.active:
+            self.statements.append(statement)
+
+    async def post(self, client, path: str, body: dict):
+        """POST and return (response, statements it ran)"""
+        del self.statements[:]
+        self.active = True
+        try:
+            response = await client.post(path, json=body)
+        finally:
+            self.active = False
+        return response, list(self.statements)
+
+
+def expire(model, **where):
+    with Session(database.engine) as db:
+        db.execute(
+            update(model)
+            .where(*(getattr(model, column) == value for column, value in where.items()))
+            .values(expires_at=datetime.utcnow() - timedelta(minutes=1))
+        )
+        db.commit()
+
+
+async def _run_scenarios() -> dict:
+    for kind in email_outbox.senders:
+        email_outbox.senders[kind] = _capture
+    rate_limiter.buckets = TokenBuckets()
+    counter = QueryCounter()
+    counts = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        apartment_name = f"Budget Towers {next(_apartment_names)}"
+        apt = (await client.post("/api/v1/apartments/", json={
+            "apartment_name": apartment_name, "apartment_address": "Budget Road", "admin_email": "admin@example.com",
+        })).json()
+        apt_id = apt["apartment_id"]
+
+        async def measure(name, path, body, expect):
+            response, statements = await counter.post(client, path, body)
+            assert response.status_code == expect, (name, response.status_code, response.text)
+            counts[name] = len(statements)
+            return response
+
+        signin = {"apt_id": apt_id, "admin_email": "admin@example.com"}
+        await measure("signin", "/api/v1/signin", signin, 200)
+        await email_outbox.run_once()
+        otp = sent[-1][1]
+        wrong = "%04d" % ((int(otp) + 1) % 10000)
+        await measure("verify-otp: wrong code", "/api/v1/verify-otp", {**signin, "otp": wrong}, 400)
+        await measure("verify-otp: valid (new user)", "/api/v1/verify-otp", {**signin, "otp": otp}, 200)
+        await measure("verify-otp: used code", "/api/v1/verify-otp", {**signin, "otp": otp}, 400)
+        await client.post("/api/v1/signin", json=signin)
+        await email_outbox.run_once()
+        expire(OTPVerification, email="admin@example.com", apartment_id=apt_id)
+        await measure("verify-otp: expired code", "/api/v1/verify-otp", {**signin, "otp": sent[-1][1]}, 400)
+
+        invite = {"apt_id": apt_id, "flat_number": "101", "floor": "G", "owner_email_id": "flatmate@example.com"}
+        # (the first invitation also reserves a block of invitation codes)
+        code = (await client.post("/api/v1/invite-flatmate", json=invite)).json()["data"]["invitation_code"]
+        signup = {"apt_id": apt_id, "apartment_name": apartment_name, "flat_number": "101",
+                  "email_id": "flatmate@example.com", "unique_code": code}
+        await measure("signup: wrong apartment", "/api/v1/signup", {**signup, "apartment_name": "Elsewhere"}, 400)
+        await measure("signup: wrong code", "/api/v1/signup", {**signup, "unique_code": "ZZZZZZ"}, 400)
+        await measure("signup: valid", "/api/v1/signup", signup, 200)
+        await measure("signup: used code", "/api/v1/signup", signup, 400)
+
+        invite["flat_number"] = signup["flat_number"] = "102"
+        invite["owner_email_id"] = signup["email_id"] = "late@example.com"
+        response = await measure("invite-flatmate", "/api/v1/invite-flatmate", invite, 200)
+        signup["unique_code"] = response.json()["data"]["invitation_code"]
+        expire(FlatmateInvitation, invitation_code=signup["unique_code"])
+        await measure("signup: expired code", "/api/v1/signup", signup, 400)
+    # Close the pooled aiosqlite connections while their event loop is alive
+    await database.async_engine.dispose()
+    return counts
+
+
+def test_routes_within_query_budgets():
+    counts = asyncio.run(_run_scenarios())
+    over = {name: (count, QUERY_BUDGETS[name]) for name, count in counts.items() if count > QUERY_BUDGETS[name]}
+    assert not over, f"over budget (statements, budget): {over}"
+    costlier = {name: (counts[name], counts[success]) for name, success in FAILURE_OF.items()
+                if counts[name] > counts[success]}
+    assert not costlier, f"failure costs more than success: {costlier}"
+
+
+def main():
+    counts = asyncio.run(_run_scenarios())
+    print("🧮 Statements per request")
+    print("=" * 60)
+    failed = 0
+    for name, budget in QUERY_BUDGETS.items():
+        ok = counts[name] <= budget
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {name:<32}{counts[name]:>3} / {budget}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Check that the hot auth-flow queries are served by an index on SQLite.
+
+Builds a scratch database through the migrations, runs EXPLAIN QUERY PLAN for
+each lookup the auth and security routers do per request, and fails if any of
+them falls back to a full table scan or a temporary sort.
+
+Usage:
+    python test_query_plans.py      (or: python -m pytest test_query_plans.py)
+"""
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, update, delete, literal_column
+
+from conftest import scratch_database_url
+from app import migrations, statements
+from app.models import User, OTPVerification, FlatmateInvitation, RefreshToken, Security
+
+NOW = datetime(2025, 1, 1)
+
+HOT_QUERIES = {
+    "signin: clear previous OTPs": delete(OTPVerification).where(
+        OTPVerification.email == "a@example.com",
+        OTPVerification.apartment_id == "APT01",
+    ),
+    "verify-otp: OTP lookup": statements.OTP_CANDIDATE.params(
+        email="a@example.com", apartment_id="APT01", otp_code="1234", now=NOW,
+    ),
+    "verify-otp: user by email": select(User).where(
+        User.user_email_id == "a@example.com",
+        User.apartment_id == "APT01",
+    ),
+    "refresh: claim token": update(RefreshToken)
+    .where(
+        RefreshToken.token_hash == b"\0" * 32,
+        RefreshToken.is_revoked == literal_column("0"),
+        RefreshToken.expires_at > NOW,
+    )
+    .values(is_revoked=1),
+    "login: revoke live tokens": update(RefreshToken)
+    .where(RefreshToken.user_id == 1, RefreshToken.is_revoked == literal_column("0"))
+    .values(is_revoked=1),
+    "invite: pending invitation": select(FlatmateInvitation).where(
+        FlatmateInvitation.apartment_id == "APT01",
+        FlatmateInvitation.flat_number == "101",
+        FlatmateInvitation.invited_email == "a@example.com",
+        FlatmateInvitation.is_used == literal_column("0"),
+        FlatmateInvitation.expires_at > NOW,
+    ),
+    "signup: apartment and invitation": statements.SIGNUP_CANDIDATE.params(
+        apartment_id="APT01", apartment_name="Green Park", flat_number="101",
+        email="a@example.com", invitation_code="ABC123", now=NOW,
+    ),
+    "signup: flat occupant": select(User).where(
+        User.apartment_id == "APT01",
+        User.flat_number == "101",
+    ),
+    "security: list": select(Security)
+    .where(Security.apartment_id == "APT01")
+    .order_by(Security.created_at.desc()),
+}
+
+
+def build_engine():
+    engine = create_engine(scratch_database_url("plans"))
+    migrations.upgrade(engine)
+    return engine
+
+
+def query_plan(conn, statement) -> list:
+    """EXPLAIN QUERY PLAN detail lines for a Core statement"""
+    compiled = statement.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_plan(detail: list) -> list:
+    """Problems with a plan: full scans and temp b-tree sorts"""
+    problems = []
+    for line in detail:
+        if line.startswith("SCAN "):
+            problems.append(f"full scan: {line}")
+        if "TEMP B-TREE" in line:
+            problems.append(f"sort without index: {line}")
+    if not any("INDEX" in line or "PRIMARY KEY" in line for line in detail):
+        problems.append("no index used")
+    return problems
+
+
+def test_hot_queries_use_indexes():
+    engine = build_engine()
+    failures = {}
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            problems = check_plan(query_plan(conn, statement))
+            if problems:
+                failures[name] = problems
+    engine.dispose()
+    assert not failures, failures
+
+
+def main():
+    print("🔎 EXPLAIN QUERY PLAN for the hot auth queries")
+    print("=" * 60)
+    engine = build_engine()
+    failed = 0
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            detail = query_plan(conn, statement)
+            problems = check_plan(detail)
+            print(f"{'❌' if problems else '✅'} {name}")
+            for line in detail:
+                print(f"     {line}")
+            for problem in problems:
+                print(f"     ⚠️  {problem}")
+            failed += bool(problems)
+    engine.dispose()
+    print(f"\n{len(HOT_QUERIES) - failed}/{len(HOT_QUERIES)} queries use an index")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Check the rate limiter of the OTP and invitation endpoints.
+
+- a token bucket allows its capacity at once, then refills at its rate;
+- an in-process check costs microseconds;
+- the middleware answers 429 with Retry-After once an email is over its limit,
+  while other emails go through and the handler still gets the request body;
+- with the shared backend (a stand-in RESP server) two workers share one limit,
+  and an unreachable server falls back to the in-process buckets.
+
+Usage:
+    python test_rate_limit.py      (or: python -m pytest test_rate_limit.py)
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+
+from app.rate_limit import Limit, RateLimiter, RateLimitMiddleware, RouteLimits, TokenBuckets, _mask
+from test_otp_store import StandInRespServer
+
+SIGNIN = RouteLimits("admin_email", (Limit("email", 3, 60), Limit("ip", 100, 60)))
+
+
+def test_token_bucket_refills():
+    buckets = TokenBuckets()
+    limit = Limit("email", 3, 3)
+    assert [buckets.take("k", limit, now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = buckets.take("k", limit, now=100.0)
+    assert abs(wait - 1.0) < 1e-6, wait
+    assert buckets.take("k", limit, now=101.0) == 0.0
+    assert buckets.take("k", limit, now=101.0) > 0
+
+
+def test_check_costs_microseconds():
+    buckets = TokenBuckets()
+    limit = Limit("ip", 1000000, 1)
+    keys = [f"/api/v1/signin:ip:10.0.{n // 256}.{n % 256}" for n in range(1000)]
+    start = time.perf_counter()
+    for n in range(100000):
+        buckets.take(keys[n % 1000], limit)
+    per_check_us = (time.perf_counter() - start) / 100000 * 1e6
+    assert per_check_us < 50, per_check_us
+
+
+def _app(limiter: RateLimiter) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter, routes={"/api/v1/signin": SIGNIN})
+
+    @app.post("/api/v1/signin")
+    async def signin(request: Request):
+        return await request.json()
+
+    return app
+
+
+async def _signins(app: FastAPI, emails: list) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [
+            await client.post("/api/v1/signin", json={"apt_id": "APT1", "admin_email": email})
+            for email in emails
+        ]
+
+
+def test_middleware_returns_429_with_retry_after():
+    responses = asyncio.run(_signins(_app(RateLimiter("memory")), ["a@example.com"] * 4 + ["b@example.com"]))
+    assert [r.status_code for r in responses] == [200, 200, 200, 429, 200]
+    assert responses[0].json() == {"apt_id": "APT1", "admin_email": "a@example.com"}
+    assert 1 <= int(responses[3].headers["retry-after"]) <= 20
+
+
+def test_stats_hide_emails_and_ips():
+    limiter = RateLimiter("memory")
+    asyncio.run(_signins(_app(limiter), ["alice@example.com"] * 4))
+    denied = [entry["key"] for entry in limiter.stats()["most_denied"]]
+    assert denied == ["/api/v1/signin:email:al***@example.com"], denied
+    shown = str(limiter.stats())
+    assert "alice" not in shown and "127.0.0.1" not in shown
+    ip_key = "/api/v1/signin:ip:10.0.0.1"
+    assert _mask(ip_key) == _mask(ip_key) != _mask("/api/v1/signin:ip:10.0.0.2")
+    assert "10.0.0.1" not in _mask(ip_key)
+
+
+async def _shared_workers() -> list:
+    server = StandInRespServer()
+    url = await server.start()
+    worker_a = RateLimiter("redis", redis_url=url)
+    worker_b = RateLimiter("redis", redis_url=url)
+    try:
+        checks = worker_a.checks("/api/v1/signin", SIGNIN, {"client": ("10.0.0.1", 1)},
+                                 {"admin_email": "a@example.com"})
+        waits = []
+        for worker in (worker_a, worker_b, worker_a, worker_b):
+            waits.append(await worker.check(checks))
+        return waits
+    finally:
+        await worker_a.shared.client.close()
+        await worker_b.shared.client.close()
+        await server.stop()
+
+
+def test_shared_backend_spans_workers():
+    waits = asyncio.run(_shared_workers())
+    assert waits[:3] == [0.0, 0.0, 0.0] and 0 < waits[3] <= 60, waits
+
+
+def test_unreachable_backend_falls_back():
+    limiter = RateLimiter("redis", redis_url="redis://127.0.0.1:1/0")
+    checks = limiter.checks("/api/v1/signin", SIGNIN, {"client": ("10.0.0.1", 1)}, {"admin_email": "a@example.com"})
+    waits = [asyncio.run(limiter.check(checks)) for _ in range(4)]
+    assert limiter.shared_errors == 1
+    assert waits[:3] == [0.0, 0.0, 0.0] and waits[3] > 0
+
+
+if __name__ == "__main__":
+    test_token_bucket_refills()
+    print("✅ token bucket allows its capacity, then refills")
+    test_check_costs_microseconds()
+    print("✅ an in-process check costs microseconds")
+    test_middleware_returns_429_with_retry_after()
+    print("✅ 429 with Retry-After over the limit, body still reaches the handler")
+    test_stats_hide_emails_and_ips()
+    print("✅ stats mask emails and hash client IPs")
+    test_shared_backend_spans_workers()
+    print("✅ shared backend: two workers share one limit")
+    test_unreachable_backend_falls_back()
+    print("✅ unreachable shared backend: falls back to in-process buckets")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Check refresh token rotation under concurrency.
+
+Seeds the app's scratch database with a user and a refresh token, then:
+
+- calls rotate_refresh_token with that token in 50 sessions at once, without
+  the in-process refresh_flights: exactly one claims it, the others get the
+  winner's successor;
+- fires 50 parallel POST /api/v1/token/refresh requests with that token: all
+  succeed with the same new refresh token, and the user has exactly one live
+  refresh token afterwards;
+- refreshes a just-rotated token again with the in-process result cache
+  cleared (as another worker would): the successor recorded in the database
+  is handed out again;
+- replays a rotated token after the grace window: 401, and every token of its
+  family is revoked.
+
+Usage:
+    python test_refresh_rotation.py      (or: python -m pytest test_refresh_rotation.py)
+"""
+import asyncio
+import hashlib
+import itertools
+import secrets
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+import conftest  # noqa: F401  (points the app at a scratch database)
+from app import database
+from app.main import app
+from app.models import Apartment, User, RefreshToken
+from app.refresh_tokens import REFRESH_GRACE_SECONDS, refresh_flights, rotate_refresh_token
+
+PARALLEL_REFRESHES = 50
+
+_apartment_numbers = itertools.count(1)
+
+
+def seed_refresh_token() -> tuple:
+    """Create an apartment, a user and a live refresh token; return (user_id, token)"""
+    token = secrets.token_hex(32)
+    apartment_id = f"APTRT{next(_apartment_numbers)}"
+    with Session(database.engine) as db:
+        db.add(Apartment(
+            apartment_id=apartment_id,
+            apartment_name="Rotation Towers",
+            apartment_address="Token Road",
+            admin_email="admin@example.com",
+        ))
+        user = User(apartment_id=apartment_id, user_email_id="admin@example.com", flat_number="101")
+        db.add(user)
+        db.flush()
+        db.add(RefreshToken(
+            token_hash=hashlib.sha256(token.encode()).digest(),
+            user_id=user.id,
+            expires_at=datetime.utcnow() + timedelta(days=1),
+        ))
+        db.commit()
+        user_id = user.id
+    return user_id, token
+
+
+def live_refresh_tokens(user_id: int) -> int:
+    with Session(database.engine) as db:
+        count = db.execute(
+            select(func.count()).select_from(RefreshToken).where(
+                RefreshToken.user_id == user_id, RefreshToken.is_revoked == 0
+            )
+        ).scalar()
+    return count
+
+
+def age_rotations(user_id: int, seconds: float):
+    """Pretend the user's rotations happened `seconds` earlier"""
+    with Session(database.engine) as db:
+        db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == user_id, RefreshToken.rotated_at.is_not(None))
+            .values(rotated_at=datetime.utcnow() - timedelta(seconds=seconds))
+        )
+        db.commit()
+
+
+async def _post_refreshes(tokens: list) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/token/refresh", json={"refresh_token": token})
+            for token in tokens
+        ))
+    # Close the pooled aiosqlite connections while their event loop is alive
+    await database.async_engine.dispose()
+    return responses
+
+
+def refresh(*tokens: str) -> list:
+    """POST /api/v1/token/refresh once per token, all concurrently"""
+    return asyncio.run(_post_refreshes(list(tokens)))
+
+
+async def _rotate_concurrently(token: str, n: int) -> list:
+    """rotate_refresh_token in n sessions of their own, bypassing refresh_flights"""
+    async def rotate():
+        async with database.AsyncSessionLocal() as db:
+            rotation = await rotate_refresh_token(db, token)
+            await db.commit()
+            return rotation
+
+    rotations = await asyncio.gather(*(rotate() for _ in range(n)))
+    await database.async_engine.dispose()
+    return rotations
+
+
+def test_concurrent_claims_rotate_once():
+    user_id, token = seed_refresh_token()
+    rotations = asyncio.run(_rotate_concurrently(token, PARALLEL_REFRESHES))
+    # Exactly one session's conditional UPDATE claims the token; the rest find it
+    # rotated within the grace window and hand out the winner's successor
+    assert sum(rotation.rotated for rotation in rotations if rotation) == 1, rotations
+    assert None not in rotations and len({rotation.refresh_token for rotation in rotations}) == 1
+    assert live_refresh_tokens(user_id) == 1
+
+
+def test_parallel_refreshes_share_one_rotation():
+    user_id, token = seed_refresh_token()
+    responses = refresh(*[token] * PARALLEL_REFRESHES)
+    assert sorted(r.status_code for r in responses) == [200] * PARALLEL_REFRESHES
+    assert len({r.json()["refresh_token"] for r in responses}) == 1
+    assert live_refresh_tokens(user_id) == 1
+
+
+def test_other_worker_gets_recorded_successor():
+    user_id, token = seed_refresh_token()
+    (first,) = refresh(token)
+    refresh_flights.clear()
+    (second,) = refresh(token)
+    assert second.status_code == 200, second.text
+    assert second.json()["refresh_token"] == first.json()["refresh_token"]
+    assert live_refresh_tokens(user_id) == 1
+
+
+def test_replay_after_grace_revokes_family():
+    user_id, token = seed_refresh_token()
+    (first,) = refresh(token)
+    (second,) = refresh(first.json()["refresh_token"])
+    assert second.status_code == 200 and live_refresh_tokens(user_id) == 1
+    refresh_flights.clear()
+    age_rotations(user_id, REFRESH_GRACE_SECONDS + 1)
+    (replayed,) = refresh(token)
+    assert replayed.status_code == 401
+    assert live_refresh_tokens(user_id) == 0
+    (current,) = refresh(second.json()["refresh_token"])
+    assert current.status_code == 401
+
+
+def main():
+    checks = [
+        (f"{PARALLEL_REFRESHES} concurrent claims rotate the token once", test_concurrent_claims_rotate_once),
+        (f"{PARALLEL_REFRESHES} parallel refreshes share one rotation", test_parallel_refreshes_share_one_rotation),
+        ("another worker gets the recorded successor", test_other_worker_gets_recorded_successor),
+        ("replay after the grace window revokes the family", test_replay_after_grace_revokes_family),
+    ]
+    print("🔁 Refresh token rotation")
+    print("=" * 60)
+    failed = 0
+    for name, check in checks:
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
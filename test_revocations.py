@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Check the access token revocation snapshot.
+
+- the Bloom filter has no false negatives and about the configured false
+  positive rate at capacity;
+- a revocation written by one worker is seen by another once it syncs, and
+  between syncs checking a token that isn't revoked runs no query at all;
+- an admin demoted when signing in again (the apartment's admin email changed)
+  loses the tokens issued with the old role; the new one works.
+
+Usage:
+    python test_revocations.py      (or: python -m pytest test_revocations.py)
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from conftest import scratch_database_url
+from app import database, migrations
+from app.email_outbox import email_outbox
+from app.main import app
+from app.models import Apartment, User, UserRole
+from app.revocations import BloomFilter, RevocationList, revoke_access_token, revoke_user_tokens
+from app.routers.auth import create_access_token
+
+DATABASE_URL = scratch_database_url("revocations")
+
+
+def test_bloom_filter_accuracy():
+    bloom = BloomFilter(10000, 0.01)
+    added = [str(uuid.uuid4()) for _ in range(10000)]
+    for key in added:
+        bloom.add(key)
+    assert all(key in bloom for key in added)
+    false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(20000))
+    assert false_positives / 20000 < 0.02, false_positives
+
+
+async def _two_workers() -> dict:
+    engine = create_async_engine(DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1))
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    queries = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    worker_a = RevocationList(1000, sync_interval=3600, rebuild_interval=3600)
+    worker_b = RevocationList(1000, sync_interval=3600, rebuild_interval=3600)
+    exp = int((datetime.utcnow() + timedelta(days=1)).timestamp())
+    old_iat = int((datetime.utcnow() - timedelta(minutes=5)).timestamp())
+    logged_out = {"user_id": "1", "jti": "jti-logged-out", "iat": old_iat, "exp": exp}
+    fine = {"user_id": "1", "jti": "jti-fine", "iat": old_iat, "exp": exp}
+    other_device = {"user_id": "2", "jti": "jti-other", "iat": old_iat, "exp": exp}
+
+    async with sessions() as db:
+        # Both workers take their first snapshot (empty)
+        assert not await worker_a.is_revoked(db, logged_out)
+        assert not await worker_b.is_revoked(db, logged_out)
+
+        # Worker A: logout of one token and logout-all of user 2
+        revoke_access_token(db, logged_out)
+        cutoff = revoke_user_tokens(db, 2, datetime.utcnow() + timedelta(days=30))
+        await db.commit()
+        worker_a.add_jti("jti-logged-out")
+        worker_a.add_cutoff(2, cutoff.not_before)
+
+        result = {"a_rejects_at_once": await worker_a.is_revoked(db, logged_out)}
+        # Worker B until its next sync: stale snapshot, no queries
+        del queries[:]
+        result["b_before_sync"] = await worker_b.is_revoked(db, logged_out)
+        result["queries_between_syncs"] = len(queries)
+
+        worker_b.synced_at = 0.0  # sync interval elapsed
+        result["b_after_sync"] = await worker_b.is_revoked(db, logged_out)
+        result["b_cutoff"] = await worker_b.is_revoked(db, other_device)
+        del queries[:]
+        result["b_fine"] = await worker_b.is_revoked(db, fine)
+        result["queries_for_fine_token"] = len(queries)
+    await engine.dispose()
+    return result
+
+
+def test_revocation_reaches_other_worker():
+    migrations.upgrade(create_engine(DATABASE_URL))
+    result = asyncio.run(_two_workers())
+    assert result["a_rejects_at_once"]
+    assert not result["b_before_sync"] and result["queries_between_syncs"] == 0
+    assert result["b_after_sync"] and result["b_cutoff"]
+    assert not result["b_fine"] and result["queries_for_fine_token"] == 0
+
+
+def seed_demoted_admin() -> str:
+    """An admin whose apartment has since got another admin email; their access token"""
+    with Session(database.engine) as db:
+        db.add(Apartment(apartment_id="APTDEMOTE", apartment_name="Demotion Court",
+                         apartment_address="Cutoff Lane", admin_email="new-admin@example.com"))
+        user = User(apartment_id="APTDEMOTE", user_email_id="old-admin@example.com", flat_number="101",
+                    flat_id="admin_APTDEMOTE", role=UserRole.ADMIN)
+        db.add(user)
+        db.commit()
+        return create_access_token({"sub": user.flat_id, "user_id": str(user.id),
+                                    "apt_id": "APTDEMOTE", "role": "admin"})
+
+
+async def _sign_in_again(old_token: str) -> dict:
+    codes = []
+    send_otp = email_outbox.senders["send_otp_email"]
+    email_outbox.senders["send_otp_email"] = lambda email, otp, *args: codes.append(otp) or True
+    signin = {"apt_id": "APTDEMOTE", "admin_email": "old-admin@example.com"}
+    statuses = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def admin_status(token):
+                response = await client.get("/health/auth-cache", headers={"Authorization": f"Bearer {token}"})
+                return response.status_code
+
+            statuses["before"] = await admin_status(old_token)
+            # Tokens issued in the revocation's own second stay valid
+            time.sleep(1.1)
+            await client.post("/api/v1/signin", json=signin)
+            await email_outbox.run_once()
+            verified = await client.post("/api/v1/verify-otp", json={**signin, "otp": codes[-1]})
+            assert verified.status_code == 200, verified.text
+            statuses["role"] = verified.json()["data"]["role"]
+            statuses["old_token"] = await admin_status(old_token)
+            statuses["new_token"] = await admin_status(verified.json()["token"]["access_token"])
+    finally:
+        email_outbox.senders["send_otp_email"] = send_otp
+        await database.async_engine.dispose()
+    return statuses
+
+
+def test_sign_in_role_change_revokes_old_tokens():
+    old_token = seed_demoted_admin()
+    statuses = asyncio.run(_sign_in_again(old_token))
+    assert statuses["before"] == 200 and statuses["role"] == "owner", statuses
+    # The old token is refused outright; the new one authenticates, as an owner
+    assert statuses["old_token"] == 401 and statuses["new_token"] == 403, statuses
+
+
+if __name__ == "__main__":
+    test_bloom_filter_accuracy()
+    print("✅ Bloom filter: no false negatives, false positives under 2%")
+    test_revocation_reaches_other_worker()
+    print("✅ revocations reach another worker on its next sync, no queries in between")
+    test_sign_in_role_change_revokes_old_tokens()
+    print("✅ a role change at sign-in revokes the tokens issued before it")
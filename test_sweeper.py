@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Check the expired-row sweeper on a scratch SQLite database.
+
+- deletes, in small batches, expired OTPs, expired unused invitations,
+  expired or long-revoked refresh tokens, expired revocations, and old sent or
+  dead emails;
+- keeps live rows, used invitations, pending emails, and anything within the
+  retention period;
+- while another worker holds the lease, a second sweeper does nothing.
+
+Usage:
+    python test_sweeper.py      (or: python -m pytest test_sweeper.py)
+"""
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from conftest import scratch_database_url
+from app import migrations
+from app.models import EmailOutbox, FlatmateInvitation, OTPVerification, RefreshToken, TokenRevocation, User
+from app.sweeper import Sweeper
+
+engine = create_engine(scratch_database_url("sweeper"))
+migrations.upgrade(engine)
+
+
+def seed() -> dict:
+    """Stale and live rows in every swept table; returns how many of each should survive"""
+    now = datetime.utcnow()
+    old = now - timedelta(days=30)
+    recent = now - timedelta(days=1)
+    soon = now + timedelta(days=1)
+    with Session(engine) as db:
+        user = User(apartment_id="APTSWEEP", user_email_id="admin@example.com", flat_number="101")
+        db.add(user)
+        db.flush()
+        for expires_at in (old, old, old, recent, soon):
+            db.add(OTPVerification(email="admin@example.com", apartment_id="APTSWEEP",
+                                   otp_code="1234", expires_at=expires_at))
+        for is_used, expires_at in ((0, old), (0, old), (1, old), (0, recent), (0, soon)):
+            db.add(FlatmateInvitation(apartment_id="APTSWEEP", flat_number="101", floor="1",
+                                      invited_email="flatmate@example.com",
+                                      invitation_code=secrets.token_hex(3).upper(),
+                                      invited_by_admin_email="admin@example.com",
+                                      is_used=is_used, expires_at=expires_at))
+        for is_revoked, rotated_at, expires_at in (
+            (0, None, old),        # expired long ago
+            (1, old, soon),        # rotated long ago
+            (1, old, soon),
+            (1, recent, soon),     # rotated recently: kept for reuse detection
+            (0, None, soon),       # live
+        ):
+            db.add(RefreshToken(token_hash=secrets.token_bytes(32), user_id=user.id,
+                                is_revoked=is_revoked, rotated_at=rotated_at, expires_at=expires_at))
+        db.add(TokenRevocation(jti="expired", expires_at=recent))
+        db.add(TokenRevocation(jti="live", expires_at=soon))
+        for status, created_at in (("sent", old), ("dead", old), ("pending", old), ("sent", recent)):
+            db.add(EmailOutbox(kind="send_otp_email", recipient="admin@example.com", status=status,
+                               next_attempt_at=created_at, created_at=created_at))
+        db.commit()
+    return {"otp_verifications": 2, "flatmate_invitations": 3, "refresh_tokens": 2, "token_revocations": 1,
+            "email_outbox": 2}
+
+
+def row_counts() -> dict:
+    with Session(engine) as db:
+        return {
+            model.__tablename__: db.execute(select(func.count()).select_from(model)).scalar()
+            for model in (OTPVerification, FlatmateInvitation, RefreshToken, TokenRevocation, EmailOutbox)
+        }
+
+
+def test_sweep_deletes_only_stale_rows():
+    survivors = seed()
+    purged = Sweeper(engine, retention_days=7, batch_size=2, batch_pause=0).run_once()
+    assert purged == {"otp_verifications": 3, "flatmate_invitations": 2,
+                      "refresh_tokens": 3, "token_revocations": 1, "email_outbox": 2}, purged
+    assert row_counts() == survivors
+
+
+def test_one_sweeper_at_a_time():
+    holder = Sweeper(engine, batch_pause=0)
+    other = Sweeper(engine, batch_pause=0)
+    assert holder._acquire_lease()
+    assert other.run_once() is None and other.skipped == 1
+    holder._release_lease()
+    assert other.run_once() is not None
+
+
+if __name__ == "__main__":
+    test_sweep_deletes_only_stale_rows()
+    print("✅ sweeper deletes stale rows in batches and keeps the rest")
+    test_one_sweeper_at_a_time()
+    print("✅ only the lease holder sweeps")